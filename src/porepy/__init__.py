@@ -32,6 +32,7 @@ from porepy.numerics.fv.tpfa import Tpfa, TpfaMixedDim
 from porepy.numerics.fv.mpfa import Mpfa, MpfaMixedDim
 from porepy.numerics.fv.biot import Biot
 from porepy.numerics.fv.source import Integral, IntegralMixedDim
+from porepy.numerics.fv.discretization_cache import DiscretizationCache
 
 # Virtual elements, elliptic
 from porepy.numerics.vem.vem_dual import DualVEM, DualVEMMixedDim
@@ -70,6 +71,7 @@ from porepy.numerics.time_stepper import Implicit, Explicit
 from porepy.grids.grid import Grid
 from porepy.grids.grid_bucket import GridBucket
 from porepy.grids.structured import CartGrid, TensorGrid
+from porepy.grids.structured import ImplicitCartGrid, ImplicitTensorGrid
 from porepy.grids.simplex import TriangleGrid, TetrahedralGrid
 from porepy.grids.simplex import StructuredTriangleGrid, StructuredTetrahedralGrid
 from porepy.grids.point_grid import PointGrid
@@ -99,6 +101,7 @@ from porepy.utils import comp_geom as cg
 from porepy.fracs import utils as frac_utils
 from porepy.fracs import meshing, importer, extrusion
 from porepy.grids import structured, simplex, coarsening, partition
+from porepy.grids import binary_storage
 from porepy.params.units import *
 from porepy.numerics.fv import fvutils
 from porepy.utils import error
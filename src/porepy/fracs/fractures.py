@@ -15,6 +15,7 @@ import logging
 import numpy as np
 import sympy
 import csv
+import multiprocessing
 
 # Imports of external packages that may not be present at the system. The
 # module will work without any of these, but with limited functionalbility.
@@ -37,6 +38,45 @@ from porepy.grids.constants import GmshConstants
 # Module-wide logger
 logger = logging.getLogger(__name__)
 
+# Fractures and tolerance used by the worker processes in
+# FractureNetwork.find_intersections(). Set once per worker by
+# _init_intersection_worker().
+_worker_fractures = None
+_worker_tol = None
+
+
+def _init_intersection_worker(fractures, tol):
+    global _worker_fractures, _worker_tol
+    _worker_fractures = fractures
+    _worker_tol = tol
+
+
+def _intersect_pairs(fractures, tol, pairs):
+    """ Run the exact intersection test on pairs of fractures.
+
+    Parameters:
+        fractures (list of Fracture): The fractures.
+        tol (double): Geometric tolerance.
+        pairs (np.array, 2 x n): Indices of fracture pairs, referring to
+            fractures.
+
+    Returns:
+        list of tuples: The output of Fracture.intersects() for each pair.
+
+    """
+    result = []
+    for i, j in pairs.T:
+        logger.debug("Processing fracture %i and %i", i, j)
+        result.append(fractures[i].intersects(fractures[j], tol))
+    return result
+
+
+def _intersect_pairs_in_worker(pairs):
+    """ Version of _intersect_pairs() for the worker processes, using the
+    fractures given to _init_intersection_worker().
+    """
+    return _intersect_pairs(_worker_fractures, _worker_tol, pairs)
+
 
 class Fracture(object):
     """ Class representing a single fracture, as a convex, planar 2D object
@@ -1095,7 +1135,7 @@ class FractureNetwork(object):
                 frac_arr.append(i)
         return frac_arr
 
-    def find_intersections(self, use_orig_points=False):
+    def find_intersections(self, use_orig_points=False, num_workers=None):
         """
         Find intersections between fractures in terms of coordinates.
 
@@ -1117,6 +1157,11 @@ class FractureNetwork(object):
                 fracture description in the search for intersections. Defaults
                 to False. If True, all fractures will have their attribute p
                 reset to their original value.
+            num_workers (int, optional): Number of processes used for the
+                exact intersection test of candidate pairs. Defaults to None,
+                in which case the test is run in the calling process. The
+                intersections, and their ordering, do not depend on the
+                number of workers.
 
         """
         self.has_checked_intersections = True
@@ -1130,24 +1175,51 @@ class FractureNetwork(object):
             for f in self._fractures:
                 f.p = f.orig_p
 
-        for i, first in enumerate(self._fractures):
-            for j in range(i + 1, len(self._fractures)):
-                second = self._fractures[j]
-                logger.debug("Processing fracture %i and %i", i, j)
-                isect, bound_first, bound_second = first.intersects(second, self.tol)
-                if np.array(isect).size > 0:
-                    logger.debug("Found an intersection between %i and %i", i, j)
-                    # Let the intersection know whether both intersection
-                    # points lies on the boundary of each fracture
-                    self.intersections.append(
-                        Intersection(
-                            first,
-                            second,
-                            isect,
-                            bound_first=bound_first,
-                            bound_second=bound_second,
-                        )
+        # Broad phase: Only pairs of fractures with overlapping bounding boxes
+        # can intersect, the exact test is limited to these.
+        broad_time = time.time()
+        candidates = self._candidate_intersection_pairs()
+        num_fracs = len(self._fractures)
+        logger.info(
+            "Found %i candidate pairs out of %i. Ellapsed time: %.5f",
+            candidates.shape[1],
+            num_fracs * (num_fracs - 1) // 2,
+            time.time() - broad_time,
+        )
+
+        if num_workers is not None and num_workers > 1 and candidates.shape[1] > 1:
+            # The fractures are sent once to each worker, the tasks are
+            # chunks of candidate pairs. map() preserves the ordering of the
+            # chunks, thus the result is independent of the number of workers.
+            num_chunks = min(4 * num_workers, candidates.shape[1])
+            chunks = np.array_split(candidates, num_chunks, axis=1)
+            # The fractures are passed through the initializer, which works
+            # also when the workers are not forked.
+            with multiprocessing.Pool(
+                num_workers,
+                initializer=_init_intersection_worker,
+                initargs=(self._fractures, self.tol),
+            ) as pool:
+                results = []
+                for chunk_result in pool.map(_intersect_pairs_in_worker, chunks):
+                    results += chunk_result
+        else:
+            results = _intersect_pairs(self._fractures, self.tol, candidates)
+
+        for (i, j), (isect, bound_first, bound_second) in zip(candidates.T, results):
+            if np.array(isect).size > 0:
+                logger.debug("Found an intersection between %i and %i", i, j)
+                # Let the intersection know whether both intersection
+                # points lies on the boundary of each fracture
+                self.intersections.append(
+                    Intersection(
+                        self._fractures[i],
+                        self._fractures[j],
+                        isect,
+                        bound_first=bound_first,
+                        bound_second=bound_second,
                     )
+                )
 
         logger.info(
             "Found %i intersections. Ellapsed time: %.5f",
@@ -1155,6 +1227,29 @@ class FractureNetwork(object):
             time.time() - start_time,
         )
 
+    def _candidate_intersection_pairs(self):
+        """ Find pairs of fractures with overlapping bounding boxes.
+
+        The boxes are extended by the tolerance exactly as in
+        Fracture.intersects(), thus pairs that are not returned are known not
+        to intersect. See comp_geom.overlapping_boxes() for the search.
+
+        Returns:
+            np.array, 2 x num_pairs: Indices of candidate pairs, with the
+                lower index in the first row. Sorted lexicographically.
+
+        """
+        num_fracs = len(self._fractures)
+        if num_fracs < 2:
+            return np.zeros((2, 0), dtype=np.int)
+
+        min_coord = np.array([f.p.min(axis=1) for f in self._fractures]).T
+        max_coord = np.array([f.p.max(axis=1) for f in self._fractures]).T
+        max_coord *= 1 + np.sign(max_coord) * self.tol
+        min_coord *= 1 - np.sign(min_coord) * self.tol
+
+        return cg.overlapping_boxes(min_coord, max_coord)
+
     def intersection_info(self, frac_num=None):
         """ Obtain information on intersections of one or several fractures.
 
@@ -1563,6 +1658,7 @@ class FractureNetwork(object):
             edges_loc_ind = np.unique(edges_loc_ind)
 
             # Append fields for edge-fracture map and boundary tags
+            old_edge_index = setmembership.MembershipIndex(edges[:2, edges_loc_ind])
             for ei in range(edges_new.shape[1]):
                 # Find the global edge index. For most edges, this will be
                 # correctly identified by edges_new[2], which tracks the
@@ -1573,8 +1669,8 @@ class FractureNetwork(object):
                 # We therefore compare the new edge to the old ones (before
                 # splitting). If found, use the old information; if not, use
                 # index as tracked by splitting.
-                is_old, old_loc_ind = setmembership.ismember_rows(
-                    edges_new_glob[:, ei].reshape((-1, 1)), edges[:2, edges_loc_ind]
+                is_old, old_loc_ind = old_edge_index.ismember_rows(
+                    edges_new_glob[:, ei].reshape((-1, 1))
                 )
                 if is_old[0]:
                     glob_ei = edges_loc_ind[old_loc_ind[0]]
@@ -2038,13 +2134,14 @@ class FractureNetwork(object):
         edges = self.decomposition["edges"]
         poly = self.decomposition["polygons"]
 
+        # All polygons are compared with the same edges, index these once
+        edge_index = setmembership.MembershipIndex(edges[:2], sort=False)
+
         poly_2_line = []
         line_reverse = []
         for p in poly:
-            hit, ind = setmembership.ismember_rows(p, edges[:2], sort=False)
-            hit_reverse, ind_reverse = setmembership.ismember_rows(
-                p[::-1], edges[:2], sort=False
-            )
+            hit, ind = edge_index.ismember_rows(p)
+            hit_reverse, ind_reverse = edge_index.ismember_rows(p[::-1])
             assert np.all(hit + hit_reverse == 1)
 
             line_ind = np.zeros(p.shape[1])
@@ -0,0 +1,445 @@
+"""
+Binary storage of grids, mortar grids and grid buckets.
+
+The objects are stored in a folder. Each array (topology, geometry, tags,
+mortar projections, array-valued data in the grid bucket) is written as a raw
+.npy file, sparse matrices as one file for each of the data, indices and
+indptr arrays. A json file describes how the objects are assembled from the
+arrays. Values that are none of the above (say, Parameters objects in the
+data of a grid bucket) are pickled; references from such values to the grids
+of the bucket are stored as references, not as copies of the grids.
+
+When loading, the arrays are by default memory-mapped in copy-on-write mode:
+The data is read from disk only when accessed, several processes that open
+the same folder share the pages in the operating system cache, and changes to
+the arrays are not written back to the files.
+
+Example:
+    save_grid_bucket(gb, 'mesh')
+    # Possibly in another process
+    gb = load_grid_bucket('mesh')
+
+"""
+import os
+import json
+import pickle
+import shutil
+import tempfile
+import importlib
+import numpy as np
+import scipy.sparse as sps
+
+from porepy.grids.grid import Grid
+from porepy.grids.grid_bucket import GridBucket
+from porepy.grids.mortar_grid import MortarGrid, BoundaryMortar
+from porepy.utils import tags
+
+FORMAT_VERSION = 1
+
+_INDEX_FILE = "index.json"
+
+# Attributes that are derived from other attributes, and are not stored. They
+# are reset when the object is loaded.
+_NOT_STORED = {
+    Grid: ["_topology_cache"],
+    MortarGrid: ["sides"],
+    BoundaryMortar: ["sides"],
+    GridBucket: [
+        "_nodes",
+        "_node_data",
+        "_node_index",
+        "_adjacency",
+        "_edges",
+        "_edge_data",
+        "_edge_index",
+        "_topology",
+        "_graph",
+        "_cell_center_tree",
+    ],
+}
+
+
+def save_grid(g, folder):
+    """ Store a grid in a folder.
+
+    Parameters:
+        g (Grid): The grid. Subclasses of Grid are restored with their class.
+        folder (str): Folder where the grid is stored. An existing storage in
+            the folder is replaced.
+
+    """
+    _save(folder, "grid", lambda writer: writer.value(g, "grid"))
+
+
+def load_grid(folder, mmap_mode="c"):
+    """ Load a grid stored by save_grid().
+
+    Parameters:
+        folder (str): Folder of the storage.
+        mmap_mode (str, optional): Memory-mapping mode of the arrays, see
+            np.load(). If None, the arrays are read into memory. Defaults to
+            'c' (copy-on-write).
+
+    Returns:
+        Grid: The grid.
+
+    """
+    index, reader = _open(folder, "grid", mmap_mode)
+    return reader.value(index["content"])
+
+
+def save_mortar_grid(mg, folder):
+    """ Store a mortar grid, including its side grids, in a folder.
+
+    Parameters:
+        mg (MortarGrid or BoundaryMortar): The mortar grid.
+        folder (str): Folder where the mortar grid is stored. An existing
+            storage in the folder is replaced.
+
+    """
+    _save(folder, "mortar_grid", lambda writer: writer.value(mg, "mortar_grid"))
+
+
+def load_mortar_grid(folder, mmap_mode="c"):
+    """ Load a mortar grid stored by save_mortar_grid().
+
+    Parameters:
+        folder (str): Folder of the storage.
+        mmap_mode (str, optional): Memory-mapping mode of the arrays, see
+            load_grid().
+
+    Returns:
+        MortarGrid or BoundaryMortar: The mortar grid.
+
+    """
+    index, reader = _open(folder, "mortar_grid", mmap_mode)
+    return reader.value(index["content"])
+
+
+def save_grid_bucket(gb, folder):
+    """ Store a grid bucket in a folder.
+
+    The grids, the graph structure (order of nodes and edges) and the data
+    of the nodes and edges, including the node numbers, are stored.
+
+    Parameters:
+        gb (GridBucket): The grid bucket.
+        folder (str): Folder where the bucket is stored. An existing storage
+            in the folder is replaced.
+
+    """
+
+    def write(writer):
+        grids = [g for g, _ in gb]
+        writer.grid_index = {id(g): i for i, g in enumerate(grids)}
+        nodes = [
+            {
+                "grid": writer.object(g, os.path.join("nodes", str(i), "grid")),
+                "data": writer.value(d, os.path.join("nodes", str(i), "data")),
+            }
+            for i, (g, d) in enumerate(gb)
+        ]
+        # The edges are stored in order of insertion, which preserves the
+        # order of the edges of each node when the bucket is loaded
+        edges = []
+        for i, (e, d) in enumerate(gb.edges_in_insertion_order()):
+            ind = [writer.grid_index[id(e[0])], writer.grid_index[id(e[1])]]
+            data = writer.value(d, os.path.join("edges", str(i), "data"))
+            edges.append({"nodes": ind, "data": data})
+        attributes = writer.attributes(gb, "bucket")
+        return {"nodes": nodes, "edges": edges, "attributes": attributes}
+
+    _save(folder, "grid_bucket", write)
+
+
+def load_grid_bucket(folder, mmap_mode="c"):
+    """ Load a grid bucket stored by save_grid_bucket().
+
+    Parameters:
+        folder (str): Folder of the storage.
+        mmap_mode (str, optional): Memory-mapping mode of the arrays, see
+            load_grid().
+
+    Returns:
+        GridBucket: The grid bucket.
+
+    """
+    index, reader = _open(folder, "grid_bucket", mmap_mode)
+    content = index["content"]
+
+    # The grids are loaded first, since the data may refer to them
+    reader.grids = [reader.value(n["grid"]) for n in content["nodes"]]
+
+    gb = GridBucket()
+    reader.set_attributes(gb, content["attributes"])
+    gb.add_nodes(reader.grids)
+    for g, n in zip(reader.grids, content["nodes"]):
+        gb.node_props(g).update(reader.value(n["data"]))
+    for e in content["edges"]:
+        g0, g1 = [reader.grids[i] for i in e["nodes"]]
+        gb.add_edge([g0, g1], None)
+        gb.edge_props([g0, g1]).update(reader.value(e["data"]))
+    return gb
+
+
+# ------------------------------------------------------------------------------#
+
+
+def _save(folder, kind, write):
+    """ Write a storage to a temporary folder, which replaces folder when
+    complete. An interrupted write thus does not leave a corrupt storage.
+    """
+    folder = os.path.abspath(folder)
+    if os.path.isdir(folder) and os.listdir(folder):
+        if not os.path.isfile(os.path.join(folder, _INDEX_FILE)):
+            raise ValueError("Folder " + folder + " is not empty")
+    parent = os.path.dirname(folder)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+
+    tmp_folder = tempfile.mkdtemp(dir=parent, prefix=".tmp")
+    try:
+        writer = _Writer(tmp_folder)
+        index = {"format_version": FORMAT_VERSION, "kind": kind}
+        index["content"] = write(writer)
+        with open(os.path.join(tmp_folder, _INDEX_FILE), "w") as f:
+            json.dump(index, f)
+    except Exception:
+        shutil.rmtree(tmp_folder)
+        raise
+
+    if os.path.isdir(folder):
+        shutil.rmtree(folder)
+    os.rename(tmp_folder, folder)
+
+
+def _open(folder, kind, mmap_mode):
+    with open(os.path.join(folder, _INDEX_FILE)) as f:
+        index = json.load(f)
+    if index["format_version"] != FORMAT_VERSION:
+        raise ValueError("Unknown format version " + str(index["format_version"]))
+    if index["kind"] != kind:
+        raise ValueError("Folder contains a " + index["kind"] + ", not a " + kind)
+    return index, _Reader(folder, mmap_mode)
+
+
+def _class_name(cls):
+    return cls.__module__ + "." + cls.__name__
+
+
+def _not_stored(obj):
+    return [
+        a for cls, attr in _NOT_STORED.items() if isinstance(obj, cls) for a in attr
+    ]
+
+
+def _is_json(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    return False
+
+
+class _Writer(object):
+    """ Write values to files, and return json descriptions of them. """
+
+    def __init__(self, folder):
+        self.folder = folder
+        # Index of the grids of a bucket, by their id, stored as references
+        # when met in the data
+        self.grid_index = {}
+
+    def value(self, value, path):
+        """ Store a value.
+
+        Parameters:
+            value: The value.
+            path (str): Path of the files of the value, relative to the folder
+                of the storage, without extension.
+
+        Returns:
+            dictionary: Description of the value.
+
+        """
+        grid_ind = self.grid_index.get(id(value))
+        if grid_ind is not None:
+            return {"type": "grid_ref", "index": grid_ind}
+
+        # Numpy scalars are checked first, since some of them are subclasses
+        # of the Python types
+        if isinstance(value, np.generic) and value.dtype != object:
+            return {"type": "scalar", "dtype": value.dtype.str, "value": value.item()}
+        if _is_json(value):
+            return {"type": "json", "value": value}
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            return {"type": "array", "file": self._array(value, path)}
+        if sps.isspmatrix(value):
+            return self._sparse(value, path)
+        if isinstance(value, (Grid, MortarGrid, BoundaryMortar)):
+            return self.object(value, path)
+        if isinstance(value, tags.PackedTags):
+            return {"type": "packed_tags", "items": self._items(value, path)}
+        if isinstance(value, dict) and all(_is_json(k) for k in value):
+            return {"type": "dict", "items": self._items(value, path)}
+        if isinstance(value, (list, tuple)):
+            items = [
+                self.value(v, os.path.join(path, str(i))) for i, v in enumerate(value)
+            ]
+            return {"type": value.__class__.__name__, "items": items}
+        return {"type": "pickle", "file": self._pickle(value, path)}
+
+    def object(self, obj, path):
+        """ Store an object by its class and attributes. """
+        return {
+            "type": "object",
+            "class": _class_name(obj.__class__),
+            "attributes": self.attributes(obj, path),
+        }
+
+    def attributes(self, obj, path):
+        """ Store the attributes of an object. """
+        skip = _not_stored(obj)
+        return {
+            key: self.value(val, os.path.join(path, key))
+            for key, val in obj.__dict__.items()
+            if key not in skip
+        }
+
+    def _items(self, d, path):
+        return [
+            [key, self.value(d[key], os.path.join(path, "item_" + str(i)))]
+            for i, key in enumerate(d)
+        ]
+
+    def _file(self, path, ext):
+        file_name = path + ext
+        full_path = os.path.join(self.folder, file_name)
+        if not os.path.isdir(os.path.dirname(full_path)):
+            os.makedirs(os.path.dirname(full_path))
+        return file_name, full_path
+
+    def _array(self, arr, path):
+        file_name, full_path = self._file(path, ".npy")
+        np.save(full_path, arr, allow_pickle=False)
+        return file_name
+
+    def _sparse(self, mat, path):
+        fmt = mat.getformat()
+        if fmt not in ("csc", "csr"):
+            stored = mat.tocsr()
+        else:
+            stored = mat
+        return {
+            "type": "sparse",
+            "format": fmt,
+            "shape": list(mat.shape),
+            "data": self._array(stored.data, path + ".data"),
+            "indices": self._array(stored.indices, path + ".indices"),
+            "indptr": self._array(stored.indptr, path + ".indptr"),
+        }
+
+    def _pickle(self, value, path):
+        file_name, full_path = self._file(path, ".pickle")
+        with open(full_path, "wb") as f:
+            _GridPickler(f, self.grid_index).dump(value)
+        return file_name
+
+
+class _Reader(object):
+    """ Assemble values from their json description and the stored files. """
+
+    def __init__(self, folder, mmap_mode):
+        self.folder = folder
+        self.mmap_mode = mmap_mode
+        self.grids = []
+
+    def value(self, desc):
+        kind = desc["type"]
+        if kind == "json":
+            return desc["value"]
+        if kind == "scalar":
+            return np.dtype(desc["dtype"]).type(desc["value"])
+        if kind == "array":
+            return self._array(desc["file"])
+        if kind == "sparse":
+            return self._sparse(desc)
+        if kind == "grid_ref":
+            return self.grids[desc["index"]]
+        if kind == "object":
+            module, name = desc["class"].rsplit(".", 1)
+            cls = getattr(importlib.import_module(module), name)
+            obj = cls.__new__(cls)
+            self.set_attributes(obj, desc["attributes"])
+            return obj
+        if kind == "packed_tags":
+            return tags.PackedTags(self._items(desc))
+        if kind == "dict":
+            return self._items(desc)
+        if kind == "list":
+            return [self.value(v) for v in desc["items"]]
+        if kind == "tuple":
+            return tuple(self.value(v) for v in desc["items"])
+        if kind == "pickle":
+            with open(os.path.join(self.folder, desc["file"]), "rb") as f:
+                return _GridUnpickler(f, self.grids).load()
+        raise ValueError("Unknown type of stored value: " + kind)
+
+    def set_attributes(self, obj, attributes):
+        """ Assign stored attributes to an object, and reset the attributes
+        that are not stored.
+        """
+        for key, desc in attributes.items():
+            setattr(obj, key, self.value(desc))
+        if isinstance(obj, Grid):
+            obj._topology_cache = {}
+        if isinstance(obj, (MortarGrid, BoundaryMortar)):
+            obj.sides = np.array(obj.side_grids.keys)
+
+    def _items(self, desc):
+        return {key: self.value(val) for key, val in desc["items"]}
+
+    def _array(self, file_name):
+        return np.load(
+            os.path.join(self.folder, file_name),
+            mmap_mode=self.mmap_mode,
+            allow_pickle=False,
+        )
+
+    def _sparse(self, desc):
+        data = self._array(desc["data"])
+        indices = self._array(desc["indices"])
+        indptr = self._array(desc["indptr"])
+        shape = tuple(desc["shape"])
+        # Assign the arrays directly, since the constructor of the sparse
+        # matrices may copy them, and thus read them into memory.
+        if desc["format"] == "csc":
+            mat = sps.csc_matrix(shape, dtype=data.dtype)
+        else:
+            mat = sps.csr_matrix(shape, dtype=data.dtype)
+        mat.data = data
+        mat.indices = indices
+        mat.indptr = indptr
+        if desc["format"] not in ("csc", "csr"):
+            mat = mat.asformat(desc["format"])
+        return mat
+
+
+class _GridPickler(pickle.Pickler):
+    """ Pickler that stores the grids of a bucket as references. """
+
+    def __init__(self, f, grid_index):
+        super(_GridPickler, self).__init__(f)
+        self.grid_index = grid_index
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Grid):
+            return self.grid_index.get(id(obj))
+        return None
+
+
+class _GridUnpickler(pickle.Unpickler):
+    def __init__(self, f, grids):
+        super(_GridUnpickler, self).__init__(f)
+        self.grids = grids
+
+    def persistent_load(self, pid):
+        return self.grids[pid]
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import heapq
 import numpy as np
 import scipy.sparse as sps
 import scipy.stats as stats
@@ -11,7 +12,7 @@ from porepy.params import tensor
 from porepy.params.bc import BoundaryCondition
 
 
-from porepy.utils import matrix_compression, mcolon, accumarray, setmembership
+from porepy.utils import matrix_compression, mcolon, setmembership
 from porepy.utils import half_space, tags
 
 from porepy.numerics.fv import tpfa
@@ -320,7 +321,7 @@ def generate_seeds(gb):
         index = np.in1d(faces, tips).nonzero()[0]
         cells = np.unique(cells[index])
 
-        face_cells = gb.graph.adj[g][g_h]["face_cells"]
+        face_cells = gb.edge_props((g, g_h), "face_cells")
         interf_cells, interf_faces, _ = sps.find(face_cells)
         index = np.in1d(interf_cells, cells).nonzero()[0]
 
@@ -494,70 +495,86 @@ def create_partition(A, seeds=None, **kwargs):
         return np.zeros(1)
     Nc = A.shape[0]
 
-    # For each node, which other nodes are strongly connected to it
-    ST = sps.lil_matrix((Nc, Nc), dtype=np.bool)
-
-    # In the first instance, all cells are strongly connected to each other
+    # For each node, which other nodes are strongly connected to it. The
+    # threshold is computed for all the compressed slices of the transpose at
+    # once: an entry is strong if it is negative and its magnitude is at least
+    # epsilon times the largest negative magnitude in its slice.
     At = A.T
+    nnz = np.diff(At.indptr)
+    col = np.repeat(np.arange(Nc), nnz)
+    neg = At.data < 0.
+    max_neg = np.zeros(Nc)
+    not_empty = nnz > 0
+    max_neg[not_empty] = np.maximum.reduceat(
+        np.where(neg, -At.data, 0.), At.indptr[:-1][not_empty]
+    )
+    strong = np.logical_and(neg, -At.data >= epsilon * max_neg[col])
+    ST = sps.csr_matrix(
+        (np.ones(np.sum(strong), dtype=np.bool), (At.indices[strong], col[strong])),
+        shape=(Nc, Nc),
+    )
+    del nnz, col, neg, max_neg, not_empty, strong
 
-    for i in np.arange(Nc):
-        loc = slice(At.indptr[i], At.indptr[i + 1])
-        ci, vals = At.indices[loc], At.data[loc]
-        neg = vals < 0.
-        nvals = vals[neg]
-        nci = ci[neg]
-        minId = np.argmin(nvals)
-        ind = -nvals >= epsilon * np.abs(nvals[minId])
-        ST[nci[ind], i] = True
-
-    # Temporary field, will store connections of depth 1
+    # Add the connections of larger depth, each step adds the strong
+    # connections of the strongly connected nodes
     for _ in np.arange(2, cdepth + 1):
-        STold = ST.copy()
-        for j in np.arange(Nc):
-            rowj = np.array(STold.rows[j])
-            if rowj.size == 0:
-                continue
-            row = np.hstack([STold.rows[r] for r in rowj])
-            ST[j, np.concatenate((rowj, row))] = True
-
-    del STold
+        ST = ST + ST * ST
 
-    ST.setdiag(False)
-    lmbda = np.array([len(s) for s in ST.rows])
+    # Remove the self connections
+    ST = ST.tocoo()
+    off_diag = ST.row != ST.col
+    ST = sps.csr_matrix(
+        (ST.data[off_diag], (ST.row[off_diag], ST.col[off_diag])), shape=(Nc, Nc)
+    )
+    lmbda = np.diff(ST.indptr)
 
     # Define coarse nodes
-    candidate = np.ones(Nc, dtype=np.bool)
-    is_fine = np.zeros(Nc, dtype=np.bool)
-    is_coarse = np.zeros(Nc, dtype=np.bool)
-
     # cells that are not important for any other cells are on the fine scale.
-    for row_id, row in enumerate(ST.rows):
-        if not row:
-            is_fine[row_id] = True
-            candidate[row_id] = False
+    is_fine = lmbda == 0
+    candidate = np.logical_not(is_fine)
+    is_coarse = np.zeros(Nc, dtype=np.bool)
 
-    ST = ST.tocsr()
+    # The candidate with the largest lambda (the first one in case of ties) is
+    # selected by a priority queue. Entries in the queue are invalidated, and
+    # skipped, when lambda of a cell is updated or the cell is not a candidate
+    # anymore.
+    queue = [(-l, i) for l, i in zip(lmbda[candidate], np.where(candidate)[0])]
+    heapq.heapify(queue)
     it = 0
-    while np.any(candidate):
-        i = np.argmax(lmbda)
+    while queue:
+        l, i = heapq.heappop(queue)
+        if not candidate[i] or -l != lmbda[i]:
+            continue
         is_coarse[i] = True
         j = ST.indices[ST.indptr[i] : ST.indptr[i + 1]]
         jf = j[candidate[j]]
         is_fine[jf] = True
         candidate[np.r_[i, jf]] = False
-        loop = ST.indices[mcolon.mcolon(ST.indptr[jf], ST.indptr[jf + 1])]
-        for row in np.unique(loop):
-            s = ST.indices[ST.indptr[row] : ST.indptr[row + 1]]
-            lmbda[row] = s[candidate[s]].size + 2 * s[is_fine[s]].size
-        lmbda[np.logical_not(candidate)] = -1
+        lmbda[np.r_[i, jf]] = -1
+
+        rows = np.unique(ST.indices[mcolon.mcolon(ST.indptr[jf], ST.indptr[jf + 1])])
+        rows_nnz = ST.indptr[rows + 1] - ST.indptr[rows]
+        s = ST.indices[mcolon.mcolon(ST.indptr[rows], ST.indptr[rows + 1])]
+        weight = candidate[s] + 2 * is_fine[s]
+        lmbda[rows] = np.bincount(
+            np.repeat(np.arange(rows.size), rows_nnz),
+            weights=weight,
+            minlength=rows.size,
+        )
+        lmbda[rows[np.logical_not(candidate[rows])]] = -1
+        rows = rows[candidate[rows]]
+        for l, r in zip(lmbda[rows], rows):
+            heapq.heappush(queue, (-l, r))
         it = it + 1
 
         # Something went wrong during aggregation
         assert it <= Nc
 
-    del lmbda, ST
+    del lmbda, ST, queue
 
+    is_seed = np.zeros(Nc, dtype=np.bool)
     if seeds is not None:
+        is_seed[seeds] = True
         is_coarse[seeds] = True
         is_fine[seeds] = False
 
@@ -565,99 +582,106 @@ def create_partition(A, seeds=None, **kwargs):
     # seeds
     c2c = np.abs(A) > 0
     c2c_rows, _, _ = sps.find(c2c)
+    c2c_cols = np.repeat(np.arange(Nc), np.diff(c2c.indptr))
 
-    pairs = np.empty((0, 2), dtype=np.int)
-    for idx, it in enumerate(np.where(is_coarse)[0]):
-        loc = slice(c2c.indptr[it], c2c.indptr[it + 1])
-        ind = np.setdiff1d(c2c_rows[loc], it)
-        cind = ind[is_coarse[ind]]
-        new_pair = np.stack((np.repeat(it, cind.size), cind), axis=-1)
-        pairs = np.append(pairs, new_pair, axis=0)
+    mask = np.logical_and(is_coarse[c2c_rows], is_coarse[c2c_cols])
+    mask = np.logical_and(mask, c2c_rows != c2c_cols)
+    pairs = np.stack((c2c_cols[mask], c2c_rows[mask]), axis=-1)
 
-    # Remove one of the neighbors cells
+    # Remove one of the neighbors cells, the one with the smaller diagonal
+    # entry unless it is a seed
     if pairs.size:
         pairs = setmembership.unique_rows(np.sort(pairs, axis=1))[0]
-        for ij in pairs:
-            A_val = np.array(A[ij, ij]).ravel()
-            ids = ij[np.argsort(A_val)]
-            ids = np.setdiff1d(ids, seeds, assume_unique=True)
-            if ids.size:
-                is_coarse[ids[0]] = False
-                is_fine[ids[0]] = True
+        diag = A.diagonal()
+        first = diag[pairs[:, 0]] <= diag[pairs[:, 1]]
+        ids = np.where(first, pairs[:, 0], pairs[:, 1])
+        other = np.where(first, pairs[:, 1], pairs[:, 0])
+        ids = np.where(is_seed[ids], other, ids)
+        ids = ids[np.logical_not(is_seed[ids])]
+        is_coarse[ids] = False
+        is_fine[ids] = True
 
     coarse = np.where(is_coarse)[0]
 
-    # Primal grid
+    # Primal grid, stored as the list of (aggregate, cell) pairs
     NC = coarse.size
-    primal = sps.lil_matrix((NC, Nc), dtype=np.bool)
-    primal[np.arange(NC), coarse[np.arange(NC)]] = True
-
-    connection = sps.lil_matrix((Nc, Nc), dtype=np.double)
-    for it in np.arange(Nc):
-        n = np.setdiff1d(c2c_rows[c2c.indptr[it] : c2c.indptr[it + 1]], it)
-        loc = slice(A.indptr[it], A.indptr[it + 1])
-        A_idx, A_row = A.indices[loc], A.data[loc]
-        mask = A_idx != it
-        connection[it, n] = np.abs(A_row[mask] / A_row[np.logical_not(mask)])
-
-    connection = connection.tocsr()
-
-    candidates_rep = np.ediff1d(connection.indptr)
-    candidates_idx = np.repeat(is_coarse, candidates_rep)
-    candidates = np.stack(
-        (
-            connection.indices[candidates_idx],
-            np.repeat(np.arange(NC), candidates_rep[is_coarse]),
-        ),
-        axis=-1,
+    primal_agg, primal_cell = [], []
+
+    # Strength of the connection between a cell and its neighbors, scaled
+    # with the diagonal entry of the cell
+    rows = np.repeat(np.arange(Nc), np.diff(A.indptr))
+    is_diag = rows == A.indices
+    A_diag = np.zeros(Nc)
+    A_diag[rows[is_diag]] = A.data[is_diag]
+    mask = np.logical_and(np.logical_not(is_diag), A.data != 0)
+    connection = sps.csr_matrix(
+        (np.abs(A.data[mask] / A_diag[rows[mask]]), (rows[mask], A.indices[mask])),
+        shape=(Nc, Nc),
     )
+    del rows, is_diag, A_diag, mask
 
+    # Connection between the cells and the aggregates, the values are stored
+    # by the index cell * NC + aggregate. The strongest connection is found by
+    # a priority queue, ties are broken by the lowest aggregate and cell
+    # index. Entries in the queue are invalidated when the connection is
+    # updated or the cell is assigned.
     connection_idx = mcolon.mcolon(
         connection.indptr[coarse], connection.indptr[coarse + 1]
     )
-    vals = sps.csr_matrix(
-        accumarray.accum(candidates, connection.data[connection_idx], size=[Nc, NC])
-    )
-    del candidates_rep, candidates_idx, connection_idx
+    cells = connection.indices[connection_idx]
+    aggs = np.repeat(np.arange(NC), np.diff(connection.indptr)[coarse])
+    vals_data = connection.data[connection_idx]
+    vals = dict(zip(cells * NC + aggs, vals_data))
+    queue = [(-v, a, c) for v, a, c in zip(vals_data, aggs, cells)]
+    heapq.heapify(queue)
+    del connection_idx, cells, aggs, vals_data
 
     it = NC
     not_found = np.logical_not(is_coarse)
+    num_not_found = np.sum(not_found)
+    assigned = np.zeros(Nc, dtype=np.bool)
     # Process the strongest connection globally
-    while np.any(not_found):
-
-        np.argmax(vals.data)
-        vals.argmax(axis=0)
-        mcind = np.atleast_1d(np.squeeze(np.asarray(vals.argmax(axis=0))))
-        mcval = -np.inf * np.ones(mcind.size)
-        for c, r in enumerate(mcind):
-            loc = slice(vals.indptr[r], vals.indptr[r + 1])
-            vals_idx, vals_data = vals.indices[loc], vals.data[loc]
-            mask = vals_idx == c
-            if vals_idx.size == 0 or not np.any(mask):
-                continue
-            mcval[c] = vals_data[mask]
-
-        mi = np.argmax(mcval)
-        nadd = mcind[mi]
+    while num_not_found > 0 and queue:
+        v, mi, nadd = heapq.heappop(queue)
+        if assigned[nadd] or vals[nadd * NC + mi] != -v:
+            continue
 
-        primal[mi, nadd] = True
+        primal_agg.append(mi)
+        primal_cell.append(nadd)
         it = it + 1
         if it > Nc + 5:
             break
 
+        num_not_found -= not_found[nadd]
         not_found[nadd] = False
-        vals.data[vals.indptr[nadd] : vals.indptr[nadd + 1]] = 0
+        assigned[nadd] = True
 
         loc = slice(connection.indptr[nadd], connection.indptr[nadd + 1])
         nc = connection.indices[loc]
         af = not_found[nc]
-        nc = nc[af]
-        nv = mcval[mi] * connection[nadd, :]
-        nv = nv.data[af]
-        if len(nc) > 0:
-            vals += sps.csr_matrix((nv, (nc, np.repeat(mi, len(nc)))), shape=(Nc, NC))
+        for r, nv in zip(nc[af], -v * connection.data[loc][af]):
+            key = r * NC + mi
+            val = vals.get(key, 0) + nv
+            vals[key] = val
+            heapq.heappush(queue, (-val, mi, r))
+
+    # Cells that are not connected to any aggregate form their own aggregate
+    unreached = np.where(not_found)[0]
+    primal_agg = np.hstack(
+        (
+            np.arange(NC),
+            np.array(primal_agg, dtype=np.int),
+            NC + np.arange(unreached.size),
+        )
+    )
+    primal_cell = np.hstack((coarse, np.array(primal_cell, dtype=np.int), unreached))
+    NC += unreached.size
 
-    coarse, fine = primal.tocsr().nonzero()
+    primal = sps.csr_matrix(
+        (np.ones(primal_agg.size, dtype=np.bool), (primal_agg, primal_cell)),
+        shape=(NC, Nc),
+    )
+    coarse, fine = primal.nonzero()
     return coarse[np.argsort(fine)]
 
 
@@ -13,9 +13,11 @@ Acknowledgements:
 from __future__ import division
 import numpy as np
 import itertools
+from concurrent.futures import ThreadPoolExecutor
 from scipy import sparse as sps
+from scipy import spatial
 
-from porepy.utils import matrix_compression, mcolon, tags
+from porepy.utils import matrix_compression, mcolon, tags, sort_points, sparse_mat
 
 from porepy.utils import comp_geom as cg
 
@@ -73,6 +75,19 @@ class Grid(object):
             num_cells
         cell_volumes (np.ndarray): Volumes of all cells
 
+        ---
+        Topological maps derived from face_nodes and cell_faces (cell_nodes(),
+        num_cell_nodes(), cell_connection_map(), cell_face_as_dense() and the
+        domain boundary faces) are computed once and cached on the grid. The
+        cache is invalidated when nodes, face_nodes or cell_faces, or the index
+        arrays of the latter two, are replaced. If the arrays are instead
+        modified in place, clear_topology_cache() must be called. The returned
+        maps are shared between calls, and should not be modified.
+
+        topology_cache_hits (int): Number of look-ups served by the cache.
+        topology_cache_misses (int): Number of look-ups that required the map
+            to be computed.
+
     """
 
     def __init__(self, dim, nodes, face_nodes, cell_faces, name):
@@ -88,22 +103,38 @@ class Grid(object):
         cell_faces (sps.csc_matrix): Cell-face relations
         name (str): Name of grid
         """
-        assert dim >= 0 and dim <= 3
-        self.dim = dim
+        self._init_common(dim, name)
+
         self.nodes = nodes
         self.cell_faces = cell_faces
         self.face_nodes = face_nodes
 
-        if isinstance(name, list):
-            self.name = name
-        else:
-            self.name = [name]
-
         # Infer bookkeeping from size of parameters
         self.num_nodes = nodes.shape[1]
         self.num_faces = face_nodes.shape[1]
         self.num_cells = cell_faces.shape[1]
 
+        self._init_tags()
+
+    def _init_common(self, dim, name):
+        """ Set the dimension, the name and the topology cache. Shared by the
+        constructors of Grid and of grids that do not call Grid.__init__.
+        """
+        assert dim >= 0 and dim <= 3
+        self._topology_cache = {}
+        self.topology_cache_hits = 0
+        self.topology_cache_misses = 0
+
+        self.dim = dim
+        if isinstance(name, list):
+            self.name = name
+        else:
+            self.name = [name]
+
+    def _init_tags(self):
+        """ Set the standard tags, including the boundary tags. Called by the
+        constructors when the number of nodes, faces and cells is known.
+        """
         # Add tag for the boundary faces
         self.tags = {}
         self.initiate_face_tags()
@@ -142,6 +173,54 @@ class Grid(object):
             h.tags = self.tags.copy()
         return h
 
+    def compact(self, float32_geometry=False):
+        """
+        Convert the grid to a compact storage mode, to reduce the memory
+        footprint of large grids. The conversion is done in place:
+
+            The index arrays of face_nodes and cell_faces are stored as int32,
+            and the data of cell_faces (+-1) as int8.
+            Boolean tags are packed with one bit per entry, see
+            tags.PackedTags. Tags can then only be modified by assigning the
+            full array.
+            If float32_geometry is True, the node coordinates and the
+            geometric quantities are stored in single precision. This will
+            reduce the accuracy of discretizations, and is only recommended
+            when memory is the limiting factor.
+
+        Geometry computed after the conversion is stored in double precision;
+        call compact() again to convert it.
+
+        The conversion is intended as the final step of the grid construction,
+        that is, after fracture faces are split and tags assigned. Code that
+        updates tags in place, such as g.tags[key][ind] = True, raises an error
+        on a compacted grid.
+
+        Parameters:
+            float32_geometry (boolean, optional): Store the geometry in single
+                precision. Defaults to False.
+
+        """
+        self._compact_topology()
+        self.tags = tags.PackedTags(self.tags)
+
+        if float32_geometry:
+            fields = [
+                "nodes",
+                "face_centers",
+                "face_normals",
+                "face_areas",
+                "cell_centers",
+                "cell_volumes",
+            ]
+            for field in fields:
+                if hasattr(self, field):
+                    setattr(self, field, getattr(self, field).astype(np.float32))
+
+    def _compact_topology(self):
+        self.face_nodes = sparse_mat.compact_indices(self.face_nodes)
+        self.cell_faces = sparse_mat.compact_indices(self.cell_faces, np.int8)
+
     def __repr__(self):
         """
         Implementation of __repr__
@@ -172,6 +251,10 @@ class Grid(object):
             s = "Cartesian grid in " + str(self.dim) + " dimensions.\n"
         elif "TensorGrid" in self.name:
             s = "Tensor grid in " + str(self.dim) + " dimensions.\n"
+        elif "ImplicitCartGrid" in self.name:
+            s = "Implicit Cartesian grid in " + str(self.dim) + " dimensions.\n"
+        elif "ImplicitTensorGrid" in self.name:
+            s = "Implicit tensor grid in " + str(self.dim) + " dimensions.\n"
         elif "StructuredTriangleGrid" in self.name:
             s = "Structured triangular grid.\n"
         elif "TriangleGrid" in self.name:
@@ -186,7 +269,7 @@ class Grid(object):
 
         return s
 
-    def compute_geometry(self):
+    def compute_geometry(self, chunk_size=None, num_threads=None):
         """Compute geometric quantities for the grid.
 
         This method initializes class variables describing the grid
@@ -196,6 +279,15 @@ class Grid(object):
         in cases where the grid is modified after the initial construction (
         say, grid refinement), this may lead to costly, unnecessary
         computations.
+
+        Parameters:
+            chunk_size (int, optional): For 3d grids, maximum number of faces
+                and cells processed at once. Smaller blocks reduce the peak
+                memory. If None, the full grid is processed at once.
+            num_threads (int, optional): For 3d grids, number of threads used
+                to process the blocks. Defaults to 1.
+
+        The results do not depend on chunk_size and num_threads.
         """
 
         self.name.append("Compute geometry")
@@ -207,7 +299,7 @@ class Grid(object):
         elif self.dim == 2:
             self.__compute_geometry_2d()
         else:
-            self.__compute_geometry_3d()
+            self.__compute_geometry_3d(chunk_size, num_threads)
 
     def __compute_geometry_0d(self):
         "Compute 0D geometry"
@@ -330,39 +422,102 @@ class Grid(object):
         self.face_centers = np.dot(R.T, self.face_centers)
         self.cell_centers = np.dot(R.T, self.cell_centers)
 
-    def __compute_geometry_3d(self):
+    def __compute_geometry_3d(self, chunk_size=None, num_threads=None):
         """
         Helper function to compute geometry for 3D grids
 
         The implementation is motivated by the similar MRST function.
 
-        NOTE: The function is very long, and could have been broken up into
-        parts (face and cell computations are an obvious solution).
+        The temporary arrays scale with the number of face-node pairs. To
+        bound their size, faces and cells are processed in blocks of at most
+        chunk_size faces and cells, respectively. If all faces and cells fit
+        in a single block, the sub-face quantities computed for the faces are
+        reused for the cells. Otherwise, they are recomputed for each cell
+        block, rather than stored for all faces. The blocks are independent,
+        and can be processed by a thread pool; the results do not depend on
+        the block size.
+
+        Parameters:
+            chunk_size (int, optional): Maximum number of faces and cells in a
+                block. If None, all faces and cells are processed at once,
+                unless num_threads > 1, in which case one block is assigned to
+                each thread.
+            num_threads (int, optional): Number of threads used to process the
+                blocks. Defaults to 1.
 
         """
-        num_face_nodes = self.face_nodes.nnz
-        face_node_ptr = self.face_nodes.indptr
+        num_threads = 1 if num_threads is None else num_threads
+        if chunk_size is None:
+            chunk_size = -(-max(self.num_faces, self.num_cells) // num_threads)
+        chunk_size = max(chunk_size, 1)
+
+        def blocks(num):
+            start = np.arange(0, num, chunk_size)
+            return list(zip(start, np.minimum(start + chunk_size, num)))
+
+        def map_blocks(fn, block_list):
+            if num_threads > 1 and len(block_list) > 1:
+                with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                    list(executor.map(lambda b: fn(*b), block_list))
+            else:
+                for b in block_list:
+                    fn(*b)
+
+        self.face_centers = np.zeros((3, self.num_faces))
+        self.face_normals = np.zeros((3, self.num_faces))
+        self.face_areas = np.zeros(self.num_faces)
+        self.cell_centers = np.zeros((3, self.num_cells))
+        self.cell_volumes = np.zeros(self.num_cells)
+
+        if chunk_size >= max(self.num_faces, self.num_cells):
+            sub = self.__subface_geometry_3d(np.arange(self.num_faces))
+            self.__face_geometry_3d(0, self.num_faces, sub)
+            self.__cell_geometry_3d(0, self.num_cells, sub)
+        else:
+            map_blocks(self.__face_geometry_3d, blocks(self.num_faces))
+            map_blocks(self.__cell_geometry_3d, blocks(self.num_cells))
 
-        num_nodes_per_face = face_node_ptr[1:] - face_node_ptr[:-1]
+    def __subface_geometry_3d(self, faces):
+        """
+        Compute quantities of the sub-faces (triangles formed by an edge and
+        the face center) of a set of faces. Helper function for
+        __compute_geometry_3d.
+
+        Parameters:
+            faces (np.ndarray): Sorted indices of the faces.
+
+        Returns:
+            dictionary: Local edge-face map and sub-face quantities, see the
+                code for details. Edges and faces are numbered locally,
+                following the order of faces.
+
+        """
+        face_node_ptr = self.face_nodes.indptr
+        num_nodes_per_face = face_node_ptr[faces + 1] - face_node_ptr[faces]
+        # Positions of the nodes of the faces in face_nodes
+        edges = mcolon.mcolon(face_node_ptr[faces], face_node_ptr[faces + 1])
+        num_face_nodes = edges.size
 
         # Face-node relationships. Note that the elements here will also
         # serve as a representation of an edge along the face (face_nodes[i]
         #  represents the edge running from face_nodes[i] to face_nodes[i+1])
-        face_nodes = self.face_nodes.indices
+        face_nodes = self.face_nodes.indices[edges]
         # For each node, index of its parent face
         face_node_ind = matrix_compression.rldecode(
-            np.arange(self.num_faces), num_nodes_per_face
+            np.arange(faces.size), num_nodes_per_face
         )
 
         # Index of next node on the edge list. Note that this assumes the
         # elements in face_nodes is stored in an ordered fasion
+        loc_ptr = np.hstack((0, np.cumsum(num_nodes_per_face)))
         next_node = np.arange(num_face_nodes) + 1
         # Close loops, for face i, the next node is the first of face i
-        next_node[face_node_ptr[1:] - 1] = face_node_ptr[:-1]
+        next_node[loc_ptr[1:] - 1] = loc_ptr[:-1]
 
         # Mapping from cells to faces
         edge_2_face = sps.coo_matrix(
-            (np.ones(num_face_nodes), (np.arange(num_face_nodes), face_node_ind))
+            (np.ones(num_face_nodes), (np.arange(num_face_nodes), face_node_ind)),
+            shape=(num_face_nodes, faces.size),
         ).tocsc()
 
         # Define temporary face center as the mean of the face nodes
@@ -423,16 +578,56 @@ class Grid(object):
             )
         )
 
+        return {
+            "edge_2_face": edge_2_face,
+            "face_node_ind": face_node_ind,
+            "sub_normals": sub_normals,
+            "sub_normals_sign": sub_normals_sign,
+            "sub_areas": sub_areas,
+            "sub_centroids": sub_centroids,
+            "face_normals": face_normals,
+            "face_areas": face_areas,
+        }
+
+    def __face_geometry_3d(self, start, end, sub=None):
+        """
+        Compute the geometry of the faces start, ..., end - 1 of a 3D grid.
+        Helper function for __compute_geometry_3d. The sub-face quantities of
+        the faces are computed unless given in sub.
+        """
+        if sub is None:
+            sub = self.__subface_geometry_3d(np.arange(start, end))
+
         # Finally, face centers are the area weighted means of centroids of
         # the sub-faces
-        face_centers = sub_areas * sub_centroids * edge_2_face / face_areas
+        face_centers = (
+            sub["sub_areas"]
+            * sub["sub_centroids"]
+            * sub["edge_2_face"]
+            / sub["face_areas"]
+        )
 
         # .. and we're done with the faces. Store information
-        self.face_centers = face_centers
-        self.face_normals = face_normals
-        self.face_areas = face_areas
+        self.face_centers[:, start:end] = face_centers
+        self.face_normals[:, start:end] = sub["face_normals"]
+        self.face_areas[start:end] = sub["face_areas"]
 
-        # Cells
+    def __cell_geometry_3d(self, start, end, sub=None):
+        """
+        Compute the geometry of the cells start, ..., end - 1 of a 3D grid.
+        Helper function for __compute_geometry_3d, the face geometry must be
+        computed first. If sub is given, it contains the sub-face quantities
+        of all faces in the grid.
+        """
+        num_cells = end - start
+        cell_faces = self.cell_faces[:, start:end]
+        if sub is None:
+            # Faces of the cells, with local numbering of cells and faces
+            faces = np.unique(cell_faces.indices)
+            cell_faces = cell_faces[faces]
+            sub = self.__subface_geometry_3d(faces)
+        else:
+            faces = np.arange(self.num_faces)
 
         # Temporary cell center coordinates as the mean of the face center
         # coordinates. The cells are divided into sub-tetrahedra (
@@ -444,7 +639,7 @@ class Grid(object):
         # Note that edge_2_cell will contain more elements than edge_2_face,
         # since the former will count internal faces twice (one for each
         # adjacent cell)
-        edge_2_cell = edge_2_face * np.abs(self.cell_faces)
+        edge_2_cell = sub["edge_2_face"] * np.abs(cell_faces)
         # Sort indices to avoid messing up the mappings later
         edge_2_cell.sort_indices()
 
@@ -454,14 +649,14 @@ class Grid(object):
 
         # Cell numbers are obtained from the columns in edge_2_cell.
         cell_numbers = matrix_compression.rldecode(
-            np.arange(self.num_cells), np.diff(edge_2_cell.indptr)
+            np.arange(num_cells), np.diff(edge_2_cell.indptr)
         )
         # Edge numbers from the rows. Here it is crucial that the indices
         # are sorted
         edge_numbers = edge_2_cell.indices
         # Face numbers are obtained from the face-node relations (with the
         # nodes doubling as representation of edges)
-        face_numbers = face_node_ind[edge_numbers]
+        face_numbers = sub["face_node_ind"][edge_numbers]
 
         # Number of edges per cell
         num_cell_edges = edge_2_cell.indptr[1:] - edge_2_cell.indptr[:-1]
@@ -474,15 +669,17 @@ class Grid(object):
             Intended use: Map sub-cell centroids to a quantity for the cell.
             """
             dim = weights.shape[0]
-            sz = arr.max() + 1
 
-            count = np.zeros((dim, sz))
+            count = np.zeros((dim, num_cells))
             for iter1 in range(dim):
-                count[iter1] = np.bincount(arr, weights=weights[iter1], minlength=sz)
+                count[iter1] = np.bincount(
+                    arr, weights=weights[iter1], minlength=num_cells
+                )
             return count
 
         # First estimate of cell centers as the mean of its faces' centers
         # Divide by num_cell_edges here since all edges bring in their faces
+        face_centers = self.face_centers[:, faces]
         tmp_cell_centers = bincount_nd(
             cell_numbers, face_centers[:, face_numbers] / num_cell_edges[cell_numbers]
         )
@@ -490,19 +687,21 @@ class Grid(object):
         # Distance from the temporary cell center to the sub-centroids (of
         # the tetrahedra associated with each edge)
         dist_cellcenter_subface = (
-            sub_centroids[:, edge_numbers] - tmp_cell_centers[:, cell_numbers]
+            sub["sub_centroids"][:, edge_numbers] - tmp_cell_centers[:, cell_numbers]
         )
 
         # Get sign of normal vectors, seen from all faces.
         # Make sure we get a numpy ndarray, and not a matrix (.A), and that
         # the array is 1D (squeeze)
-        orientation = np.squeeze(self.cell_faces[face_numbers, cell_numbers].A)
+        orientation = np.squeeze(cell_faces[face_numbers, cell_numbers].A)
 
         # Get outwards pointing sub-normals for all sub-faces: We need to
         # account for both the orientation of the face, and the orientation
         # of sub-faces relative to faces.
         outer_normals = (
-            sub_normals[:, edge_numbers] * orientation * sub_normals_sign[edge_numbers]
+            sub["sub_normals"][:, edge_numbers]
+            * orientation
+            * sub["sub_normals_sign"][edge_numbers]
         )
 
         # Volumes of tetrahedra are now given by the dot product between the
@@ -517,7 +716,9 @@ class Grid(object):
         assert np.all(tet_volumes > -1e-12)  # On the fly test
 
         # The cell volumes are now found by summing sub-tetrahedra
-        cell_volumes = np.bincount(cell_numbers, weights=tet_volumes)
+        cell_volumes = np.bincount(
+            cell_numbers, weights=tet_volumes, minlength=num_cells
+        )
         tri_centroids = 3 / 4 * dist_cellcenter_subface
 
         # Compute a correction to the temporary cell center, by a volume
@@ -528,8 +729,8 @@ class Grid(object):
         cell_centers = tmp_cell_centers + rel_centroid
 
         # ... and we're done
-        self.cell_centers = cell_centers
-        self.cell_volumes = cell_volumes
+        self.cell_centers[:, start:end] = cell_centers
+        self.cell_volumes[start:end] = cell_volumes
 
     def cell_nodes(self):
         """
@@ -540,17 +741,20 @@ class Grid(object):
                 connection between cell and node.
 
         """
-        # Local version of cell-face map, using absolute value to avoid
-        # artifacts from +- in the original version.
-        cf_loc = sps.csc_matrix(
-            (
-                np.abs(self.cell_faces.data),
-                self.cell_faces.indices,
-                self.cell_faces.indptr,
+
+        def compute():
+            # Local version of cell-face map, using absolute value to avoid
+            # artifacts from +- in the original version.
+            cf_loc = sps.csc_matrix(
+                (
+                    np.abs(self.cell_faces.data),
+                    self.cell_faces.indices,
+                    self.cell_faces.indptr,
+                )
             )
-        )
-        mat = (self.face_nodes * cf_loc) > 0
-        return mat
+            return (self.face_nodes * cf_loc) > 0
+
+        return self._cached_topology("cell_nodes", compute)
 
     def num_cell_nodes(self):
         """ Number of nodes per cell.
@@ -559,7 +763,9 @@ class Grid(object):
             np.ndarray, size num_cells: Number of nodes per cell.
 
         """
-        return self.cell_nodes().sum(axis=0).A.ravel("F")
+        return self._cached_topology(
+            "num_cell_nodes", lambda: self.cell_nodes().sum(axis=0).A.ravel("F")
+        )
 
     def get_internal_nodes(self):
         """
@@ -621,12 +827,15 @@ class Grid(object):
 
         """
         zeros = np.zeros(self.num_faces, dtype=np.bool)
-        self.tags["domain_boundary_faces"] = zeros
         if self.dim > 0:  # by default no 0d grid at the boundary of the domain
-            bd_faces = np.argwhere(
-                np.abs(self.cell_faces).sum(axis=1).A.ravel("F") == 1
-            ).ravel("F")
-            self.tags["domain_boundary_faces"][bd_faces] = True
+            bd_faces = self._cached_topology(
+                "domain_boundary_faces",
+                lambda: np.argwhere(
+                    np.abs(self.cell_faces).sum(axis=1).A.ravel("F") == 1
+                ).ravel("F"),
+            )
+            zeros[bd_faces] = True
+        self.tags["domain_boundary_faces"] = zeros
 
     def update_boundary_node_tag(self):
         """ Tag nodes on the boundary of the grid with boundary tag.
@@ -641,13 +850,14 @@ class Grid(object):
         zeros = np.zeros(self.num_nodes, dtype=np.bool)
 
         for face_tag, node_tag in mask.items():
-            self.tags[node_tag] = zeros.copy()
+            node_tags = zeros.copy()
             faces = np.where(self.tags[face_tag])[0]
             if faces.size > 0:
                 first = self.face_nodes.indptr[faces]
                 second = self.face_nodes.indptr[faces + 1]
                 nodes = self.face_nodes.indices[mcolon.mcolon(first, second)]
-                self.tags[node_tag][nodes] = True
+                node_tags[nodes] = True
+            self.tags[node_tag] = node_tags
 
 
     def cell_diameters(self, cn=None):
@@ -697,20 +907,38 @@ class Grid(object):
             np.ndarray, 2 x num_faces: Array representation of face-cell
                 relations
         """
-        n = self.cell_faces.tocsr()
-        d = np.diff(n.indptr)
-        rows = matrix_compression.rldecode(np.arange(d.size), d)
-        # Increase the data by one to distinguish cell indices from boundary
-        # cells
-        data = n.indices + 1
-        cols = ((n.data + 1) / 2).astype("i")
-        neighs = sps.coo_matrix((data, (rows, cols))).todense()
-        # Subtract 1 to get back to real cell indices
-        neighs -= 1
-        neighs = neighs.transpose().A.astype("int")
-        # Finally, we need to switch order of rows to get normal vectors
-        # pointing from first to second row.
-        return neighs[::-1]
+
+        def compute():
+            n = self.cell_faces.tocsr()
+            d = np.diff(n.indptr)
+            rows = matrix_compression.rldecode(np.arange(d.size), d)
+            # Increase the data by one to distinguish cell indices from boundary
+            # cells
+            data = n.indices + 1
+            cols = ((n.data + 1) / 2).astype("i")
+            neighs = sps.coo_matrix((data, (rows, cols))).todense()
+            # Subtract 1 to get back to real cell indices
+            neighs -= 1
+            neighs = neighs.transpose().A.astype("int")
+            # Finally, we need to switch order of rows to get normal vectors
+            # pointing from first to second row.
+            return neighs[::-1]
+
+        return self._cached_topology("cell_face_as_dense", compute)
+
+    def cell_face_triplets(self):
+        """
+        Obtain the nonzero elements of the cell-face relation, in the order
+        returned by sps.find(self.cell_faces). Subclasses may compute these
+        without forming the cell_faces matrix.
+
+        Returns:
+            np.ndarray: Face indices.
+            np.ndarray: Cell indices.
+            np.ndarray: Signs of the face normals, seen from the cells.
+
+        """
+        return sps.find(self.cell_faces)
 
     def cell_connection_map(self):
         """
@@ -723,19 +951,21 @@ class Grid(object):
                 The matrix is thus symmetric.
         """
 
-        # Create a copy of the cell-face relation, so that we can modify it at
-        # will
-        cell_faces = self.cell_faces.copy()
+        def compute():
+            # Create a copy of the cell-face relation, so that we can modify it
+            # at will
+            cell_faces = self.cell_faces.copy()
 
-        # Direction of normal vector does not matter here, only 0s and 1s
-        cell_faces.data = np.abs(cell_faces.data)
+            # Direction of normal vector does not matter here, only 0s and 1s
+            cell_faces.data = np.abs(cell_faces.data)
 
-        # Find connection between cells via the cell-face map
-        c2c = cell_faces.transpose() * cell_faces
-        # Only care about absolute values
-        c2c.data = np.clip(c2c.data, 0, 1).astype("bool")
+            # Find connection between cells via the cell-face map
+            c2c = cell_faces.transpose() * cell_faces
+            # Only care about absolute values
+            c2c.data = np.clip(c2c.data, 0, 1).astype("bool")
+            return c2c
 
-        return c2c
+        return self._cached_topology("cell_connection_map", compute)
 
     def bounding_box(self):
         """
@@ -748,38 +978,137 @@ class Grid(object):
         """
         return np.amin(self.nodes, axis=1), np.amax(self.nodes, axis=1)
 
-    def closest_cell(self, p):
+    def cell_center_tree(self):
+        """ Spatial index of the cell centers.
+
+        The index is built on the first call, and rebuilt only when the cell
+        centers are replaced, e.g. by compute_geometry().
+
+        Returns:
+            scipy.spatial.cKDTree: Tree of the cell centers, the data points
+                are ordered as the cells.
+
+        """
+        return self._cached_topology(
+            "cell_center_tree",
+            lambda: spatial.cKDTree(self.cell_centers.T),
+            identity=(self.cell_centers,),
+        )
+
+    def closest_cell(self, p, exact=False, tol=1e-10):
         """ For a set of points, find closest cell by cell center.
 
         If several centers have the same distance, one of them will be
         returned.
 
         For dim < 3, no checks are made if the point is in the plane / line
-        of the grid.
+        of the grid, unless exact is True.
 
         Parameters:
             p (np.ndarray, 3xn): Point coordinates. If p.shape[0] < 3,
                 additional points will be treated as zeros.
+            exact (boolean, optional): If True, find the cell containing each
+                point rather than the cell with closest center. The cells
+                are searched in order of increasing distance from the center.
+                For 2d grids, the test is comp_geom.is_point_in_cell, while
+                3d cells are assumed convex. Defaults to False.
+            tol (double, optional): Geometric tolerance used if exact is True.
 
         Returns:
             np.ndarray of ints: For each point, index of the cell with center
-                closest to the point.
+                closest to the point. If exact is True, index of the cell
+                containing the point, or -1 if the point is outside the grid.
         """
-        dim_p = p.shape[0]
         if p.shape[0] < 3:
             z = np.zeros((3 - p.shape[0], p.shape[1]))
             p = np.vstack((p, z))
 
-        def min_dist(pts):
-            c = self.cell_centers
-            d = np.sum(np.power(c - pts, 2), axis=0)
-            return np.argmin(d)
-
-        ci = np.empty(p.shape[1], dtype=np.int)
+        tree = self.cell_center_tree()
+        if not exact:
+            _, ci = tree.query(p.T)
+            return np.atleast_1d(ci).astype(np.int)
+
+        # Any cell containing a point has its center within the distance
+        # between the center and the nodes of the cell. The nearest centers
+        # are tested first, and the search is widened only if none of them
+        # contains the point, until the centers are further away than the
+        # largest such distance.
+        radius = self._cached_topology(
+            "cell_radius", self._cell_radius, identity=(self.cell_centers,)
+        )
+        max_dist = radius.max() + tol if radius.size > 0 else tol
+        ci = -np.ones(p.shape[1], dtype=np.int)
         for i in range(p.shape[1]):
-            ci[i] = min_dist(p[:, i].reshape((3, -1)))
+            checked = set()
+            k = min(8, self.num_cells)
+            while len(checked) < k:
+                dist, candidates = tree.query(p[:, i], k=k)
+                done = False
+                for d, c in zip(np.atleast_1d(dist), np.atleast_1d(candidates)):
+                    if d > max_dist:
+                        done = True
+                        break
+                    if c in checked:
+                        continue
+                    checked.add(c)
+                    if d <= radius[c] + tol and self._point_in_cell(p[:, i], c, tol):
+                        ci[i] = c
+                        done = True
+                        break
+                if done:
+                    break
+                k = min(2 * k, self.num_cells)
         return ci
 
+    def _cell_radius(self):
+        """ Distance between the center and the most distant node of each
+        cell.
+        """
+        nodes, cells, _ = sps.find(self.cell_nodes())
+        dist = np.sqrt(
+            np.sum((self.nodes[:, nodes] - self.cell_centers[:, cells]) ** 2, axis=0)
+        )
+        radius = np.zeros(self.num_cells)
+        np.maximum.at(radius, cells, dist)
+        return radius
+
+    def _point_in_cell(self, pt, c, tol):
+        """ Check if a point is inside a cell, see closest_cell().
+        """
+        if self.dim == 0:
+            return np.linalg.norm(pt - self.cell_centers[:, c]) < tol
+
+        cf = self.cell_faces
+        loc = slice(cf.indptr[c], cf.indptr[c + 1])
+        faces = cf.indices[loc]
+
+        if self.dim == 1:
+            start, end = self.face_centers[:, faces].T
+            return cg.dist_points_segments(pt, start, end)[0][0, 0] < tol
+
+        if self.dim == 2:
+            # Order the nodes of the cell to form a polygon
+            fn = self.face_nodes
+            pairs = np.array(
+                [fn.indices[fn.indptr[f] : fn.indptr[f + 1]] for f in faces]
+            ).T
+            poly = self.nodes[:, sort_points.sort_point_pairs(pairs)[0]]
+            R = cg.project_plane_matrix(poly, check_planar=False)
+            poly = np.dot(R, poly)
+            pt_loc = np.dot(R, pt)
+            if np.abs(pt_loc[2] - poly[2, 0]) > tol:
+                return False
+            return cg.is_point_in_cell(poly, pt_loc, if_make_planar=False)
+
+        # The point is on the inner side of all faces of the (convex) cell
+        sgn = cf.data[loc]
+        normals = self.face_normals[:, faces]
+        dist = np.sum(
+            normals * (pt[:, np.newaxis] - self.face_centers[:, faces]), axis=0
+        )
+        tol_loc = tol * np.linalg.norm(normals, axis=0)
+        return np.all(sgn * dist <= tol_loc)
+
     def initiate_face_tags(self):
         keys = tags.standard_face_tags()
         values = [np.zeros(self.num_faces, dtype=bool) for _ in keys]
@@ -794,3 +1123,63 @@ class Grid(object):
         """ Shorthand for np.argwhere.
         """
         return np.argwhere(true_false).ravel("F")
+
+    def clear_topology_cache(self):
+        """ Remove all cached topological maps, see class documentation.
+
+        Needed only if nodes, face_nodes or cell_faces are modified in place;
+        replacing these fields invalidates the cache automatically.
+        """
+        self._topology_cache = {}
+
+    def _topology_identity(self):
+        """ Objects defining the topology of the grid. Some grid operations
+        (e.g. splitting of faces) replace the index arrays of the sparse
+        matrices rather than the matrices, thus both are included.
+        """
+        fn = self.face_nodes
+        cf = self.cell_faces
+        return (
+            self.nodes,
+            fn,
+            fn.indices,
+            fn.indptr,
+            fn.data,
+            cf,
+            cf.indices,
+            cf.indptr,
+            cf.data,
+        )
+
+    def _cached_topology(self, key, compute, identity=()):
+        """ Look up a topological map in the cache, compute it if not present
+        or if the topology has been replaced since it was stored.
+
+        Parameters:
+            key (str or tuple): Name of the map.
+            compute (callable): Function without arguments that computes the
+                map.
+            identity (tuple, optional): Further objects the map depends on,
+                e.g. geometric fields. The map is recomputed if any of these
+                are replaced.
+
+        Returns:
+            The map. Arrays, and the arrays of sparse matrices, are flagged as
+                read-only, since the same object is returned by later calls.
+
+        """
+        identity = self._topology_identity() + tuple(identity)
+        entry = self._topology_cache.get(key)
+        if entry is not None and all(o is i for o, i in zip(entry[0], identity)):
+            self.topology_cache_hits += 1
+            return entry[1]
+
+        self.topology_cache_misses += 1
+        value = compute()
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        elif sps.issparse(value):
+            for arr in (value.data, value.indices, value.indptr):
+                arr.flags.writeable = False
+        self._topology_cache[key] = (identity, value)
+        return value
@@ -5,13 +5,83 @@ intersections in the form of a GridBucket.
 """
 
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from scipy import sparse as sps
+from scipy import spatial
 import numpy as np
 import networkx
 
-from porepy.utils import setmembership
+from porepy.grids.grid import Grid
+from porepy.grids.mortar_grid import MortarGrid, BoundaryMortar
+from porepy.utils import setmembership, tags
 from porepy.numerics.mixed_dim import condensation
 from porepy.params.data import Parameters
+from porepy.params import tensor, bc
+
+# Objects copied by GridBucket.copy() with copy_on_write
+_COPY_ON_WRITE_TYPES = (
+    Grid,
+    MortarGrid,
+    BoundaryMortar,
+    Parameters,
+    tensor.SecondOrderTensor,
+    tensor.FourthOrderTensor,
+    bc.BoundaryCondition,
+    bc.BoundaryConditionNode,
+    bc.BoundaryConditionVectorial,
+)
+
+
+def _copy_on_write(value, memo):
+    """ Copy a value, sharing its arrays read-only, see GridBucket.copy().
+
+    Numpy arrays are replaced by read-only views, and compressed sparse
+    matrices by matrices with read-only data and indices. The original arrays
+    are made read-only as well, since they are shared with the copy. Grids, mortar grids,
+    parameters, boundary conditions and tensors are copied, with their
+    attributes treated recursively. Dictionaries and tags are copied, while
+    other values are shared.
+
+    Parameters:
+        value (object): The value to be copied.
+        memo (dict): The copies made so far, by the id of the original. An
+            object referred to several times is copied once.
+
+    Returns:
+        object: The copy.
+
+    """
+    if id(value) in memo:
+        return memo[id(value)]
+
+    if isinstance(value, np.ndarray):
+        copy = value.view()
+        copy.flags.writeable = False
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        copy = {key: _copy_on_write(val, memo) for key, val in value.items()}
+    elif isinstance(value, tags.PackedTags):
+        copy = value.copy()
+    elif sps.isspmatrix_csr(value) or sps.isspmatrix_csc(value):
+        copy = value.__class__.__new__(value.__class__)
+        copy.__dict__.update(value.__dict__)
+        for key in ["data", "indices", "indptr"]:
+            setattr(copy, key, _copy_on_write(getattr(value, key), memo))
+    elif isinstance(value, _COPY_ON_WRITE_TYPES):
+        copy = value.__class__.__new__(value.__class__)
+        # Register the copy before the attributes, which may refer back to it
+        memo[id(value)] = copy
+        for key, val in value.__dict__.items():
+            if key == "_topology_cache":
+                copy.__dict__[key] = {}
+            else:
+                copy.__dict__[key] = _copy_on_write(val, memo)
+    else:
+        copy = value
+
+    memo[id(value)] = copy
+    return copy
 
 
 class GridBucket(object):
@@ -19,25 +89,121 @@ class GridBucket(object):
     Container for the hiererchy of grids formed by fractures and their
     intersection.
 
-    The information is stored in a graph borrowed from networkx, and the
-    GridBucket is to a large degree a wrapper around the graph. Each grid
-    defines a node in the graph, while edges are defined by grid pairs that
-    have a connection.
+    The GridBucket is a graph, where each grid defines a node, while edges are
+    defined by grid pairs that have a connection. The nodes and edges are
+    stored in contiguous lists, and are identified by their index in these
+    lists. The index of a grid, and of a grid pair, is found by a hash table,
+    thus all access to nodes and edges takes constant time.
 
-    To all nodes and vertexes, there is associated a dictionary (courtesy
-    networkx) that can store any type of data. Thus the GridBucket can double
-    as a data storage and management tool.
+    To all nodes and vertexes, there is associated a dictionary that can store
+    any type of data. Thus the GridBucket can double as a data storage and
+    management tool.
 
     Attributes:
-        graph (networkx.Graph): The of the grid. See above for further
-            description.
+        graph (networkx.Graph): Representation of the bucket as a networkx
+            graph, for use with the algorithms of networkx. The data
+            dictionaries of the graph are the ones of the bucket, but changes
+            in the structure of the graph are not reflected in the bucket.
 
     """
 
     def __init__(self):
-        self.graph = networkx.Graph(directed=False)
+        # Grid and data dictionary of each node
+        self._nodes = []
+        self._node_data = []
+        # Index of each grid in the node lists
+        self._node_index = {}
+        # For each node, the neighbor grids and the index of the edge between
+        # them, in order of insertion
+        self._adjacency = []
+        # Grid pair, as added, and data dictionary of each edge
+        self._edges = []
+        self._edge_data = []
+        # Index of each grid pair, in both orders, in the edge lists
+        self._edge_index = {}
+        # Arrays describing the topology, constructed on demand
+        self._topology = None
+        # networkx representation, and the topology it was constructed from
+        self._graph = None
         self.name = "grid bucket"
 
+    @property
+    def graph(self):
+        """ networkx.Graph: Graph representation of the bucket. See the class
+        documentation.
+
+        The graph is constructed at the first access, and kept until the
+        nodes or edges of the bucket change. The node and edge attribute
+        dictionaries of the graph are the data dictionaries of the bucket,
+        thus data written through the graph is seen by the bucket. Nodes and
+        edges added to or removed from the graph are not reflected in the
+        bucket; use the methods of the bucket to change its structure.
+        """
+        topology = self._topology_arrays()
+        if self._graph is None or self._graph[0] is not topology:
+            graph = networkx.Graph(directed=False)
+            graph.add_nodes_from(self._nodes)
+            for e, _ in self.edges():
+                graph.add_edge(*e)
+            # Share the data dictionaries. The dictionaries of the graph are
+            # private attributes from networkx 2.0, public before.
+            node_attr = graph._node if hasattr(graph, "_node") else graph.node
+            adj = graph._adj if hasattr(graph, "_adj") else graph.adj
+            for g, d in zip(self._nodes, self._node_data):
+                node_attr[g] = d
+            for (g0, g1), d in self.edges():
+                adj[g0][g1] = d
+                adj[g1][g0] = d
+            self._graph = (topology, graph)
+        return self._graph[1]
+
+    def _topology_arrays(self):
+        """ Arrays describing the topology of the bucket.
+
+        The arrays are constructed at the first call, and kept until the nodes
+        or edges of the bucket change.
+
+        Returns:
+            np.ndarray, dtype object: Grid of each node.
+            np.ndarray: Dimension of each node.
+            sps.csr_matrix: Node to node adjacency, the data is the index of
+                the edge. Within a row, the neighbors are in order of
+                insertion.
+            np.ndarray: Edges in the order of iteration, see self.edges().
+            np.ndarray (num_edges x 2): For each edge, in the order of
+                iteration, the index of its nodes.
+
+        """
+        if self._topology is None:
+            num_nodes = len(self._nodes)
+            grids = np.empty(num_nodes, dtype=np.object)
+            grids[:] = self._nodes
+
+            num_neigh = np.array([len(a) for a in self._adjacency], dtype=np.int)
+            indptr = np.hstack((0, np.cumsum(num_neigh)))
+            indices = np.array(
+                [self._node_index[h] for a in self._adjacency for h in a],
+                dtype=np.int,
+            )
+            edge_ind = np.array(
+                [e for a in self._adjacency for e in a.values()], dtype=np.int
+            )
+            adjacency = sps.csr_matrix(
+                (edge_ind, indices, indptr), shape=(num_nodes, num_nodes)
+            )
+
+            # An edge is visited from the node with the lowest index, and the
+            # edges of a node are visited in order of insertion. Edges from a
+            # node to itself are allowed.
+            rows = np.repeat(np.arange(num_nodes), num_neigh)
+            first = indices >= rows
+            edge_order = edge_ind[first]
+            edge_nodes = np.vstack((rows[first], indices[first])).T
+
+            dims = np.array([g.dim for g in self._nodes], dtype=np.int)
+            self._topology = (grids, dims, adjacency, edge_order, edge_nodes)
+        return self._topology
+
     # --------- Iterators -------------------------
 
     def __iter__(self):
@@ -49,8 +215,7 @@ class GridBucket(object):
             data: The dictionary storing all information in this node.
 
         """
-        for g in self.graph:
-            data = self.graph.node[g]
+        for g, data in zip(self._nodes, self._node_data):
             yield g, data
 
     def nodes(self):
@@ -64,21 +229,41 @@ class GridBucket(object):
             data: The dictionary storing all information in this node.
 
         """
-        for g in self.graph:
-            data = self.graph.node[g]
+        for g, data in zip(self._nodes, self._node_data):
             yield g, data
 
     def edges(self):
         """
         Iterator over the edges in the GridBucket
 
+        The edges are ordered according to their first node, and then in the
+        order they were added to the node. The first node of the edge is the
+        one first added to the bucket.
+
         Yields:
             e: Grid pair associated with the current edge.
             data: The dictionary storing all information in this edge..
 
         """
-        for e in self.graph.edges():
-            yield e, self.edge_props(e)
+        grids, _, _, edge_order, edge_nodes = self._topology_arrays()
+        for e, (i, j) in zip(edge_order, edge_nodes):
+            yield (grids[i], grids[j]), self._edge_data[e]
+
+    def edges_in_insertion_order(self):
+        """ Iterator over the edges in the GridBucket, in the order they were
+        added to the bucket.
+
+        Adding the edges to a bucket with the same nodes in this order
+        reproduces the order of self.edges().
+
+        Yields:
+            e: Grid pair associated with the current edge, in the order given
+                when the edge was added.
+            data: The dictionary storing all information in this edge.
+
+        """
+        for e, data in zip(self._edges, self._edge_data):
+            yield e, data
 
     # ---------- Navigate within the graph --------
 
@@ -101,10 +286,7 @@ class GridBucket(object):
         """
 
         if e[0].dim == e[1].dim:
-            if not (
-                "node_number" in self.graph.node[e[0]]
-                and "node_number" in self.graph.node[e[1]]
-            ):
+            if not all(self.has_nodes_prop(e, "node_number")):
                 self.assign_node_ordering()
 
             node_indexes = [self.node_props(g, "node_number") for g in e]
@@ -131,8 +313,8 @@ class GridBucket(object):
             object: A dictionary with keys and properties.
 
         """
-        for e in self.graph.edges([n]):
-            yield e, self.edge_props(e)
+        for h, e in self._adjacency[self._node_index[n]].items():
+            yield (n, h), self._edge_data[e]
 
     def node_neighbors(self, node, only_higher=False, only_lower=False):
         """
@@ -149,27 +331,38 @@ class GridBucket(object):
                 neighbors. Defaults to False.
 
         Return:
-            list of networkx.node: Neighbors of node 'node'
+            np.ndarray, dtype object: Neighbors of node 'node'
 
         Raises:
             ValueError if both only_higher and only_lower is True.
 
         """
+        if only_higher and only_lower:
+            raise ValueError("Cannot return both only higher and only lower")
 
-        neigh = np.array([n for n in self.graph.neighbors(node)])
+        grids, dims, adjacency, _, _ = self._topology_arrays()
+        i = self._node_index[node]
+        neigh = adjacency.indices[adjacency.indptr[i] : adjacency.indptr[i + 1]]
 
-        if not only_higher and not only_lower:
-            return neigh
-        elif only_higher and only_lower:
-            raise ValueError("Cannot return both only higher and only lower")
-        elif only_higher:
+        if only_higher:
             # Find the neighbours that are higher dimensional
-            is_high = np.array([w.dim > node.dim for w in neigh])
-            return neigh[is_high]
-        else:
-            # Find the neighbours that are higher dimensional
-            is_low = np.array([w.dim < node.dim for w in neigh])
-            return neigh[is_low]
+            neigh = neigh[dims[neigh] > dims[i]]
+        elif only_lower:
+            # Find the neighbours that are lower dimensional
+            neigh = neigh[dims[neigh] < dims[i]]
+        return grids[neigh]
+
+    def _edge(self, gp):
+        """ Index of the edge between a grid pair.
+
+        Raises:
+            KeyError if the two grids do not form an edge.
+
+        """
+        e = self._edge_index.get((gp[0], gp[1]))
+        if e is None:
+            raise KeyError("Unknown edge")
+        return e
 
     # ------------ Getters for grids
 
@@ -189,7 +382,7 @@ class GridBucket(object):
 
         """
         if cond is None:
-            cond = lambda g: True
+            return self._topology_arrays()[0].copy()
 
         return np.array([g for g, _ in self if cond(g)])
 
@@ -200,8 +393,8 @@ class GridBucket(object):
             list: Of grids of the specified dimension
 
         """
-
-        return self.get_grids(lambda g: g.dim == dim)
+        grids, dims, _, _, _ = self._topology_arrays()
+        return grids[dims == dim]
 
     def get_mortar_grids(self, cond=None, name="mortar_grid"):
         """
@@ -257,13 +450,16 @@ class GridBucket(object):
         if g is not None and not isinstance(g, list):
             g = [g]
 
+        if g is None:
+            data = self._node_data
+        else:
+            data = [
+                self._node_data[self._node_index[h]] for h in g if h in self._node_index
+            ]
+
         for key in np.atleast_1d(keys):
-            if g is None:
-                networkx.set_node_attributes(self.graph, name=key, values=None)
-            else:
-                for h, n in self:
-                    if h in g:
-                        n[key] = None
+            for n in data:
+                n[key] = None
 
     def add_edge_props(self, keys, grid_pairs=None):
         """
@@ -286,20 +482,22 @@ class GridBucket(object):
             KeyError if a grid pair is not an existing edge in the grid.
 
         """
-        for key in np.atleast_1d(keys):
-            if grid_pairs is None:
-                networkx.set_edge_attributes(self.graph, name=key, values=None)
-            else:
-                for gp in grid_pairs:
-                    if tuple(gp) in self.graph.edges():
-                        self.graph.adj[gp[0]][gp[1]][key] = None
-                    elif tuple(gp[::-1]) in self.graph.edges():
-                        self.graph.adj[gp[1]][gp[0]][key] = None
-                    else:
-                        raise KeyError(
-                            "Cannot assign property to undefined\
+        if grid_pairs is None:
+            data = self._edge_data
+        else:
+            data = []
+            for gp in grid_pairs:
+                e = self._edge_index.get((gp[0], gp[1]))
+                if e is None:
+                    raise KeyError(
+                        "Cannot assign property to undefined\
                                          edge"
-                        )
+                    )
+                data.append(self._edge_data[e])
+
+        for key in np.atleast_1d(keys):
+            for d in data:
+                d[key] = None
 
     # ------------ Getters for node and edge properties
 
@@ -317,7 +515,7 @@ class GridBucket(object):
             object: The tested property.
 
         """
-        return tuple([key in self.graph.node[g] for g in grids])
+        return tuple([key in self._node_data[self._node_index[g]] for g in grids])
 
     def node_props(self, g, key=None):
         """
@@ -334,9 +532,9 @@ class GridBucket(object):
 
         """
         if key is None:
-            return self.graph.node[g]
+            return self._node_data[self._node_index[g]]
         else:
-            return self.graph.node[g][key]
+            return self._node_data[self._node_index[g]][key]
 
     def edge_props(self, gp, key=None):
         """
@@ -356,18 +554,10 @@ class GridBucket(object):
             KeyError if the two grids do not form an edge.
 
         """
-        if tuple(gp) in self.graph.edges():
-            if key is None:
-                return self.graph.adj[gp[0]][gp[1]]
-            else:
-                return self.graph.adj[gp[0]][gp[1]][key]
-        elif tuple(gp[::-1]) in self.graph.edges():
-            if key is None:
-                return self.graph.adj[gp[1]][gp[0]]
-            else:
-                return self.graph.adj[gp[1]][gp[0]][key]
+        if key is None:
+            return self._edge_data[self._edge(gp)]
         else:
-            raise KeyError("Unknown edge")
+            return self._edge_data[self._edge(gp)][key]
 
     # ------------- Setters for edge and grid properties
 
@@ -387,7 +577,7 @@ class GridBucket(object):
             val: Value to be added.
 
         """
-        self.graph.node[g][key] = val
+        self._node_data[self._node_index[g]][key] = val
 
     def set_edge_prop(self, gp, key, val):
         """ Set the value of a property of a given edge.
@@ -408,12 +598,7 @@ class GridBucket(object):
             KeyError if the two grids do not form an edge.
 
         """
-        if tuple(gp) in self.graph.edges():
-            self.graph.adj[gp[0]][gp[1]][key] = val
-        elif tuple(gp[::-1]) in self.graph.edges():
-            self.graph.adj[gp[1]][gp[0]][key] = val
-        else:
-            raise KeyError("Unknown edge")
+        self._edge_data[self._edge(gp)][key] = val
 
     # ------------ Removers for nodes properties ----------
 
@@ -445,14 +630,16 @@ class GridBucket(object):
         if g is not None and not isinstance(g, list):
             g = [g]
 
+        if g is None:
+            data = self._node_data
+        else:
+            data = [
+                self._node_data[self._node_index[h]] for h in g if h in self._node_index
+            ]
+
         for key in np.atleast_1d(keys):
-            if g is None:
-                for _, d in self:
-                    del d[key]
-            else:
-                for h, d in self:
-                    if h in g:
-                        del d[key]
+            for d in data:
+                del d[key]
 
     def remove_edge_props(self, keys, e=None):
         """
@@ -512,9 +699,16 @@ class GridBucket(object):
 
         """
         new_grids = np.atleast_1d(new_grids)
-        if np.any([i is j for i in new_grids for j in self.graph]):
+        if np.any([g in self._node_index for g in new_grids]):
             raise ValueError("Grid already defined in bucket")
-        [self.graph.add_node(g) for g in new_grids]
+        for g in new_grids:
+            if g in self._node_index:
+                continue
+            self._node_index[g] = len(self._nodes)
+            self._nodes.append(g)
+            self._node_data.append({})
+            self._adjacency.append({})
+        self._topology = None
 
     def add_edge(self, grids, face_cells):
         """
@@ -539,22 +733,36 @@ class GridBucket(object):
         """
         assert np.asarray(grids).size == 2
 
-        if (
-            tuple(grids) in self.graph.edges()
-            or tuple(grids[::-1]) in self.graph.edges()
-        ):
+        if (grids[0], grids[1]) in self._edge_index:
             raise ValueError("Cannot add existing edge")
 
         # The higher-dimensional grid is the first node of the edge.
         if grids[0].dim - 1 == grids[1].dim:
-            self.graph.add_edge(*grids, face_cells=face_cells)
+            g0, g1 = grids[0], grids[1]
         elif grids[0].dim == grids[1].dim - 1:
-            self.graph.add_edge(*grids[::-1], face_cells=face_cells)
+            g0, g1 = grids[1], grids[0]
         elif grids[0].dim == grids[1].dim:
-            self.graph.add_edge(*grids, face_cells=face_cells)
+            g0, g1 = grids[0], grids[1]
         else:
             raise ValueError("Grid dimension mismatch")
 
+        # Nodes not in the bucket are added
+        self.add_nodes([g for g in (g0, g1) if g not in self._node_index])
+        self._insert_edge(g0, g1, {"face_cells": face_cells})
+
+    def _insert_edge(self, g0, g1, data):
+        """ Append an edge to the edge lists, and to the adjacency of its
+        nodes.
+        """
+        e = len(self._edges)
+        self._edges.append((g0, g1))
+        self._edge_data.append(data)
+        self._edge_index[(g0, g1)] = e
+        self._edge_index[(g1, g0)] = e
+        self._adjacency[self._node_index[g0]][g1] = e
+        self._adjacency[self._node_index[g1]][g0] = e
+        self._topology = None
+
     # --------- Remove and update nodes
 
     def remove_node(self, node):
@@ -566,7 +774,7 @@ class GridBucket(object):
 
         """
 
-        self.graph.remove_node(node)
+        self._remove_nodes([node])
 
     def remove_nodes(self, cond):
         """
@@ -580,7 +788,46 @@ class GridBucket(object):
         if cond is None:
             cond = lambda g: True
 
-        self.graph.remove_nodes_from([g for g in self.graph if cond(g)])
+        self._remove_nodes([g for g in self._nodes if cond(g)])
+
+    def _remove_nodes(self, grids):
+        """
+        Remove nodes, and related edges, from the grid bucket. The remaining
+        nodes and edges keep their order.
+
+        Parameters:
+            grids: the grids to remove.
+
+        Raises:
+            KeyError if a grid is not in the bucket.
+
+        """
+        removed = set(self._node_index[g] for g in grids)
+        if not removed:
+            return
+        keep = [i for i in range(len(self._nodes)) if i not in removed]
+        keep_edges = [
+            e
+            for e, (g0, g1) in enumerate(self._edges)
+            if self._node_index[g0] not in removed
+            and self._node_index[g1] not in removed
+        ]
+        new_edge = dict(zip(keep_edges, range(len(keep_edges))))
+
+        self._nodes = [self._nodes[i] for i in keep]
+        self._node_data = [self._node_data[i] for i in keep]
+        self._node_index = dict(zip(self._nodes, range(len(self._nodes))))
+        self._adjacency = [
+            {h: new_edge[e] for h, e in self._adjacency[i].items() if e in new_edge}
+            for i in keep
+        ]
+        self._edges = [self._edges[e] for e in keep_edges]
+        self._edge_data = [self._edge_data[e] for e in keep_edges]
+        self._edge_index = {}
+        for e, (g0, g1) in enumerate(self._edges):
+            self._edge_index[(g0, g1)] = e
+            self._edge_index[(g1, g0)] = e
+        self._topology = None
 
     def update_nodes(self, new, old):
         """
@@ -596,7 +843,31 @@ class GridBucket(object):
         old = np.atleast_1d(old)
         assert new.size == old.size
 
-        networkx.relabel_nodes(self.graph, dict(zip(new, old)), False)
+        # The grids in new are replaced by the ones in old, which take their
+        # position, data and edges
+        for g_new, g_old in zip(new, old):
+            if g_new is g_old:
+                continue
+            if g_old in self._node_index:
+                raise ValueError("Grid already defined in bucket")
+            i = self._node_index.pop(g_new)
+            self._nodes[i] = g_old
+            self._node_index[g_old] = i
+            for e in self._adjacency[i].values():
+                g0, g1 = self._edges[e]
+                self._edge_index.pop((g0, g1))
+                self._edge_index.pop((g1, g0), None)
+                g0 = g_old if g0 is g_new else g0
+                g1 = g_old if g1 is g_new else g1
+                self._edges[e] = (g0, g1)
+                self._edge_index[(g0, g1)] = e
+                self._edge_index[(g1, g0)] = e
+                for g in (g0, g1):
+                    a = self._adjacency[self._node_index[g]]
+                    self._adjacency[self._node_index[g]] = {
+                        (g_old if h is g_new else h): f for h, f in a.items()
+                    }
+        self._topology = None
 
     def eliminate_node(self, node):
         """
@@ -696,7 +967,7 @@ class GridBucket(object):
         # Loop over grids in decreasing dimensions
         for dim in range(self.dim_max(), self.dim_min() - 1, -1):
             for g in self.grids_of_dimension(dim):
-                n = self.graph.node[g]
+                n = self.node_props(g)
                 # Get old value, issue warning if not equal to the new one.
                 num = n.get("node_number", -1)
                 if ordering_exists and num != counter:
@@ -735,7 +1006,7 @@ class GridBucket(object):
                     continue
 
                 # Obtain the old node number
-                n = self.graph.node[g]
+                n = self.node_props(g)
                 old_number = n.get("node_number", -1)
                 # And replace it if it is higher than the removed one
                 if old_number > removed_number:
@@ -775,7 +1046,7 @@ class GridBucket(object):
         )
         return trg_2_src_nodes
 
-    def cell_global2loc(self):
+    def cell_global2loc(self, as_matrix=True):
         """
         Create a global to local cell-mapping.
 
@@ -798,60 +1069,160 @@ class GridBucket(object):
         If the GridBucket has mortar grids on the edges, a corresponding
         restriction from global mortar cells to local mortar cells will be
         made.
-        """
 
+        The global ordering follows the node numbers (edge numbers for the
+        mortar cells), and is computed from the offsets of the blocks in a
+        single pass over the nodes and edges.
+
+        Parameters:
+            as_matrix (boolean, optional): If True (default), the restriction
+                is a sparse matrix. If False, it is the slice of the local
+                cells in the global ordering, thus the restriction of a global
+                vector x is x[R], while the prolongation of a local vector y is
+                obtained by x[R] = y.
+
+        """
         # Create node restriction
         self.add_node_props("cell_global2loc")
-        for g, d in self:
-            pos_i = d["node_number"]
-            mat = np.empty(self.num_graph_nodes(), dtype=np.object)
-            # first initial empty matrix
-            for g_j, d_j in self:
-                pos_j = d_j["node_number"]
-                mat[pos_j] = sps.coo_matrix((g.num_cells, g_j.num_cells))
-
-            # overwrite the local matrix for grid g
-            mat[pos_i] = sps.eye(g.num_cells)
-            d["cell_global2loc"] = sps.hstack(mat, "csr")
+        blocks = [(d["node_number"], g.num_cells, d) for g, d in self]
+        self._assign_global2loc(blocks, as_matrix)
 
         # create mortar restriction
-        for _, d in self.edges():
-            if not d.get("mortar_grid"):
-                continue
-            gm = d["mortar_grid"]
-            pos_i = d["edge_number"]
-            mat = np.empty(self.num_graph_edges(), dtype=np.object)
-            # first initial empty matrix
-            for _, d_j in self.edges():
-                gm_j = d_j["mortar_grid"]
-                pos_j = d_j["edge_number"]
-                mat[pos_j] = sps.coo_matrix((gm.num_cells, gm_j.num_cells))
-
-            # overwrite the local matrix for grid g
-            mat[pos_i] = sps.eye(gm.num_cells)
+        blocks = [
+            (d["edge_number"], d["mortar_grid"].num_cells, d)
+            for _, d in self.edges()
+            if d.get("mortar_grid")
+        ]
+        self._assign_global2loc(blocks, as_matrix)
 
-            d["cell_global2loc"] = sps.hstack(mat, "csr")
+    def _assign_global2loc(self, blocks, as_matrix):
+        """ Assign the restriction from the global to the local cells of
+        blocks, given as tuples of position in the global ordering, number of
+        cells and data dictionary. See cell_global2loc().
+        """
+        if len(blocks) == 0:
+            return
+        pos = np.array([b[0] for b in blocks])
+        size = np.array([b[1] for b in blocks], dtype=np.int)
+        order = np.argsort(pos)
+        offset = np.empty(size.size, dtype=np.int)
+        offset[order] = np.hstack((0, np.cumsum(size[order])[:-1]))
+        num_global = np.sum(size)
+
+        for (_, n, d), start in zip(blocks, offset):
+            if as_matrix:
+                d["cell_global2loc"] = sps.csr_matrix(
+                    (np.ones(n), np.arange(start, start + n), np.arange(n + 1)),
+                    shape=(n, num_global),
+                )
+            else:
+                d["cell_global2loc"] = slice(start, start + n)
 
-    def compute_geometry(self):
+    def compute_geometry(self, chunk_size=None, num_threads=None):
         """Compute geometric quantities for the grids.
-        """
 
-        [g.compute_geometry() for g, _ in self]
+        Parameters:
+            chunk_size (int, optional): Maximum number of faces and cells
+                processed at once for the 3d grids, see
+                Grid.compute_geometry().
+            num_threads (int, optional): Number of threads. The 3d grids are
+                processed one at a time, with their blocks distributed on the
+                threads. The remaining grids and the mortar grids are
+                independent, and are distributed on the threads. Defaults
+                to 1.
+
+        """
+        num_threads = 1 if num_threads is None else num_threads
+
+        grids_3d = [g for g, _ in self if g.dim == 3]
+        for g in grids_3d:
+            g.compute_geometry(chunk_size=chunk_size, num_threads=num_threads)
+
+        others = [g for g, _ in self if g.dim < 3]
+        others += [d["mortar_grid"] for _, d in self.edges() if d.get("mortar_grid")]
+        if num_threads > 1 and len(others) > 1:
+            with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                list(executor.map(lambda g: g.compute_geometry(), others))
+        else:
+            [g.compute_geometry() for g in others]
+
+    def compact(self, float32_geometry=False):
+        """Convert the grids and mortar grids to a compact storage mode, see
+        Grid.compact(). This should be the final step of the construction of
+        the bucket.
+
+        Parameters:
+            float32_geometry (boolean, optional): Store the geometry in single
+                precision. Defaults to False.
+
+        """
+        [g.compact(float32_geometry) for g, _ in self]
         [
-            d["mortar_grid"].compute_geometry()
+            d["mortar_grid"].compact(float32_geometry)
             for _, d in self.edges()
             if d.get("mortar_grid")
         ]
 
-    def copy(self):
-        """Make a copy of the grid bucket utilizing the built-in copy function
-        of networkx.
+    def copy(self, copy_on_write=False):
+        """Make a copy of the grid bucket. The grids and the values of the
+        data dictionaries are shared with the original bucket, while the data
+        dictionaries themselves are copied.
+
+        With copy_on_write, the copy has its own grids, mortar grids,
+        parameters, boundary conditions and tensors, while their arrays, and
+        the arrays in the data dictionaries, are shared read-only with the
+        original bucket. No array is thus copied, but an array modified in
+        place raises a ValueError: a new array must instead be assigned, which
+        then belongs to the modified bucket only. This holds for both sides,
+        as the shared arrays are made read-only also in the original bucket.
+        Several variants of a model can in this way be set up from one bucket
+        without duplicating the mesh, and without modifying each other.
+
+        Parameters:
+            copy_on_write (boolean, optional): Share the arrays read-only, see
+                above. Defaults to False.
+
+        Returns:
+            GridBucket: The copy.
 
         """
+        if copy_on_write:
+            memo = {}
+            copy_value = lambda v: _copy_on_write(v, memo)
+        else:
+            copy_value = lambda v: v
+
         gb_copy = GridBucket()
-        gb_copy.graph = self.graph.copy()
+        gb_copy._nodes = [copy_value(g) for g in self._nodes]
+        gb_copy._node_data = [
+            {key: copy_value(val) for key, val in d.items()} for d in self._node_data
+        ]
+        gb_copy._node_index = dict(zip(gb_copy._nodes, range(len(gb_copy._nodes))))
+        gb_copy._adjacency = [{} for _ in self._nodes]
+        # The edges are inserted in the order of iteration
+        for e in self._topology_arrays()[3]:
+            g0, g1 = [gb_copy._nodes[self._node_index[g]] for g in self._edges[e]]
+            d = {key: copy_value(val) for key, val in self._edge_data[e].items()}
+            gb_copy._insert_edge(g0, g1, d)
         return gb_copy
 
+    def view(self, cond=None):
+        """Make a read-only view of the grid bucket, optionally restricted to
+        the grids satisfying a condition, see GridBucketView.
+
+        Example:
+        gb_view = self.gb.view(lambda g: g.dim > self.gb.dim_min())
+
+        Parameters:
+            cond: Predicate to select a grid. If None is given (default), all
+                grids are in the view.
+
+        Returns:
+            GridBucketView: The view.
+
+        """
+        return GridBucketView(self, cond)
+
     def find_shared_face(self, g0, g1, g_l):
         """
         Given two nd grids meeting at a (n-1)d node (to be removed), find which two
@@ -939,7 +1310,7 @@ class GridBucket(object):
                 relative 'node_number'.
 
         """
-        i = np.zeros(self.graph.number_of_edges(), dtype=int)
+        i = np.zeros(self.num_graph_edges(), dtype=int)
         j = np.zeros(i.size, dtype=int)
         values = np.zeros(i.size)
 
@@ -998,7 +1369,7 @@ class GridBucket(object):
         """
         if cond is None:
             cond = lambda g: True
-        diam_g = [np.amax(g.cell_diameters()) for g in self.graph if cond(g)]
+        diam_g = [np.amax(g.cell_diameters()) for g in self._nodes if cond(g)]
 
         diam_mg = [
             np.amax(d["mortar_grid"].cell_diameters())
@@ -1015,7 +1386,7 @@ class GridBucket(object):
         c_0s = np.empty((3, self.num_graph_nodes()))
         c_1s = np.empty((3, self.num_graph_nodes()))
 
-        for i, g in enumerate(self.graph):
+        for i, g in enumerate(self._nodes):
             c_0s[:, i], c_1s[:, i] = g.bounding_box()
 
         min_vals = np.amin(c_0s, axis=1)
@@ -1033,6 +1404,70 @@ class GridBucket(object):
         else:
             return min_vals, max_vals
 
+    def closest_cell(self, p, cond=None, exact=False, tol=1e-10):
+        """
+        For a set of points, find the closest cell by cell center among the
+        grids of the bucket, see also Grid.closest_cell().
+
+        The cell centers of all grids are collected in a spatial index, which
+        is built on the first call, and rebuilt only if the set of grids or
+        their cell centers change.
+
+        Parameters:
+            p (np.ndarray, 3xn): Point coordinates. If p.shape[0] < 3,
+                additional points will be treated as zeros.
+            cond: optional, predicate with a grid as input, to select the grids
+                to search.
+            exact (boolean, optional): If True, find the cell containing each
+                point. If several grids contain the point, the grid of highest
+                dimension is chosen. Defaults to False.
+            tol (double, optional): Geometric tolerance used if exact is True.
+
+        Returns:
+            list of grids: For each point, the grid of the cell found. None if
+                exact is True and no cell contains the point.
+            np.ndarray of ints: For each point, index of the cell in its grid,
+                -1 if no cell contains the point.
+
+        """
+        if p.shape[0] < 3:
+            z = np.zeros((3 - p.shape[0], p.shape[1]))
+            p = np.vstack((p, z))
+        grids = self.get_grids(cond)
+        num_pts = p.shape[1]
+
+        if exact:
+            found_grid = np.empty(num_pts, dtype=np.object)
+            cells = -np.ones(num_pts, dtype=np.int)
+            # Search the higher dimensional grids first
+            for g in sorted(grids, key=lambda g: -g.dim):
+                not_found = np.where(cells < 0)[0]
+                if not_found.size == 0:
+                    break
+                ci = g.closest_cell(p[:, not_found], exact=True, tol=tol)
+                cells[not_found] = ci
+                found_grid[not_found[ci >= 0]] = g
+            return list(found_grid), cells
+
+        # The cached index is valid if the grids and their cell centers are
+        # unchanged
+        identity = tuple(o for g in grids for o in (g, g.cell_centers))
+        cached = getattr(self, "_cell_center_tree", None)
+        if cached is None or not (
+            len(cached[0]) == len(identity)
+            and all(o is i for o, i in zip(cached[0], identity))
+        ):
+            centers = np.hstack([g.cell_centers for g in grids])
+            offset = np.cumsum([0] + [g.num_cells for g in grids])
+            cached = (identity, spatial.cKDTree(centers.T), offset)
+            self._cell_center_tree = cached
+
+        _, ind = cached[1].query(p.T)
+        ind = np.atleast_1d(ind)
+        offset = cached[2]
+        grid_ind = np.searchsorted(offset, ind, side="right") - 1
+        return [grids[i] for i in grid_ind], ind - offset[grid_ind]
+
     def size(self):
         """
         Returns:
@@ -1047,7 +1482,7 @@ class GridBucket(object):
             int: Minimum dimension of the grids present in the hierarchy.
 
         """
-        return np.amin([g.dim for g, _ in self])
+        return np.amin(self._topology_arrays()[1])
 
     def dim_max(self):
         """
@@ -1055,7 +1490,7 @@ class GridBucket(object):
             int: Maximum dimension of the grids present in the hierarchy.
 
         """
-        return np.amax([g.dim for g, _ in self])
+        return np.amax(self._topology_arrays()[1])
 
     def all_dims(self):
         """
@@ -1063,7 +1498,7 @@ class GridBucket(object):
             int: Active dimensions of the grids present in the hierarchy.
 
         """
-        return np.unique([g.dim for g, _ in self])
+        return np.unique(self._topology_arrays()[1])
 
     def num_cells(self, cond=None):
         """
@@ -1079,7 +1514,7 @@ class GridBucket(object):
         """
         if cond is None:
             cond = lambda g: True
-        return np.sum([g.num_cells for g in self.graph if cond(g)])
+        return np.sum([g.num_cells for g in self._nodes if cond(g)])
 
     def num_mortar_cells(self, cond=None):
         """
@@ -1117,7 +1552,7 @@ class GridBucket(object):
         """
         if cond is None:
             cond = lambda g: True
-        return np.sum([g.num_faces for g in self.graph if cond(g)])
+        return np.sum([g.num_faces for g in self._nodes if cond(g)])
 
     def num_nodes(self, cond=None):
         """
@@ -1133,7 +1568,7 @@ class GridBucket(object):
         """
         if cond is None:
             cond = lambda g: True
-        return np.sum([g.num_nodes for g in self.graph if cond(g)])
+        return np.sum([g.num_nodes for g in self._nodes if cond(g)])
 
     def num_graph_nodes(self):
         """
@@ -1143,7 +1578,7 @@ class GridBucket(object):
             int: Number of nodes in the graph.
 
         """
-        return self.graph.number_of_nodes()
+        return len(self._nodes)
 
     def num_graph_edges(self):
         """
@@ -1153,7 +1588,7 @@ class GridBucket(object):
             int: Number of edges in the graph.
 
         """
-        return self.graph.number_of_edges()
+        return len(self._edges)
 
     def num_nodes_edges(self):
         """
@@ -1190,3 +1625,84 @@ class GridBucket(object):
             gl = self.grids_of_dimension(dim)
             s += str(len(gl)) + " grids of dimension " + str(dim) + "\n"
         return s
+
+
+class GridBucketView(GridBucket):
+    """
+    Read-only view of the grids of a GridBucket satisfying a condition, and of
+    the edges between them.
+
+    The view shares the grids and the data dictionaries of the bucket, and
+    supports the methods of GridBucket that do not modify the bucket. The data
+    dictionaries are read-only, while the methods modifying the bucket, its
+    data or its grids raise a ValueError. The view contains the nodes and
+    edges of the bucket at its creation; nodes and edges added later are not
+    part of it.
+
+    Methods storing their results in the data dictionaries are not available
+    on the view, notably assign_node_ordering() and cell_global2loc(). These
+    should be called on the bucket before the view is made. Without a node
+    ordering, nodes_of_edge() orders grids of the same dimension as
+    assign_node_ordering() would, without storing the ordering.
+
+    A modifiable bucket is obtained from the view by copy(). Note that
+    GridBucket.duplicate_without_dimension() still makes its own copy of the
+    bucket, since it modifies the copy; it is not replaced by a view.
+
+    """
+
+    def __init__(self, gb, cond=None):
+        super(GridBucketView, self).__init__()
+        if cond is None:
+            cond = lambda g: True
+
+        self.name = gb.name
+        self._nodes = [g for g in gb._nodes if cond(g)]
+        self._node_data = [
+            MappingProxyType(gb._node_data[gb._node_index[g]]) for g in self._nodes
+        ]
+        self._node_index = dict(zip(self._nodes, range(len(self._nodes))))
+        self._adjacency = [{} for _ in self._nodes]
+        # Edges inserted in their order in the bucket keep the order of the
+        # edges of each node
+        for (g0, g1), d in zip(gb._edges, gb._edge_data):
+            if g0 in self._node_index and g1 in self._node_index:
+                self._insert_edge(g0, g1, MappingProxyType(d))
+
+    def nodes_of_edge(self, e):
+        """
+        Obtain the vertices of an edge, see GridBucket.nodes_of_edge().
+
+        If the edge is between grids of the same dimension, and no node
+        ordering exists, the grids are ordered by their position in the view.
+        Within a dimension, this is the ordering assigned by
+        assign_node_ordering(), which cannot be called on the view.
+
+        """
+        if e[0].dim == e[1].dim and not all(self.has_nodes_prop(e, "node_number")):
+            if self._node_index[e[0]] < self._node_index[e[1]]:
+                return e[0], e[1]
+            else:
+                return e[1], e[0]
+        return super(GridBucketView, self).nodes_of_edge(e)
+
+    def _read_only(self, *args, **kwargs):
+        raise ValueError("A view of a grid bucket cannot be modified")
+
+    add_nodes = _read_only
+    add_edge = _read_only
+    remove_node = _read_only
+    remove_nodes = _read_only
+    update_nodes = _read_only
+    eliminate_node = _read_only
+    add_node_props = _read_only
+    add_edge_props = _read_only
+    set_node_prop = _read_only
+    set_edge_prop = _read_only
+    remove_node_props = _read_only
+    remove_edge_props = _read_only
+    assign_node_ordering = _read_only
+    update_node_ordering = _read_only
+    cell_global2loc = _read_only
+    compute_geometry = _read_only
+    compact = _read_only
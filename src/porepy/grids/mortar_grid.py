@@ -5,6 +5,8 @@ import numpy as np
 from enum import Enum
 from scipy import sparse as sps
 
+from porepy.utils import sparse_mat
+
 
 # Module level constants, used to define sides of a mortar grid.
 # This is in essence an Enum, but that led to trouble in pickling a GridBucket.
@@ -172,6 +174,24 @@ class MortarGrid(object):
 
     # ------------------------------------------------------------------------------#
 
+    def compact(self, float32_geometry=False):
+        """
+        Convert the side grids and the mappings to a compact storage mode, see
+        Grid.compact(). The mappings get int32 index arrays, their weights
+        are kept in double precision.
+
+        Parameters:
+            float32_geometry (boolean, optional): Store the geometry in single
+                precision. Defaults to False.
+        """
+        [g.compact(float32_geometry) for g in self.side_grids.values()]
+        self.high_to_mortar_int = sparse_mat.compact_indices(self.high_to_mortar_int)
+        self.low_to_mortar_int = sparse_mat.compact_indices(self.low_to_mortar_int)
+        if float32_geometry:
+            self.cell_volumes = self.cell_volumes.astype(np.float32)
+
+    # ------------------------------------------------------------------------------#
+
     def update_mortar(self, side_matrix):
         """
         Update the low_to_mortar_int and high_to_mortar_int maps when the mortar grids
@@ -465,3 +485,22 @@ class BoundaryMortar(object):
         We assume that they are not aligned with x (1d) or x, y (2d).
         """
         [g.compute_geometry() for g in self.side_grids.values()]
+
+    # ------------------------------------------------------------------------------#
+
+    def compact(self, float32_geometry=False):
+        """
+        Convert the side grids and the mappings to a compact storage mode, see
+        MortarGrid.compact().
+
+        Parameters:
+            float32_geometry (boolean, optional): Store the geometry in single
+                precision. Defaults to False.
+        """
+        [g.compact(float32_geometry) for g in self.side_grids.values()]
+        self.left_to_mortar_int = sparse_mat.compact_indices(self.left_to_mortar_int)
+        self.right_to_mortar_int = sparse_mat.compact_indices(
+            self.right_to_mortar_int
+        )
+        if float32_geometry:
+            self.cell_volumes = self.cell_volumes.astype(np.float32)
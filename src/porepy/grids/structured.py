@@ -11,6 +11,7 @@ import scipy as sp
 import scipy.sparse as sps
 
 from porepy.grids.grid import Grid
+from porepy.utils import sparse_mat
 
 
 class TensorGrid(Grid):
@@ -330,3 +331,327 @@ class CartGrid(TensorGrid):
                 "Cartesian grid only implemented for up to three \
             dimensions"
             )
+
+
+class ImplicitTensorGrid(TensorGrid):
+    """Tensor grid where topology and geometry are computed from the
+    structured indexing, rather than stored.
+
+    The numbering of nodes, faces and cells is the same as for TensorGrid.
+    The node coordinates and the face-node and cell-face relations are
+    assembled the first time they are accessed, thus methods that only need
+    the number of entities, the boundary tags or the geometry can be used
+    without forming them. compute_geometry() computes the geometry directly
+    from the coordinate lines, and the TPFA discretization obtains the
+    cell-face connections from cell_face_triplets() without assembling
+    cell_faces.
+
+    For information on attributes and methods, see the documentation of the
+    parent Grid class.
+
+    """
+
+    def __init__(self, x, y=None, z=None, name=None):
+        """
+        Constructor for 1D or 2D or 3D implicit tensor grid
+
+        Parameters
+            x (np.ndarray): Node coordinates in x-direction
+            y (np.ndarray): Node coordinates in y-direction. Defaults to
+                None, in which case the grid is 1D.
+            z (np.ndarray): Node coordinates in z-direction. Defaults to
+                None, in which case the grid is 2D.
+            name (str): Name of grid. Defaults to ImplicitTensorGrid.
+        """
+        if name is None:
+            name = "ImplicitTensorGrid"
+
+        self.coordinate_lines = [
+            np.asarray(c, dtype=np.float) for c in (x, y, z) if c is not None
+        ]
+        self._init_common(len(self.coordinate_lines), name)
+        self.cart_dims = np.array([c.size - 1 for c in self.coordinate_lines])
+
+        self._nodes = None
+        self._face_nodes = None
+        self._cell_faces = None
+
+        nx = np.ones(3, dtype=np.int)
+        nx[: self.dim] = self.cart_dims
+        self.num_nodes = np.prod(nx[: self.dim] + 1)
+        self.num_cells = np.prod(nx)
+        if self.dim == 1:
+            self.num_faces = self.num_nodes
+        else:
+            self.num_faces = np.sum(self._num_faces_per_direction())
+
+        self._init_tags()
+
+    def _num_faces_per_direction(self):
+        """ Number of faces with normal vector in each of the coordinate
+        directions. For 1d grids, the faces are the nodes.
+        """
+        if self.dim == 1:
+            return np.array([self.num_nodes])
+        num = np.zeros(self.dim, dtype=np.int)
+        for d in range(self.dim):
+            shape = self.cart_dims.copy()
+            shape[d] += 1
+            num[d] = np.prod(shape)
+        return num
+
+    # Topology, assembled on first access. Assigning the fields replaces the
+    # assembled values.
+
+    @property
+    def nodes(self):
+        if self._nodes is None:
+            coords = np.meshgrid(*self.coordinate_lines, indexing="ij")
+            nodes = np.zeros((3, self.num_nodes))
+            for d in range(self.dim):
+                nodes[d] = coords[d].ravel(order="F")
+            self._nodes = nodes
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, value):
+        self._nodes = value
+
+    @property
+    def face_nodes(self):
+        if self._face_nodes is None:
+            self._assemble_topology()
+        return self._face_nodes
+
+    @face_nodes.setter
+    def face_nodes(self, value):
+        self._face_nodes = value
+
+    @property
+    def cell_faces(self):
+        if self._cell_faces is None:
+            self._assemble_topology()
+        return self._cell_faces
+
+    @cell_faces.setter
+    def cell_faces(self, value):
+        self._cell_faces = value
+
+    def _assemble_topology(self):
+        if self.dim == 1:
+            _, face_nodes, cell_faces = self._create_1d_grid(*self.coordinate_lines)
+        elif self.dim == 2:
+            _, face_nodes, cell_faces = self._create_2d_grid(*self.coordinate_lines)
+        else:
+            _, face_nodes, cell_faces = self._create_3d_grid(*self.coordinate_lines)
+        if self._face_nodes is None:
+            self._face_nodes = face_nodes
+        if self._cell_faces is None:
+            self._cell_faces = cell_faces
+
+    def topology_assembled(self):
+        """ Check if face_nodes and cell_faces have been assembled.
+
+        Returns:
+            boolean: True if the sparse matrices are formed.
+
+        """
+        return self._face_nodes is not None and self._cell_faces is not None
+
+    def _topology_identity(self):
+        # Use the stored fields, so that a look-up in the cache does not
+        # assemble the topology.
+        identity = [self._nodes]
+        for mat in (self._face_nodes, self._cell_faces):
+            if mat is None:
+                identity += [None] * 4
+            else:
+                identity += [mat, mat.indices, mat.indptr, mat.data]
+        return tuple(identity)
+
+    # Index arithmetic
+
+    def _face_index_arrays(self):
+        """ Indices of the faces in each coordinate direction, as arrays of
+        shape cart_dims + 1 in the normal direction.
+        """
+        offset = np.hstack((0, np.cumsum(self._num_faces_per_direction())))
+        arrays = []
+        for d in range(self.dim):
+            shape = self.cart_dims.copy()
+            shape[d] += 1
+            faces = np.arange(offset[d], offset[d + 1])
+            arrays.append(faces.reshape(shape, order="F"))
+        return arrays
+
+    def cell_face_triplets(self):
+        """ Nonzero entries of cell_faces, computed from the structured
+        indexing. See Grid.cell_face_triplets().
+        """
+        if self._cell_faces is not None:
+            return super(ImplicitTensorGrid, self).cell_face_triplets()
+
+        if self.dim == 1:
+            faces = np.arange(self.num_faces)
+            fi = np.vstack((faces[:-1], faces[1:]))
+        else:
+            # For each cell, the faces are ordered by direction, and with the
+            # lower face first. This is also the sorting of the face indices.
+            fi = []
+            for d, faces in enumerate(self._face_index_arrays()):
+                lower = [slice(None)] * self.dim
+                upper = [slice(None)] * self.dim
+                lower[d] = slice(None, -1)
+                upper[d] = slice(1, None)
+                fi.append(faces[tuple(lower)].ravel(order="F"))
+                fi.append(faces[tuple(upper)].ravel(order="F"))
+            fi = np.vstack(fi)
+        num_faces_per_cell = fi.shape[0]
+        ci = np.repeat(np.arange(self.num_cells), num_faces_per_cell)
+        sgn = np.tile([-1.0, 1.0], self.num_cells * num_faces_per_cell // 2)
+        return fi.ravel(order="F"), ci, sgn
+
+    def update_boundary_face_tag(self):
+        """ Tag faces on the boundary of the grid with boundary tag, computed
+        from the structured indexing.
+        """
+        if self._cell_faces is not None:
+            return super(ImplicitTensorGrid, self).update_boundary_face_tag()
+
+        is_bnd = np.zeros(self.num_faces, dtype=np.bool)
+        if self.dim == 1:
+            is_bnd[[0, -1]] = True
+        else:
+            for d, faces in enumerate(self._face_index_arrays()):
+                is_bnd[np.take(faces, [0, -1], axis=d).ravel()] = True
+        self.tags["domain_boundary_faces"] = is_bnd
+
+    def update_boundary_node_tag(self):
+        """ Tag nodes on the boundary of the grid with boundary tag, computed
+        from the structured indexing.
+        """
+        if self._face_nodes is not None or any(
+            np.any(self.tags[t]) for t in ["fracture_faces", "tip_faces"]
+        ):
+            return super(ImplicitTensorGrid, self).update_boundary_node_tag()
+
+        node_ind = np.arange(self.num_nodes).reshape(self.cart_dims + 1, order="F")
+        is_bnd = np.zeros(self.num_nodes, dtype=np.bool)
+        for d in range(self.dim):
+            is_bnd[np.take(node_ind, [0, -1], axis=d).ravel()] = True
+        self.tags["domain_boundary_nodes"] = is_bnd
+        self.tags["fracture_nodes"] = np.zeros(self.num_nodes, dtype=np.bool)
+        self.tags["tip_nodes"] = np.zeros(self.num_nodes, dtype=np.bool)
+
+    def compute_geometry(self, chunk_size=None, num_threads=None):
+        """Compute geometric quantities for the grid from the coordinate lines.
+
+        The results equal those of Grid.compute_geometry() up to rounding. The
+        parameters are present for compatibility with Grid, and are not used.
+        """
+        self.name.append("Compute geometry")
+
+        lines = self.coordinate_lines
+        centers = [(c[1:] + c[:-1]) / 2 for c in lines]
+        lengths = [np.diff(c) for c in lines]
+
+        def tensor(arrays):
+            # Values on a tensor product of the arrays, ordered as the grid
+            # entities, with the first direction running fastest
+            grids = np.meshgrid(*arrays, indexing="ij")
+            return [a.ravel(order="F") for a in grids]
+
+        self.cell_centers = np.zeros((3, self.num_cells))
+        for d, c in enumerate(tensor(centers)):
+            self.cell_centers[d] = c
+        self.cell_volumes = np.prod(np.vstack(tensor(lengths)), axis=0)
+
+        if self.dim == 1:
+            self.face_centers = self.nodes.copy()
+            self.face_areas = np.ones(self.num_faces)
+            self.face_normals = np.zeros((3, self.num_faces))
+            self.face_normals[0] = 1
+            return
+
+        face_centers = []
+        face_areas = []
+        face_normals = []
+        for d in range(self.dim):
+            # Faces with normal in direction d are located at the nodes in
+            # direction d, and at the cell centers in the other directions
+            points = [lines[d] if e == d else centers[e] for e in range(self.dim)]
+            sizes = [
+                np.ones(lines[d].size) if e == d else lengths[e]
+                for e in range(self.dim)
+            ]
+            fc = np.zeros((3, np.prod([p.size for p in points])))
+            for e, c in enumerate(tensor(points)):
+                fc[e] = c
+            area = np.prod(np.vstack(tensor(sizes)), axis=0)
+            normal = np.zeros_like(fc)
+            normal[d] = area
+            face_centers.append(fc)
+            face_areas.append(area)
+            face_normals.append(normal)
+
+        self.face_centers = np.hstack(face_centers)
+        self.face_areas = np.hstack(face_areas)
+        self.face_normals = np.hstack(face_normals)
+
+    def copy(self):
+        """
+        Create a deep copy of the grid. Topology which is not yet assembled is
+        not assembled for the copy either.
+
+        Returns:
+            ImplicitTensorGrid: A deep copy of self.
+
+        """
+        h = self.__class__.__new__(self.__class__)
+        for key, val in self.__dict__.items():
+            if key == "_topology_cache":
+                val = {}
+            elif key == "coordinate_lines":
+                val = [c.copy() for c in val]
+            elif hasattr(val, "copy"):
+                val = val.copy()
+            setattr(h, key, val)
+        return h
+
+    def _compact_topology(self):
+        # Only the assembled relations are converted
+        if self._face_nodes is not None:
+            self._face_nodes = sparse_mat.compact_indices(self._face_nodes)
+        if self._cell_faces is not None:
+            self._cell_faces = sparse_mat.compact_indices(self._cell_faces, np.int8)
+
+
+class ImplicitCartGrid(ImplicitTensorGrid):
+    """Cartesian grid where topology and geometry are computed from the
+    structured indexing, see ImplicitTensorGrid.
+
+    """
+
+    def __init__(self, nx, physdims=None):
+        """
+        Constructor for implicit Cartesian grid
+
+        Parameters
+        ----------
+        nx (np.ndarray): Number of cells in each direction. Should be 1D, 2D or
+            3D.
+        physdims (np.ndarray): Physical dimensions in each direction.
+            Defaults to same as nx, that is, cells of unit size.
+        """
+        nx = np.atleast_1d(nx)
+        if physdims is None:
+            physdims = nx
+        physdims = np.atleast_1d(physdims)
+        assert nx.shape == physdims.shape
+        if nx.size > 3:
+            raise ValueError(
+                "Cartesian grid only implemented for up to three dimensions"
+            )
+
+        lines = [np.linspace(0, physdims[i], nx[i] + 1) for i in range(nx.size)]
+        super(ImplicitCartGrid, self).__init__(*lines, name="ImplicitCartGrid")
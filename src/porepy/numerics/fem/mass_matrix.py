@@ -121,33 +121,21 @@ class P1MassMatrix(Solver):
         # surface coordinates in 1d and 2d)
         c_centers, f_normals, f_centers, R, dim, node_coords = pp.cg.map_grid(g)
 
-        # Allocate the data to store matrix entries, that's the most efficient
-        # way to create a sparse matrix.
-        size = np.power(g.dim + 1, 2) * g.num_cells
-        I = np.empty(size, dtype=np.int)
-        J = np.empty(size, dtype=np.int)
-        dataIJ = np.empty(size)
-        idx = 0
-
+        # Retrieve the nodes of each cell, ordered as in the columns of the
+        # cell-node map
         cell_nodes = g.cell_nodes()
-        nodes, cells, _ = sps.find(cell_nodes)
-
-        for c in np.arange(g.num_cells):
-            # For the current cell retrieve its nodes
-            loc = slice(cell_nodes.indptr[c], cell_nodes.indptr[c + 1])
-            nodes_loc = nodes[loc]
-
-            # Compute the mass-H1 local matrix
-            # A = coeff[nodes_loc]*self.massH1(g.cell_volumes[c], g.dim)
-            A = self.massH1(g.cell_volumes[c], g.dim)
-
-            # Save values for stiff-H1 local matrix in the global structure
-            cols = np.tile(nodes_loc, (nodes_loc.size, 1))
-            loc_idx = slice(idx, idx + cols.size)
-            I[loc_idx] = cols.T.ravel()
-            J[loc_idx] = cols.ravel()
-            dataIJ[loc_idx] = A.ravel()
-            idx += cols.size
+        nodes, _, _ = sps.find(cell_nodes)
+        nodes_loc = nodes.reshape((g.num_cells, g.dim + 1))
+
+        # Compute the mass-H1 local matrices of all the cells, they differ only
+        # by the cell volume
+        A = g.cell_volumes[:, np.newaxis, np.newaxis] * self.massH1(1, g.dim)
+
+        # Save values for mass-H1 local matrices in the global structure
+        rows = np.tile(nodes_loc[:, :, np.newaxis], (1, 1, g.dim + 1))
+        I = rows.ravel()
+        J = np.transpose(rows, (0, 2, 1)).ravel()
+        dataIJ = A.ravel()
 
         # Construct the global matrices
         M = sps.csr_matrix((dataIJ, (I, J)))
@@ -142,39 +142,22 @@ class P1(Solver):
                 k.perm = np.delete(k.perm, (remove_dim), axis=0)
                 k.perm = np.delete(k.perm, (remove_dim), axis=1)
 
-        # Allocate the data to store matrix entries, that's the most efficient
-        # way to create a sparse matrix.
-        size = np.power(g.dim + 1, 2) * g.num_cells
-        I = np.empty(size, dtype=np.int)
-        J = np.empty(size, dtype=np.int)
-        dataIJ = np.empty(size)
-        idx = 0
-
+        # Retrieve the nodes of each cell, ordered as in the columns of the
+        # cell-node map
         cell_nodes = g.cell_nodes()
-        nodes, cells, _ = sps.find(cell_nodes)
-
-        for c in np.arange(g.num_cells):
-            # For the current cell retrieve its nodes
-            loc = slice(cell_nodes.indptr[c], cell_nodes.indptr[c + 1])
-
-            nodes_loc = nodes[loc]
-            coord_loc = node_coords[:, nodes_loc]
-
-            # Compute the stiff-H1 local matrix
-            A = self.stiffH1(
-                a[c] * k.perm[0 : g.dim, 0 : g.dim, c],
-                g.cell_volumes[c],
-                coord_loc,
-                g.dim,
-            )
-
-            # Save values for stiff-H1 local matrix in the global structure
-            cols = np.tile(nodes_loc, (nodes_loc.size, 1))
-            loc_idx = slice(idx, idx + cols.size)
-            I[loc_idx] = cols.T.ravel()
-            J[loc_idx] = cols.ravel()
-            dataIJ[loc_idx] = A.ravel()
-            idx += cols.size
+        nodes, _, _ = sps.find(cell_nodes)
+        nodes_loc = nodes.reshape((g.num_cells, g.dim + 1))
+        coord_loc = np.transpose(node_coords[:, nodes_loc], (1, 0, 2))
+
+        # Compute the stiff-H1 local matrices of all the cells
+        perm = np.transpose(a * k.perm[0 : g.dim, 0 : g.dim, :], (2, 0, 1))
+        A = self.stiffH1_batch(perm, g.cell_volumes, coord_loc, g.dim)
+
+        # Save values for stiff-H1 local matrices in the global structure
+        rows = np.tile(nodes_loc[:, :, np.newaxis], (1, 1, g.dim + 1))
+        I = rows.ravel()
+        J = np.transpose(rows, (0, 2, 1)).ravel()
+        dataIJ = A.ravel()
 
         # Construct the global matrices
         M = sps.csr_matrix((dataIJ, (I, J)))
@@ -267,6 +250,38 @@ class P1(Solver):
 
     # ------------------------------------------------------------------------------#
 
+    def stiffH1_batch(self, K, c_volumes, coord, dim):
+        """ Compute the local stiffness H1 matrices of a set of simplices using
+        the P1 Lagrangean approach. The computation is the same as in
+        self.stiffH1, but all the local matrices are computed at once as stacked
+        arrays.
+
+        Parameters
+        ----------
+        K : ndarray (num_cells, g.dim, g.dim)
+            Permeability of the cells.
+        c_volumes : array (num_cells)
+            Cell volumes.
+        coord : ndarray (num_cells, g.dim, g.dim + 1)
+            Coordinates of the nodes of the cells.
+
+        Return
+        ------
+        out: ndarray (num_cells, g.dim + 1, g.dim + 1)
+            Local stiffness H1 matrices.
+        """
+        # Allow short variable names in this function
+        # pylint: disable=invalid-name
+
+        Q = np.ones((coord.shape[0], dim + 1, dim + 1))
+        Q[:, :, 1:] = np.transpose(coord, (0, 2, 1))
+        dphi = np.linalg.inv(Q)[:, 1:, :]
+
+        A = np.matmul(np.transpose(dphi, (0, 2, 1)), np.matmul(K, dphi))
+        return c_volumes[:, np.newaxis, np.newaxis] * A
+
+    # ------------------------------------------------------------------------------#
+
 class P1Coupling(AbstractCoupling):
 
     # ------------------------------------------------------------------------------#
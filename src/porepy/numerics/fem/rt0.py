@@ -157,15 +157,22 @@ class RT0(Solver):
                 k.perm = np.delete(k.perm, (remove_dim), axis=0)
                 k.perm = np.delete(k.perm, (remove_dim), axis=1)
 
-        # Allocate the data to store matrix entries, that's the most efficient
-        # way to create a sparse matrix.
-        size = np.power(g.dim + 1, 2) * g.num_cells
-        I = np.empty(size, dtype=np.int)
-        J = np.empty(size, dtype=np.int)
-        dataIJ = np.empty(size)
-        idx = 0
-
+        # Faces of each cell, and the signs of their normals, one row per cell.
+        # All cells are simplices, thus with dim + 1 faces.
+        num_faces_cell = g.dim + 1
+        faces_loc = faces.reshape((g.num_cells, num_faces_cell))
+        sign_loc = sign.reshape((g.num_cells, num_faces_cell))
+
+        # For each face of each cell find the opposite node. In a simplex each
+        # node of the cell belongs to all the faces but one, thus the opposite
+        # node is obtained by the difference between the sum of the nodes of
+        # the cell and the sum of the nodes of the face.
         nodes, _, _ = sps.find(g.face_nodes)
+        nodes = nodes.reshape((g.num_faces, g.dim))
+        nodes_sum = np.sum(nodes[faces_loc], axis=2)
+        opposite_node = np.sum(nodes_sum, axis=1)[:, np.newaxis] // g.dim - nodes_sum
+
+        coord_loc = np.transpose(node_coords[:, opposite_node], (1, 0, 2))
 
         size_HB = g.dim * (g.dim + 1)
         HB = np.zeros((size_HB, size_HB))
@@ -174,40 +181,15 @@ class RT0(Solver):
         HB += HB.T
         HB /= g.dim * g.dim * (g.dim + 1) * (g.dim + 2)
 
-        for c in np.arange(g.num_cells):
-            # For the current cell retrieve its faces
-            loc = slice(g.cell_faces.indptr[c], g.cell_faces.indptr[c + 1])
-            faces_loc = faces[loc]
-
-            face_nodes_loc = [
-                nodes[g.face_nodes.indptr[f] : g.face_nodes.indptr[f + 1]]
-                for f in faces_loc
-            ]
-            nodes_loc = np.unique(face_nodes_loc)
-
-            opposite_node = np.array(
-                [np.setdiff1d(nodes_loc, f, assume_unique=True) for f in face_nodes_loc]
-            ).flatten()
-
-            coord_loc = node_coords[:, opposite_node]
-
-            # Compute the H_div-mass local matrix
-            A = self.massHdiv(
-                a[c] * k.perm[0 : g.dim, 0 : g.dim, c],
-                g.cell_volumes[c],
-                coord_loc,
-                sign[loc],
-                g.dim,
-                HB,
-            )
-
-            # Save values for Hdiv-mass local matrix in the global structure
-            cols = np.tile(faces_loc, (faces_loc.size, 1))
-            loc_idx = slice(idx, idx + cols.size)
-            I[loc_idx] = cols.T.ravel()
-            J[loc_idx] = cols.ravel()
-            dataIJ[loc_idx] = A.ravel()
-            idx += cols.size
+        # Compute the H_div-mass local matrices of all the cells
+        perm = np.transpose(a * k.perm[0 : g.dim, 0 : g.dim, :], (2, 0, 1))
+        A = self.massHdiv_batch(perm, g.cell_volumes, coord_loc, sign_loc, g.dim, HB)
+
+        # Save values for Hdiv-mass local matrices in the global structure
+        rows = np.tile(faces_loc[:, :, np.newaxis], (1, 1, num_faces_cell))
+        I = rows.ravel()
+        J = np.transpose(rows, (0, 2, 1)).ravel()
+        dataIJ = A.ravel()
 
         # Construct the global matrices
         mass = sps.coo_matrix((dataIJ, (I, J)))
@@ -362,5 +344,46 @@ class RT0(Solver):
 
         return np.dot(C.T, np.dot(N.T, np.dot(HB, np.dot(inv_K, np.dot(N, C)))))
 
+    # ------------------------------------------------------------------------------#
+
+    def massHdiv_batch(self, K, c_volumes, coord, sign, dim, HB):
+        """ Compute the local mass Hdiv matrices of a set of simplices. The
+        computation is the same as in self.massHdiv, but all the local matrices
+        are computed at once as stacked arrays.
+
+        Parameters
+        ----------
+        K : ndarray (num_cells, g.dim, g.dim)
+            Permeability of the cells.
+        c_volumes : array (num_cells)
+            Cell volumes.
+        coord : ndarray (num_cells, 3 or g.dim, g.dim + 1)
+            Coordinates of the node opposite to each face of the cells.
+        sign : ndarray (num_cells, g.dim + 1)
+            +1 or -1 if the normal is inward or outward to the cell.
+
+        Return
+        ------
+        out: ndarray (num_cells, g.dim + 1, g.dim + 1)
+            Local mass Hdiv matrices.
+        """
+        # Allow short variable names in this function
+        # pylint: disable=invalid-name
+        num_cells = K.shape[0]
+        inv_K = np.linalg.inv(K) / c_volumes[:, np.newaxis, np.newaxis]
+
+        # N[c, i * dim + r, j] is the r-th component of coord_i - coord_j
+        coord = coord[:, 0:dim, :]
+        N = coord[:, :, :, np.newaxis] - coord[:, :, np.newaxis, :]
+        N = np.transpose(N, (0, 2, 1, 3))
+
+        # Apply the block diagonal inverse permeability and the basis matrix
+        inv_K_N = np.matmul(inv_K[:, np.newaxis, :, :], N)
+        inv_K_N = inv_K_N.reshape((num_cells, dim * (dim + 1), dim + 1))
+        N = N.reshape((num_cells, dim * (dim + 1), dim + 1))
+
+        A = np.matmul(np.transpose(N, (0, 2, 1)), np.matmul(HB, inv_K_N))
+        return sign[:, :, np.newaxis] * A * sign[:, np.newaxis, :]
+
 
 # ------------------------------------------------------------------------------#
@@ -1,12 +1,16 @@
 import scipy.sparse as sps
 import scipy.sparse.linalg as la
 import time
+import copy
+import warnings
+import logging
 import numpy as np
 
 from porepy.numerics.fv import mpfa, mpsa, fvutils
 from porepy.params import tensor, bc
 from porepy.numerics.mixed_dim.solver import Solver
 
+logger = logging.getLogger(__name__)
 
 class Biot(Solver):
     def __init__(self, eta=None):
@@ -140,6 +144,15 @@ class Biot(Solver):
                     options.
                 eta (double): Location of continuity point in MPSA and MPFA.
                     Defaults to 1/3 for simplex grids, 0 otherwise.
+                max_memory (double): Memory budget for the discretization, in
+                    bytes. The flow discretization is split into partitions if
+                    its estimated memory need is larger, see mpfa.mpfa().
+                    The mechanics discretization is not partitioned; a
+                    warning is given if its estimate exceeds the budget.
+                discretization_cache (DiscretizationCache): On-disk cache of
+                    discretizations. The flow and mechanics discretizations
+                    are loaded from the cache if available, otherwise they are
+                    computed and stored.
 
         The discretization is stored in the data dictionary, in the form of
         several matrices representing different coupling terms. For details,
@@ -236,8 +249,8 @@ class Biot(Solver):
             eta Location of pressure continuity point. Should be 1/3 for simplex
                 grids, 0 otherwise. On boundary faces with Dirichlet conditions,
                 eta=0 will be enforced.
-            inverter (string) Block inverter to be used, either numba (default),
-                cython or python. See fvutils.invert_diagonal_blocks for details.
+            inverter (string) Block inverter to be used, either batched (default),
+                numba, cython or python. See fvutils.invert_diagonal_blocks for details.
 
         Returns:
             scipy.sparse.csr_matrix (shape num_faces * dim, num_cells * dim): stres
@@ -308,6 +321,38 @@ class Biot(Solver):
         eta = data.get("eta", 0)
         inverter = data.get("inverter", None)
 
+        cache = data.get("discretization_cache", None)
+        if cache is not None:
+            key = cache.fingerprint(
+                g, "biot_mechanics", constit, bound_mech, bound_flow, eta
+            )
+            matrices = cache.load(key)
+            if matrices is not None:
+                data.update(matrices)
+                return
+
+        max_memory = data.get("max_memory", None)
+        if max_memory is not None:
+            # The coupling terms are computed from the full local systems, thus
+            # the mechanics discretization can not be split into partitions.
+            # Output matrices are stress, grad_p, div_d (cell variables) and
+            # bound_stress (face variables).
+            mem = fvutils.estimate_memory(
+                g, nd_var=g.dim, num_cell_outputs=3, num_face_outputs=1
+            )
+            logger.info(
+                "Estimated memory for Biot mechanics: " + str(mem["total"]) + " bytes"
+            )
+            if mem["total"] > max_memory:
+                warnings.warn(
+                    "Estimated memory need of the Biot mechanics discretization "
+                    + "exceeds the memory budget"
+                )
+
+        # Define subcell topology. The topology is shared with the flow
+        # discretization, thus it is obtained before the grid is copied below.
+        subcell_topology = fvutils.cached_subcell_topology(g)
+
         # The grid coordinates are always three-dimensional, even if the grid
         # is really 2D. This means that there is not a 1-1 relation between the
         # number of coordinates of a point / vector and the real dimension.
@@ -324,18 +369,19 @@ class Biot(Solver):
             g.face_normals = np.delete(g.face_normals, (2), axis=0)
             g.nodes = np.delete(g.nodes, (2), axis=0)
 
+            # Reduce the stiffness on a shallow copy, so that the tensor in
+            # the parameters is left unchanged
+            constit = copy.copy(constit)
             constit.c = np.delete(constit.c, (2, 5, 6, 7, 8), axis=0)
             constit.c = np.delete(constit.c, (2, 5, 6, 7, 8), axis=1)
         nd = g.dim
 
-        # Define subcell topology
-        subcell_topology = fvutils.SubcellTopology(g)
         # Obtain mappings to exclude boundary faces for mechanics
-        bound_exclusion_mech = fvutils.ExcludeBoundaries(
+        bound_exclusion_mech = fvutils.cached_exclude_boundaries(
             subcell_topology, bound_mech, nd
         )
         # ... and flow
-        bound_exclusion_flow = fvutils.ExcludeBoundaries(
+        bound_exclusion_flow = fvutils.cached_exclude_boundaries(
             subcell_topology, bound_flow, nd
         )
 
@@ -438,6 +484,19 @@ class Biot(Solver):
         data["stabilization"] = stabilization
         data["bound_div_d"] = bound_div_d
 
+        if cache is not None:
+            cache.store(
+                key,
+                {
+                    "stress": stress,
+                    "bound_stress": bound_stress,
+                    "grad_p": grad_p,
+                    "div_d": div_d,
+                    "stabilization": stabilization,
+                    "bound_div_d": bound_div_d,
+                },
+            )
+
     def _face_vector_to_scalar(self, nf, nd):
         """ Create a mapping from vector quantities on faces (stresses) to
         scalar quantities. The mapping is intended for the boundary
@@ -0,0 +1,250 @@
+"""
+Persistent on-disk cache for discretization matrices.
+
+The cache is intended for workflows where the same grid and parameters are
+discretized repeatedly, e.g. by different runs of a model. The discretization
+matrices are stored as compressed sparse files in a folder, keyed by a
+fingerprint of the grid (topology and geometry) and the parameters entering
+the discretization.
+
+The cache is opt-in: To use it for Mpfa, Mpsa or Biot, assign a
+DiscretizationCache object to the keyword 'discretization_cache' in the data
+dictionary passed to discretize().
+
+Example:
+    cache = DiscretizationCache('discretizations', max_size=2**30)
+    data['discretization_cache'] = cache
+    # Computes and stores the discretization
+    Mpfa().discretize(g, data)
+    # Loads the discretization from disk
+    Mpfa().discretize(g, data)
+
+"""
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import numpy as np
+import scipy.sparse as sps
+
+logger = logging.getLogger(__name__)
+
+
+class DiscretizationCache(object):
+    """ Store and retrieve discretization matrices on disk.
+
+    Each entry is a sub-folder of the cache folder, named by the key of the
+    entry, with one compressed file per matrix. When the total size of the
+    entries exceeds max_size, the least recently used entries are evicted.
+
+    Attributes:
+        folder (str): Folder where the entries are stored.
+        max_size (int): Maximum total size of the entries, in bytes. If None,
+            no entries are evicted.
+        hits (int): Number of successful look-ups.
+        misses (int): Number of failed look-ups.
+
+    """
+
+    def __init__(self, folder, max_size=None):
+        self.folder = folder
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+    def __repr__(self):
+        s = "Discretization cache in folder " + self.folder + "\n"
+        s += str(len(self.keys())) + " entries, "
+        s += str(self.size()) + " bytes\n"
+        s += str(self.hits) + " hits, " + str(self.misses) + " misses\n"
+        return s
+
+    def fingerprint(self, g, *args):
+        """ Compute the key of a discretization.
+
+        Parameters:
+            g (core.grids.grid): Grid to be discretized. The dimension, the
+                face-node and cell-face relations and the geometry (nodes,
+                face normals and centers, cell centers) enter the key.
+            *args: Further quantities that determine the discretization, e.g.
+                a name of the discretization scheme, tensors, boundary
+                conditions and eta. See _update_hash() for supported types.
+
+        Returns:
+            str: Key of the discretization.
+
+        """
+        h = hashlib.sha1()
+        _update_hash(h, g.dim)
+        _update_hash(h, g.face_nodes)
+        _update_hash(h, g.cell_faces)
+        _update_hash(h, g.nodes)
+        _update_hash(h, g.face_normals)
+        _update_hash(h, g.face_centers)
+        _update_hash(h, g.cell_centers)
+        for a in args:
+            _update_hash(h, a)
+        return h.hexdigest()
+
+    def load(self, key):
+        """ Load the matrices of an entry.
+
+        Parameters:
+            key (str): Key of the entry, see fingerprint().
+
+        Returns:
+            dictionary: Matrices of the entry, as sps.csr_matrix, with the
+                names used in store(). None if the key is not in the cache.
+
+        """
+        path = os.path.join(self.folder, key)
+        if not os.path.isdir(path):
+            self.misses += 1
+            return None
+
+        matrices = {}
+        for file_name in os.listdir(path):
+            name, ext = os.path.splitext(file_name)
+            if ext == ".npz":
+                matrices[name] = sps.load_npz(os.path.join(path, file_name)).tocsr()
+        # Mark the entry as recently used
+        os.utime(path, None)
+        self.hits += 1
+        logger.info("Loaded discretization " + key + " from cache")
+        return matrices
+
+    def store(self, key, matrices):
+        """ Store matrices in an entry, replacing any existing entry with the
+        same key.
+
+        Parameters:
+            key (str): Key of the entry, see fingerprint().
+            matrices (dictionary): Sparse matrices to be stored, indexed by
+                their names.
+
+        """
+        # Write to a temporary folder, which is moved in place when complete,
+        # so that an interrupted write does not leave a corrupt entry.
+        tmp_path = tempfile.mkdtemp(dir=self.folder, prefix=".tmp")
+        for name, mat in matrices.items():
+            sps.save_npz(
+                os.path.join(tmp_path, name + ".npz"),
+                sps.csr_matrix(mat),
+                compressed=True,
+            )
+        path = os.path.join(self.folder, key)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+        logger.info("Stored discretization " + key + " in cache")
+
+        if self.max_size is not None:
+            self._evict(keep=key)
+
+    def invalidate(self, key=None):
+        """ Remove entries from the cache.
+
+        Parameters:
+            key (str, optional): Key of the entry to be removed. If None, all
+                entries are removed.
+
+        """
+        keys = self.keys() if key is None else [key]
+        for k in keys:
+            path = os.path.join(self.folder, k)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+
+    def keys(self):
+        """ Keys of all entries in the cache.
+
+        Returns:
+            list of str: Keys of the entries.
+
+        """
+        return [
+            k
+            for k in os.listdir(self.folder)
+            if not k.startswith(".") and os.path.isdir(os.path.join(self.folder, k))
+        ]
+
+    def size(self, key=None):
+        """ Size of entries on disk, in bytes.
+
+        Parameters:
+            key (str, optional): Key of the entry. If None, the total size of
+                all entries is returned.
+
+        Returns:
+            int: Size in bytes.
+
+        """
+        keys = self.keys() if key is None else [key]
+        size = 0
+        for k in keys:
+            path = os.path.join(self.folder, k)
+            for file_name in os.listdir(path):
+                size += os.path.getsize(os.path.join(path, file_name))
+        return size
+
+    def _evict(self, keep=None):
+        """ Remove least recently used entries until the total size is within
+        max_size. The entry keep is only removed if it is the only entry left.
+        """
+        keys = self.keys()
+        sizes = {k: self.size(k) for k in keys}
+        total = sum(sizes.values())
+        # Sort by time of last use, oldest first
+        keys.sort(key=lambda k: os.path.getmtime(os.path.join(self.folder, k)))
+        if keep in keys:
+            keys.remove(keep)
+            keys.append(keep)
+        for k in keys:
+            if total <= self.max_size:
+                break
+            self.invalidate(k)
+            total -= sizes[k]
+            logger.info("Evicted discretization " + k + " from cache")
+
+
+def _update_hash(h, obj):
+    """ Update a hash object with the content of obj.
+
+    Supported types are None, strings, numbers, numpy arrays, sparse matrices,
+    lists and tuples of these, boundary conditions (represented by the fields
+    is_dir and is_neu) and second and fourth order tensors (represented by
+    the fields perm and c, respectively).
+    """
+    if obj is None:
+        h.update(b"None")
+    elif isinstance(obj, str):
+        h.update(obj.encode())
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"seq" + str(len(obj)).encode())
+        for o in obj:
+            _update_hash(h, o)
+    elif sps.issparse(obj):
+        mat = obj.tocsr()
+        mat.sort_indices()
+        h.update(str(mat.shape).encode())
+        _update_hash(h, mat.indptr)
+        _update_hash(h, mat.indices)
+        _update_hash(h, mat.data)
+    elif isinstance(obj, (np.ndarray, np.generic, int, float, bool)):
+        arr = np.ascontiguousarray(obj)
+        h.update((str(arr.dtype) + str(arr.shape)).encode())
+        h.update(arr.tobytes())
+    elif hasattr(obj, "is_dir") and hasattr(obj, "is_neu"):
+        # Boundary conditions
+        _update_hash(h, (obj.is_dir, obj.is_neu))
+    elif hasattr(obj, "perm"):
+        # Second order tensor
+        _update_hash(h, obj.perm)
+    elif hasattr(obj, "c"):
+        # Fourth order tensor
+        _update_hash(h, obj.c)
+    else:
+        raise ValueError("Can not fingerprint object of type " + str(type(obj)))
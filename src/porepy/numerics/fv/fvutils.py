@@ -5,6 +5,9 @@ Created on Fri Mar  4 09:04:16 2016
 @author: eke001
 """
 from __future__ import division
+import hashlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import scipy.sparse as sps
 
@@ -139,26 +142,104 @@ class SubcellTopology(object):
         sps.matrix, size (self.subfno_unique.size x something)
         """
 
-        sgn = self.g.cell_faces[self.fno, self.cno].A
-        pair_over_subfaces = sps.coo_matrix((sgn[0], (self.subfno, self.subhfno)))
-        return pair_over_subfaces * other
+        return self._pairing_operator() * other
 
     def pair_over_subfaces_nd(self, other):
         """ nd-version of pair_over_subfaces, see above. """
         nd = self.g.dim
         # For force balance, displacements and stresses on the two sides of the
         # matrices must be paired
-        # Operator to create the pairing
-        sgn = self.g.cell_faces[self.fno, self.cno].A
-        pair_over_subfaces = sps.coo_matrix((sgn[0], (self.subfno, self.subhfno)))
         # vector version, to be used on stresses
-        pair_over_subfaces_nd = sps.kron(sps.eye(nd), pair_over_subfaces)
+        pair_over_subfaces_nd = sps.kron(sps.eye(nd), self._pairing_operator())
         return pair_over_subfaces_nd * other
 
+    def _pairing_operator(self):
+        """ Operator for pairing of sub-faces. Computed once, since picking out
+        the signs from cell_faces is costly.
+        """
+        if not hasattr(self, "_pair_over_subfaces"):
+            sgn = self.g.cell_faces[self.fno, self.cno].A
+            self._pair_over_subfaces = sps.coo_matrix(
+                (sgn[0], (self.subfno, self.subhfno))
+            ).tocsr()
+        return self._pair_over_subfaces
+
 
 # ------------------------ End of class SubcellTopology ----------------------
 
 
+# ------------- Cache of fields shared between discretization schemes ----------
+
+# The fields are stored in the topology cache of the grid, see
+# core.grids.grid.Grid, and thus invalidated together with the topological maps.
+
+# Maximum number of boundary exclusion mappings cached for a grid
+_MAX_CACHED_EXCLUDE_BOUNDARIES = 4
+
+
+def clear_cached_fields(g):
+    """ Remove the fields cached for a grid by the discretization schemes.
+
+    Parameters:
+        g (core.grids.grid): Grid.
+
+    """
+    g.clear_topology_cache()
+
+
+def cached_subcell_topology(g):
+    """ Subcell topology of a grid, shared between discretization schemes.
+
+    The topology is computed on the first call, and reused as long as the
+    face-node and cell-face relations of the grid (or their index arrays) are
+    not replaced. Modifications of the index arrays in place are not detected;
+    use clear_cached_fields() in such cases. The returned object should not be
+    modified.
+
+    Parameters:
+        g (core.grids.grid): Grid.
+
+    Returns:
+        SubcellTopology: Subcell topology of the grid.
+
+    """
+    return g._cached_topology(("fv", "subcell_topology"), lambda: SubcellTopology(g))
+
+
+def cached_exclude_boundaries(subcell_topology, bound, nd):
+    """ Mappings for exclusion of boundary equations, shared between
+    discretization schemes. See ExcludeBoundaries for parameters.
+
+    The mappings are reused as long as the subcell topology is the same, and
+    the boundary conditions have the same values. Mappings for different
+    boundary conditions, e.g. for flow and mechanics in Biot, are kept side by
+    side. At most _MAX_CACHED_EXCLUDE_BOUNDARIES mappings are kept for a grid;
+    when the limit is exceeded, the mappings for other boundary conditions are
+    removed. The returned object should not be modified.
+    """
+    # The boundary conditions enter the key by value
+    bc_key = hashlib.sha1(
+        np.ascontiguousarray(bound.is_dir).tobytes()
+        + np.ascontiguousarray(bound.is_neu).tobytes()
+    ).hexdigest()
+    key = ("fv", "exclude_boundaries", nd, bound.bc_type, bc_key)
+
+    g = subcell_topology.g
+    excl = g._cached_topology(
+        key,
+        lambda: ExcludeBoundaries(subcell_topology, bound, nd),
+        identity=(subcell_topology,),
+    )
+
+    cache = g._topology_cache
+    keys = [k for k in cache if k[:2] == ("fv", "exclude_boundaries")]
+    if len(keys) > _MAX_CACHED_EXCLUDE_BOUNDARIES:
+        for k in keys:
+            if k != key:
+                del cache[k]
+    return excl
+
+
 def compute_dist_face_cell(g, subcell_topology, eta):
     """
     Compute vectors from cell centers continuity points on each sub-face.
@@ -232,6 +313,9 @@ def determine_eta(g):
 
 # ------------- Methods related to block inversion ----------------------------
 
+# Minimum number of blocks inverted by one thread in the batched inverter
+_MIN_BATCH_SIZE = 256
+
 # @profile
 
 
@@ -239,17 +323,19 @@ def invert_diagonal_blocks(mat, s, method=None):
     """
     Invert block diagonal matrix.
 
-    Three implementations are available, either pure numpy, or a speedup using
-    numba or cython. If none is specified, the function will try to use numba,
-    then cython. The python option will only be invoked if explicitly asked
-    for; it will be very slow for general problems.
+    Four implementations are available: A batched numpy version, which groups
+    the blocks by size and inverts each group with a vectorized call to numpy
+    (using several threads), pure python, or a speedup using numba or cython.
+    If none is specified, the batched version is used. The python option will
+    only be invoked if explicitly asked for; it will be very slow for general
+    problems.
 
     Parameters
     ----------
     mat: sps.csr matrix to be inverted.
     s: block size. Must be int64 for the numba acceleration to work
-    method: Choice of method. Either numba (default), cython or 'python'.
-        Defaults to None, in which case first numba, then cython is tried.
+    method: Choice of method. Either 'batched' (default), numba, cython or
+        'python'. Defaults to None, in which case the batched version is used.
 
     Returns
     -------
@@ -411,9 +497,69 @@ def invert_diagonal_blocks(mat, s, method=None):
         v = inv_python(ptr, indices, dat, size)
         return v
 
+    def invert_diagonal_blocks_batched(a, sz, num_threads=None):
+        """
+        Invert block diagonal matrix by grouping blocks of equal size, and
+        inverting each group by a single vectorized call to np.linalg.inv.
+
+        Multi-point discretizations typically have a few distinct block sizes,
+        thus the number of calls is small. Large groups are split in chunks
+        that are inverted in parallel threads.
+
+        Parameters
+        ----------
+        a : sps.csr matrix
+        sz : Size of individual blocks
+        num_threads : Number of threads. Defaults to the number of cpus.
+
+        Returns
+        -------
+        v : Values of the inverse, ordered as for block_diag_matrix.
+        """
+        sz = np.asarray(sz, dtype=np.int64)
+        # Start of each block in rows and in the (dense) data of the inverse
+        block_start = np.cumsum(sz) - sz
+        data_start = np.cumsum(np.square(sz)) - np.square(sz)
+
+        # Scatter the non-zero elements into dense blocks
+        coo = a.tocoo()
+        coo.sum_duplicates()
+        block = np.repeat(np.arange(sz.size), sz)[coo.row]
+        loc_row = coo.row - block_start[block]
+        loc_col = coo.col - block_start[block]
+        v = np.zeros(np.sum(np.square(sz)))
+        v[data_start[block] + loc_row * sz[block] + loc_col] = coo.data
+        del coo, block, loc_row, loc_col
+
+        if num_threads is None:
+            num_threads = multiprocessing.cpu_count()
+
+        # Split groups of equal sized blocks into chunks
+        chunks = []
+        for n in np.unique(sz):
+            blocks = np.where(sz == n)[0]
+            num_chunks = max(1, min(num_threads, blocks.size // _MIN_BATCH_SIZE))
+            for b in np.array_split(blocks, num_chunks):
+                chunks.append((n, data_start[b][:, np.newaxis] + np.arange(n * n)))
+
+        def invert_chunk(chunk):
+            n, ind = chunk
+            v[ind] = np.linalg.inv(v[ind].reshape((-1, n, n))).reshape((-1, n * n))
+
+        # np.linalg.inv releases the GIL, thus threads give a speedup
+        if num_threads > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(num_threads) as executor:
+                list(executor.map(invert_chunk, chunks))
+        else:
+            for chunk in chunks:
+                invert_chunk(chunk)
+        return v
+
     # Variable to check if we have tried and failed with numba
     try_cython = False
-    if method == "numba" or method is None:
+    if method == "batched" or method is None:
+        inv_vals = invert_diagonal_blocks_batched(mat, s)
+    elif method == "numba":
         try:
             inv_vals = invert_diagonal_blocks_numba(mat, s)
         except:
@@ -632,6 +778,174 @@ def zero_out_sparse_rows(A, rows, diag=None):
     return A
 
 
+class SparseRowAccumulator(object):
+    """ Collect rows of sparse matrices computed in parts, and assemble the
+    global matrix once all parts are added.
+
+    Intended for partitioned discretizations, where each partition gives a
+    matrix of global size, of which only some rows should be kept. The kept
+    rows are stored as COO triplets, thus the cost of adding a partition is
+    proportional to the number of non-zeros in the kept rows.
+
+    Attributes:
+        shape (tuple of int): Shape of the global matrix.
+
+    """
+
+    def __init__(self, shape):
+        self.shape = shape
+        self._rows = []
+        self._cols = []
+        self._data = []
+
+    def add_rows(self, A, rows):
+        """ Add rows of a sparse matrix to the global matrix.
+
+        Parameters:
+            A (sps.spmatrix): Matrix with the same shape as the global matrix.
+            rows (np.ndarray of int): Indices of the rows to be kept.
+
+        """
+        rows = np.asarray(rows, dtype=np.int)
+        sub = A.tocsr()[rows].tocoo()
+        self._rows.append(rows[sub.row])
+        self._cols.append(sub.col)
+        self._data.append(sub.data)
+
+    def tocsr(self):
+        """ Assemble the global matrix.
+
+        Returns:
+            sps.csr_matrix: The global matrix, formed by the added rows.
+
+        """
+        if len(self._data) == 0:
+            return sps.csr_matrix(self.shape)
+        return sps.coo_matrix(
+            (
+                np.hstack(self._data),
+                (np.hstack(self._rows), np.hstack(self._cols)),
+            ),
+            shape=self.shape,
+        ).tocsr()
+
+
+# ------------- Methods related to memory estimates ---------------------------
+
+# Bytes needed to store a non-zero element of a sparse matrix: A double for the
+# value, and an int32 for the (compressed) index.
+_BYTES_PER_NONZERO = 12
+# Sparse matrix products and format conversions keep both the input and the
+# output alive, thus the peak memory of each stage is roughly twice the size
+# of the stored matrices. The factor is calibrated against the peak resident
+# memory of mpfa and mpsa on Cartesian and simplex grids.
+_WORKSPACE_FACTOR = 2
+
+
+def estimate_memory(g, nd_var=1, num_cell_outputs=2, num_face_outputs=2):
+    """ Estimate the memory footprint of a multi-point discretization.
+
+    The estimate is computed from the grid topology only, using sparse
+    operations, so that it can be applied also to grids where the
+    discretization itself would exhaust the memory.
+
+    The estimate is based on the structure of the local systems in MPFA and
+    MPSA: Around each node, there are nd * nd_var gradient unknowns per cell
+    sharing the node, and the inverted local systems (igrad) are stored as
+    dense blocks of this size. The remaining stages scale with the number of
+    sub-faces. Temporary copies made in sparse matrix operations are accounted
+    for by a constant factor.
+
+    Parameters:
+        g (core.grids.grid): Grid to be discretized.
+        nd_var (int, optional): Number of variables per cell. 1 for MPFA, g.dim
+            for MPSA. Defaults to 1.
+        num_cell_outputs (int, optional): Number of output matrices mapping
+            from cell variables to faces. Defaults to 2 (as for MPFA).
+        num_face_outputs (int, optional): Number of output matrices mapping
+            from face variables to faces. Defaults to 2 (as for MPFA).
+
+    Returns:
+        dictionary: Estimated number of bytes for the stages of the
+            discretization, with keys 'igrad' (inverted local systems),
+            'nk_grad' (flux / stress balance), 'pr_cont' (continuity of
+            pressures / displacements), 'darcy' (Darcy's / Hooke's law),
+            'output' (discretization matrices) and 'total' (sum of the other
+            stages).
+
+    """
+    nd = g.dim
+    # Number of cells and faces sharing each node.
+    cells_at_node = np.asarray(g.cell_nodes().sum(axis=1)).ravel()
+    faces_at_node = np.diff(g.face_nodes.tocsr().indptr)
+    # Each node-face pair is a sub-face
+    num_sub_face = g.face_nodes.nnz
+
+    # Number of gradient unknowns in the local system around each node
+    num_grad_unknowns = nd * nd_var * cells_at_node
+    # igrad is block diagonal, with dense blocks
+    igrad = np.sum(num_grad_unknowns.astype(np.float) ** 2)
+
+    # Balancing of fluxes requires a gradient on both sides of each sub-face
+    nk_grad = 2 * nd * nd_var ** 2 * num_sub_face
+    # Continuity requires a gradient and a cell center value on both sides
+    pr_cont = 2 * nd_var * (nd * nd_var + 1) * num_sub_face
+    # Darcy's law requires a gradient per sub-face
+    darcy = nd * nd_var ** 2 * num_sub_face
+
+    # The stencil of a sub-face consists of the cells (faces for boundary
+    # conditions) sharing the node of the sub-face.
+    cell_stencil = np.sum(faces_at_node * cells_at_node)
+    face_stencil = np.sum(faces_at_node.astype(np.float) ** 2)
+    output = nd_var ** 2 * (
+        num_cell_outputs * cell_stencil + num_face_outputs * face_stencil
+    )
+
+    mem = {
+        "igrad": igrad,
+        "nk_grad": nk_grad,
+        "pr_cont": pr_cont,
+        "darcy": darcy,
+        "output": output,
+    }
+    for key in mem:
+        mem[key] = float(mem[key]) * _BYTES_PER_NONZERO * _WORKSPACE_FACTOR
+    mem["total"] = sum(mem.values())
+    return mem
+
+
+def num_partitions_for_memory(mem, max_memory):
+    """ Number of partitions needed to keep a discretization within a budget.
+
+    The local systems scale with the size of the partition, while the output
+    matrices are global, and thus not reduced by the partitioning.
+
+    Parameters:
+        mem (dictionary): Memory estimate, as given by estimate_memory().
+        max_memory (double): Memory budget, in bytes.
+
+    Returns:
+        int: Number of partitions. 1 if the full discretization fits within
+            the budget.
+
+    Raises:
+        ValueError: If the budget is too small to store the output matrices.
+
+    """
+    if mem["total"] <= max_memory:
+        return 1
+    if mem["output"] >= max_memory:
+        raise ValueError(
+            "Memory budget of "
+            + str(max_memory)
+            + " bytes is too small to store the discretization ("
+            + str(mem["output"])
+            + " bytes)"
+        )
+    local = mem["total"] - mem["output"]
+    return int(np.ceil(local / (max_memory - mem["output"])))
+
+
 # -----------------------------------------------------------------------------
 
 
@@ -1160,6 +1474,69 @@ def map_subgrid_to_grid(g, loc_faces, loc_cells, is_vector):
     return face_map, cell_map
 
 
+def partial_discretization(
+    g, data, tensor, bnd, apertures, partial_discr_func, physics="flow"
+):
+    """ Update a discretization stored in a data dictionary, by re-discretizing
+    the stencils affected by changes in the tensor.
+
+    The changed cells are taken from the tensor (see
+    tensor.SecondOrderTensor.changed_cells()). The rows of the discretization
+    matrices corresponding to the active faces of the partial discretization
+    are replaced, the other rows are kept. Changes in boundary conditions and
+    apertures are not tracked.
+
+    Parameters:
+        g (core.grids.grid): Grid to be discretized.
+        data (dictionary): Data dictionary, containing the discretization
+            matrices to be updated.
+        tensor (SecondOrderTensor or FourthOrderTensor): Tensor of the
+            discretization, with changed cells recorded. The recorded changes
+            are reset after the update.
+        bnd (BoundaryCondition): Boundary conditions.
+        apertures (np.ndarray): Cell-wise apertures.
+        partial_discr_func: Function for partial discretization, mpfa_partial
+            or mpsa_partial.
+        physics (str, optional): Physics of the discretization. For
+            'mechanics', the matrices 'stress' and 'bound_stress' are
+            updated, otherwise 'flux', 'bound_flux', 'bound_pressure_cell' and
+            'bound_pressure_face'. Defaults to 'flow'.
+
+    """
+    if physics == "mechanics":
+        keys = ["stress", "bound_stress"]
+        nd = g.dim
+    else:
+        keys = ["flux", "bound_flux", "bound_pressure_cell", "bound_pressure_face"]
+        nd = 1
+
+    cells = tensor.changed_cells()
+    if cells.size == 0:
+        return
+
+    partial = partial_discr_func(
+        g,
+        tensor,
+        bnd,
+        eta=determine_eta(g),
+        inverter=None,
+        cells=cells,
+        apertures=apertures,
+    )
+    active_faces = partial[-1]
+    rows = expand_indices_nd(active_faces, nd)
+
+    for key, mat in zip(keys, partial[:-1]):
+        # Replace the active rows, leaving the stored matrix untouched
+        updated = data[key].tocsr(copy=True)
+        zero_out_sparse_rows(updated, rows)
+        updated = updated + mat
+        updated.eliminate_zeros()
+        data[key] = updated
+
+    tensor.reset_changed()
+
+
 # ------------------------------------------------------------------------------
 
 
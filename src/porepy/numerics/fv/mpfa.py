@@ -3,7 +3,9 @@ Implementation of the multi-point flux approximation O-method.
 
 """
 from __future__ import division
+import multiprocessing
 import warnings
+import logging
 import numpy as np
 import scipy.sparse as sps
 
@@ -16,6 +18,8 @@ from porepy.numerics.mixed_dim.solver import Solver, SolverMixedDim
 from porepy.numerics.mixed_dim.coupler import Coupler
 from porepy.numerics.fv import TpfaCoupling, TpfaCouplingDFN
 
+logger = logging.getLogger(__name__)
+
 # ------------------------------------------------------------------------------
 
 
@@ -156,6 +160,18 @@ class Mpfa(Solver):
             Values of the boundary conditions. The dictionary has at most the
             following keys: 'dir' and 'neu', for Dirichlet and Neumann boundary
             conditions, respectively.
+        max_memory : double (optional)
+            Memory budget for the discretization, in bytes. If the estimated
+            memory need is larger, the discretization is split into partitions,
+            see mpfa().
+        partial_update : boolean (optional)
+            If True, and the matrices of a previous discretization are stored in
+            data, only the stencils affected by cells where the permeability has
+            changed are re-discretized. See fvutils.partial_discretization().
+        discretization_cache : DiscretizationCache (optional)
+            On-disk cache of discretizations. If the grid and parameters have
+            been discretized before, the matrices are loaded from the cache,
+            otherwise they are computed and stored in the cache.
 
         Parameters
         ----------
@@ -168,17 +184,55 @@ class Mpfa(Solver):
         bnd = param.get_bc(self)
         a = param.aperture
 
-        trm, bound_flux, bp_cell, bp_face = mpfa(g, k, bnd, apertures=a)
+        if data.get("partial_update", False) and "flux" in data:
+            fvutils.partial_discretization(
+                g, data, k, bnd, a, mpfa_partial, physics=self.physics
+            )
+            return
+
+        cache = data.get("discretization_cache", None)
+        if cache is not None:
+            key = cache.fingerprint(g, "mpfa", k, bnd, a)
+            matrices = cache.load(key)
+            if matrices is not None:
+                data.update(matrices)
+                return
+
+        trm, bound_flux, bp_cell, bp_face = mpfa(
+            g, k, bnd, apertures=a, max_memory=data.get("max_memory", None)
+        )
         data["flux"] = trm
         data["bound_flux"] = bound_flux
         data["bound_pressure_cell"] = bp_cell
         data["bound_pressure_face"] = bp_face
+        k.reset_changed()
+
+        if cache is not None:
+            cache.store(
+                key,
+                {
+                    "flux": trm,
+                    "bound_flux": bound_flux,
+                    "bound_pressure_cell": bp_cell,
+                    "bound_pressure_face": bp_face,
+                },
+            )
 
 
 # ------------------------------------------------------------------------------#
 
 
-def mpfa(g, k, bnd, eta=None, inverter=None, apertures=None, max_memory=None, **kwargs):
+def mpfa(
+    g,
+    k,
+    bnd,
+    eta=None,
+    inverter=None,
+    apertures=None,
+    max_memory=None,
+    num_workers=None,
+    **kwargs
+):
     """
     Discretize the scalar elliptic equation by the multi-point flux
     approximation method.
@@ -206,14 +260,20 @@ def mpfa(g, k, bnd, eta=None, inverter=None, apertures=None, max_memory=None, **
         eta Location of pressure continuity point. Defaults to 1/3 for simplex
             grids, 0 otherwise. On boundary faces with Dirichlet conditions,
             eta=0 will be enforced.
-        inverter (string) Block inverter to be used, either numba (default),
-            cython or python. See fvutils.invert_diagonal_blocks for details.
+        inverter (string) Block inverter to be used, either batched (default),
+            numba, cython or python. See fvutils.invert_diagonal_blocks for details.
         apertures (np.ndarray) apertures of the cells for scaling of the face
             normals.
-        max_memory (double): Threshold for peak memory during discretization.
-            If the **estimated** memory need is larger than the provided
-            threshold, the discretization will be split into an appropriate
-            number of sub-calculations, using mpfa_partial().
+        max_memory (double): Threshold for peak memory during discretization,
+            in bytes. If the **estimated** memory need (see
+            fvutils.estimate_memory()) is larger than the provided threshold,
+            the discretization will be split into an appropriate number of
+            sub-calculations, using mpfa_partial().
+        num_workers (int, optional): Number of processes used to discretize
+            the sub-calculations when max_memory is given. The grid and
+            parameters are inherited by the worker processes (fork), rather
+            than pickled for each sub-calculation. Defaults to None, in which
+            case the sub-calculations are run serially.
 
     Returns:
         scipy.sparse.csr_matrix (shape num_faces, num_cells): flux
@@ -264,65 +324,69 @@ def mpfa(g, k, bnd, eta=None, inverter=None, apertures=None, max_memory=None, **
     """
 
     if max_memory is None:
-        # For the moment nothing to do here, just call main mpfa method for the
-        # entire grid.
-        # TODO: We may want to estimate the memory need, and give a warning if
-        # this seems excessive
-        flux, bound_flux, bound_pressure_cell, bound_pressure_face = _mpfa_local(
-            g, k, bnd, eta=eta, inverter=inverter, apertures=apertures
-        )
+        num_part = 1
     else:
         # Estimate number of partitions necessary based on prescribed memory
         # usage
-        peak_mem = _estimate_peak_memory(g)
-        num_part = np.ceil(peak_mem / max_memory)
+        num_part = fvutils.num_partitions_for_memory(
+            _estimate_peak_memory(g), max_memory
+        )
+        logger.info("Split MPFA discretization into " + str(num_part) + " parts")
 
+    if num_part == 1:
+        # The entire grid is discretized in one go
+        flux, bound_flux, bound_pressure_cell, bound_pressure_face = _mpfa_local(
+            g, k, bnd, eta=eta, inverter=inverter, apertures=apertures
+        )
+    else:
         # Let partitioning module apply the best available method
         part = partition.partition(g, num_part)
 
-        # Boundary faces on the main grid
-        glob_bound_face = g.get_all_boundary_faces()
-
-        # Empty fields for flux and bound_flux. Will be expanded as we go.
-        # Implementation note: It should be relatively straightforward to
-        # estimate the memory need of flux (face_nodes -> node_cells ->
-        # unique).
-        flux = sps.csr_matrix(g.num_faces, g.num_cells)
-        bound_flux = sps.csr_matrix(g.num_faces, g.num_faces)
-        bound_pressure_cell = sps.csr_matrix(g.num_faces, g.num_cells)
-        bound_pressure_face = sps.csr_matrix(g.num_faces, g.num_faces)
-
+        # Accumulators for flux and bound_flux. The rows of each face are
+        # taken from the first partition covering the face, and the global
+        # matrices are assembled once all partitions are discretized.
+        flux = fvutils.SparseRowAccumulator((g.num_faces, g.num_cells))
+        bound_flux = fvutils.SparseRowAccumulator((g.num_faces, g.num_faces))
+        bound_pressure_cell = fvutils.SparseRowAccumulator((g.num_faces, g.num_cells))
+        bound_pressure_face = fvutils.SparseRowAccumulator((g.num_faces, g.num_faces))
+
+        # To discretize with as little overlap as possible, we use the
+        # keyword nodes to specify the update stencil. Find nodes of the
+        # cells in each partition.
         cn = g.cell_nodes()
+        part_nodes = [np.where((cn * (part == p)) > 0)[0] for p in np.unique(part)]
 
         face_covered = np.zeros(g.num_faces, dtype=np.bool)
 
-        for p in range(part.max()):
-            # Cells in this partitioning
-            cell_ind = np.argwhere(part == p).ravel("F")
-            # To discretize with as little overlap as possible, we use the
-            # keyword nodes to specify the update stencil. Find nodes of the
-            # local cells.
-            active_cells = np.zeros(g.num_cells, dtype=np.bool)
-            active_cells[cell_ind] = 1
-            active_nodes = np.squeeze(np.where((cn * active_cells) > 0))
-
-            # Perform local discretization.
-            loc_flux, loc_bound_flux, loc_bp_cell, loc_bp_face, loc_faces = mpfa_partial(
-                g, k, bnd, eta=eta, inverter=inverter, nodes=active_nodes
-            )
+        # Perform local discretizations. The results are returned in the order
+        # of the partitions, also if computed in parallel.
+        partitions = _mpfa_partitions(
+            g,
+            k,
+            bnd,
+            part_nodes,
+            num_workers=num_workers,
+            eta=eta,
+            inverter=inverter,
+            apertures=apertures,
+        )
+        for loc_flux, loc_bound_flux, loc_bp_cell, loc_bp_face, loc_faces in partitions:
+            # Only keep contributions from faces not already covered
+            new_faces = loc_faces[np.logical_not(face_covered[loc_faces])]
+            face_covered[loc_faces] = 1
 
-            # Eliminate contribution from faces already covered
-            loc_flux[face_covered, :] *= 0
-            loc_bound_flux[face_covered, :] *= 0
-            loc_bp_cell[face_covered, :] *= 0
-            loc_bp_face[face_covered, :] *= 0
+            flux.add_rows(loc_flux, new_faces)
+            bound_flux.add_rows(loc_bound_flux, new_faces)
+            bound_pressure_cell.add_rows(loc_bp_cell, new_faces)
+            bound_pressure_face.add_rows(loc_bp_face, new_faces)
 
-            face_covered[loc_faces] = 1
+        if not np.all(face_covered):
+            raise ValueError("The partitions do not cover all faces of the grid")
 
-            flux += loc_flux
-            bound_flux += loc_bound_flux
-            bound_pressure_cell += loc_bp_cell
-            bound_pressure_face += loc_bp_face
+        flux = flux.tocsr()
+        bound_flux = bound_flux.tocsr()
+        bound_pressure_cell = bound_pressure_cell.tocsr()
+        bound_pressure_face = bound_pressure_face.tocsr()
 
     return flux, bound_flux, bound_pressure_cell, bound_pressure_face
 
@@ -335,7 +399,7 @@ def mpfa_partial(
     k,
     bnd,
     eta=0,
-    inverter="numba",
+    inverter=None,
     cells=None,
     faces=None,
     nodes=None,
@@ -361,8 +425,8 @@ def mpfa_partial(
         eta Location of pressure continuity point. Should be 1/3 for simplex
             grids, 0 otherwise. On boundary faces with Dirichlet conditions,
             eta=0 will be enforced.
-        inverter (string) Block inverter to be used, either numba (default),
-            cython or python. See fvutils.invert_diagonal_blocks for details.
+        inverter (string) Block inverter to be used, either batched (default),
+            numba, cython or python. See fvutils.invert_diagonal_blocks for details.
         cells (np.array, int, optional): Index of cells on which to base the
             subgrid computation. Defaults to None.
         faces (np.array, int, optional): Index of faces on which to base the
@@ -384,8 +448,6 @@ def mpfa_partial(
             computed.
 
     """
-    if cells is not None:
-        warnings.warn("Cells keyword for partial mpfa has not been tested")
     if faces is not None:
         warnings.warn("Faces keyword for partial mpfa has not been tested")
 
@@ -403,6 +465,8 @@ def mpfa_partial(
     # Copy permeability field, and restrict to local cells
     loc_k = k.copy()
     loc_k.perm = loc_k.perm[::, ::, l2g_cells]
+    if apertures is not None:
+        apertures = apertures[l2g_cells]
 
     glob_bound_face = g.get_all_boundary_faces()
 
@@ -456,7 +520,7 @@ def mpfa_partial(
     )
 
 
-def _mpfa_local(g, k, bnd, eta=None, inverter="numba", apertures=None):
+def _mpfa_local(g, k, bnd, eta=None, inverter=None, apertures=None):
     """
     Actual implementation of the MPFA O-method. To calculate MPFA on a grid
     directly, either call this method, or, to respect the privacy of this
@@ -515,6 +579,12 @@ def _mpfa_local(g, k, bnd, eta=None, inverter="numba", apertures=None):
     elif g.dim == 0:
         return sps.csr_matrix([0]), 0, 0, 0
 
+    # Define subcell topology, that is, the local numbering of faces, subfaces,
+    # sub-cells and nodes. This numbering is used throughout the
+    # discretization. The topology is shared with other discretizations on
+    # the same grid, thus it is obtained before the grid is copied below.
+    subcell_topology = fvutils.cached_subcell_topology(g)
+
     # The grid coordinates are always three-dimensional, even if the grid is
     # really 2D. This means that there is not a 1-1 relation between the number
     # of coordinates of a point / vector and the real dimension. This again
@@ -541,11 +611,6 @@ def _mpfa_local(g, k, bnd, eta=None, inverter="numba", apertures=None):
         k.perm = np.delete(k.perm, (2), axis=0)
         k.perm = np.delete(k.perm, (2), axis=1)
 
-    # Define subcell topology, that is, the local numbering of faces, subfaces,
-    # sub-cells and nodes. This numbering is used throughout the
-    # discretization.
-    subcell_topology = fvutils.SubcellTopology(g)
-
     # Obtain normal_vector * k, pairings of cells and nodes (which together
     # uniquely define sub-cells, and thus index for gradients. See comment
     # below for the ordering of elements in the subcell gradient.
@@ -595,7 +660,7 @@ def _mpfa_local(g, k, bnd, eta=None, inverter="numba", apertures=None):
     # The boundary faces will have either a Dirichlet or Neumann condition, but
     # not both (Robin is not implemented).
     # Obtain mappings to exclude boundary faces.
-    bound_exclusion = fvutils.ExcludeBoundaries(subcell_topology, bnd, g.dim)
+    bound_exclusion = fvutils.cached_exclude_boundaries(subcell_topology, bnd, g.dim)
 
     # No flux conditions for Dirichlet boundary faces
     nk_grad = bound_exclusion.exclude_dirichlet(nk_grad)
@@ -745,38 +810,68 @@ def _mpfa_local(g, k, bnd, eta=None, inverter="numba", apertures=None):
 # ----------------------------------------------------------------------------#
 
 
-def _estimate_peak_memory(g):
+# Problem shared with the worker processes of a parallel partitioned
+# discretization. The field is set before the process pool is forked, thus the
+# grid and parameters are inherited by the workers rather than pickled for each
+# partition.
+_shared_partition_problem = {}
+
+
+def _mpfa_partial_worker(nodes):
     """
-    Rough estimate of peak memory need
+    Discretize a single partition, using the problem inherited from the parent
+    process.
     """
-    nd = g.dim
-    num_cell_nodes = g.cell_nodes().toarray().sum(axis=1)
+    prob = _shared_partition_problem
+    return mpfa_partial(prob["g"], prob["k"], prob["bnd"], nodes=nodes, **prob["kwargs"])
+
 
-    # Number of unknowns around a vertex: nd per cell that share the vertex for
-    # pressure gradients, and one per cell (cell center pressure)
-    num_grad_unknowns = nd * num_cell_nodes
+def _mpfa_partitions(g, k, bnd, part_nodes, num_workers=None, **kwargs):
+    """
+    Discretize a set of partitions with mpfa_partial, possibly in parallel.
+
+    Parameters:
+        g, k, bnd: Grid, permeability and boundary conditions, see mpfa().
+        part_nodes (list of np.array): Nodes defining the update stencil of
+            each partition.
+        num_workers (int, optional): Number of worker processes. If None or
+            less than 2, or if processes cannot be forked on this platform, the
+            partitions are discretized serially.
+        **kwargs: Passed on to mpfa_partial.
+
+    Yields:
+        The output of mpfa_partial for each partition, in the order of
+            part_nodes.
 
-    # The most expensive field is the storage of igrad, which is block diagonal
-    # with num_grad_unknowns sized blocks
-    igrad_size = num_grad_unknowns.sum()
+    """
+    if num_workers is not None and num_workers > 1:
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            warnings.warn("Fork is not available, partitions are run serially")
+            context = None
+    else:
+        context = None
 
-    # The discretization of Darcy's law will require nd (that is, a gradient)
-    # per sub-face.
-    num_sub_face = g.face_nodes.toarray().sum()
-    darcy_size = nd * num_sub_face
+    if context is None:
+        for nodes in part_nodes:
+            yield mpfa_partial(g, k, bnd, nodes=nodes, **kwargs)
+        return
 
-    # Balancing of fluxes will require 2*nd (gradient on both sides) fields per
-    # sub-face
-    nk_grad_size = 2 * nd * num_sub_face
-    # Similarly, pressure continuity requires 2 * (nd+1) (gradient on both
-    # sides, and cell center pressures) numbers
-    pr_cont_size = 2 * (nd + 1) * num_sub_face
+    _shared_partition_problem.update({"g": g, "k": k, "bnd": bnd, "kwargs": kwargs})
+    try:
+        with context.Pool(min(num_workers, len(part_nodes))) as pool:
+            for res in pool.imap(_mpfa_partial_worker, part_nodes):
+                yield res
+    finally:
+        _shared_partition_problem.clear()
 
-    total_size = igrad_size + darcy_size + nk_grad_size + pr_cont_size
 
-    # Not covered yet is various fields on subcell topology, mapping matrices
-    # between local and block ordering etc.
-    return total_size
+def _estimate_peak_memory(g):
+    """
+    Estimate of peak memory need, in bytes. See fvutils.estimate_memory().
+    """
+    return fvutils.estimate_memory(g, nd_var=1, num_cell_outputs=2, num_face_outputs=2)
 
 
 def _tensor_vector_prod(g, k, subcell_topology, apertures=None):
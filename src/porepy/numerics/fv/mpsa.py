@@ -101,6 +101,15 @@ class Mpsa(Solver):
                 conditions, respectively.
             apertures : (np.ndarray) (optional) apertures of the cells for scaling of
                 the face normals.
+        max_memory : (double) (optional) Memory budget for the discretization, in
+            bytes. If the estimated memory need is larger, the discretization is
+            split into partitions, see mpsa().
+        discretization_cache : (DiscretizationCache) (optional) On-disk cache of
+            discretizations. Not used for partial updates.
+        partial_update : (boolean) (optional) If True, and the matrices of a
+            previous discretization are stored in data, only the stencils
+            affected by cells where the stiffness has changed are
+            re-discretized. See fvutils.partial_discretization().
 
         Parameters
         ----------
@@ -111,11 +120,25 @@ class Mpsa(Solver):
         c = data["param"].get_tensor(self)
         bnd = data["param"].get_bc(self)
 
-        partial = data.get("partial_update", False)
+        partial = data.get("partial_update", False) and "stress" in data
         if not partial:
-            stress, bound_stress = mpsa(g, c, bnd)
+            cache = data.get("discretization_cache", None)
+            if cache is not None:
+                key = cache.fingerprint(g, "mpsa", c, bnd)
+                matrices = cache.load(key)
+                if matrices is not None:
+                    data.update(matrices)
+                    return
+
+            stress, bound_stress = mpsa(
+                g, c, bnd, max_memory=data.get("max_memory", None)
+            )
             data["stress"] = stress
             data["bound_stress"] = bound_stress
+            c.reset_changed()
+
+            if cache is not None:
+                cache.store(key, {"stress": stress, "bound_stress": bound_stress})
         else:
             a = data["param"].aperture
             fvutils.partial_discretization(
@@ -562,12 +585,13 @@ def mpsa(g, constit, bound, eta=None, inverter=None, max_memory=None, **kwargs):
         eta Location of pressure continuity point. Should be 1/3 for simplex
             grids, 0 otherwise. On boundary faces with Dirichlet conditions,
             eta=0 will be enforced.
-        inverter (string) Block inverter to be used, either numba (default),
-            cython or python. See fvutils.invert_diagonal_blocks for details.
-        max_memory (double): Threshold for peak memory during discretization.
-            If the **estimated** memory need is larger than the provided
-            threshold, the discretization will be split into an appropriate
-            number of sub-calculations, using mpsa_partial().
+        inverter (string) Block inverter to be used, either batched (default),
+            numba, cython or python. See fvutils.invert_diagonal_blocks for details.
+        max_memory (double): Threshold for peak memory during discretization,
+            in bytes. If the **estimated** memory need (see
+            fvutils.estimate_memory()) is larger than the provided threshold,
+            the discretization will be split into an appropriate number of
+            sub-calculations, using mpsa_partial().
 
     Returns:
         scipy.sparse.csr_matrix (shape num_faces, num_cells): stress
@@ -621,30 +645,33 @@ def mpsa(g, constit, bound, eta=None, inverter=None, max_memory=None, **kwargs):
         eta = fvutils.determine_eta(g)
 
     if max_memory is None:
-        # For the moment nothing to do here, just call main mpfa method for the
-        # entire grid.
-        # TODO: We may want to estimate the memory need, and give a warning if
-        # this seems excessive
-        stress, bound_stress = _mpsa_local(
-            g, constit, bound, eta=eta, inverter=inverter
-        )
+        num_part = 1
     else:
         # Estimate number of partitions necessary based on prescribed memory
         # usage
-        peak_mem = _estimate_peak_memory_mpsa(g)
-        num_part = np.ceil(peak_mem / max_memory)
-
+        num_part = fvutils.num_partitions_for_memory(
+            _estimate_peak_memory_mpsa(g), max_memory
+        )
         logger.info("Split MPSA discretization into " + str(num_part) + " parts")
 
+    if num_part == 1:
+        # The entire grid is discretized in one go
+        stress, bound_stress = _mpsa_local(
+            g, constit, bound, eta=eta, inverter=inverter
+        )
+    else:
         # Let partitioning module apply the best available method
         part = partition.partition(g, num_part)
 
-        # Empty fields for stress and bound_stress. Will be expanded as we go.
-        # Implementation note: It should be relatively straightforward to
-        # estimate the memory need of stress (face_nodes -> node_cells ->
-        # unique).
-        stress = sps.csr_matrix((g.num_faces * g.dim, g.num_cells * g.dim))
-        bound_stress = sps.csr_matrix((g.num_faces * g.dim, g.num_faces * g.dim))
+        # Accumulators for stress and bound_stress. The rows of each face are
+        # taken from the first partition covering the face, and the global
+        # matrices are assembled once all partitions are discretized.
+        stress = fvutils.SparseRowAccumulator(
+            (g.num_faces * g.dim, g.num_cells * g.dim)
+        )
+        bound_stress = fvutils.SparseRowAccumulator(
+            (g.num_faces * g.dim, g.num_faces * g.dim)
+        )
 
         cn = g.cell_nodes()
 
@@ -665,15 +692,19 @@ def mpsa(g, constit, bound, eta=None, inverter=None, max_memory=None, **kwargs):
                 g, constit, bound, eta=eta, inverter=inverter, nodes=active_nodes
             )
 
-            # Eliminate contribution from faces already covered
-            eliminate_ind = fvutils.expand_indices_nd(face_covered, g.dim)
-            fvutils.zero_out_sparse_rows(loc_stress, eliminate_ind)
-            fvutils.zero_out_sparse_rows(loc_bound_stress, eliminate_ind)
-
+            # Only keep contributions from faces not already covered
+            new_faces = loc_faces[np.logical_not(face_covered[loc_faces])]
             face_covered[loc_faces] = 1
 
-            stress += loc_stress
-            bound_stress += loc_bound_stress
+            new_rows = fvutils.expand_indices_nd(new_faces, g.dim)
+            stress.add_rows(loc_stress, new_rows)
+            bound_stress.add_rows(loc_bound_stress, new_rows)
+
+        if not np.all(face_covered):
+            raise ValueError("The partitions do not cover all faces of the grid")
+
+        stress = stress.tocsr()
+        bound_stress = bound_stress.tocsr()
 
     return stress, bound_stress
 
@@ -683,7 +714,7 @@ def mpsa_partial(
     constit,
     bound,
     eta=0,
-    inverter="numba",
+    inverter=None,
     cells=None,
     faces=None,
     nodes=None,
@@ -709,8 +740,8 @@ def mpsa_partial(
         eta Location of pressure continuity point. Should be 1/3 for simplex
             grids, 0 otherwise. On boundary faces with Dirichlet conditions,
             eta=0 will be enforced.
-        inverter (string) Block inverter to be used, either numba (default),
-            cython or python. See fvutils.invert_diagonal_blocks for details.
+        inverter (string) Block inverter to be used, either batched (default),
+            numba, cython or python. See fvutils.invert_diagonal_blocks for details.
         cells (np.array, int, optional): Index of cells on which to base the
             subgrid computation. Defaults to None.
         faces (np.array, int, optional): Index of faces on which to base the
@@ -732,8 +763,6 @@ def mpsa_partial(
             computed.
 
     """
-    if cells is not None:
-        warnings.warn("Cells keyword for partial mpfa has not been tested")
     if faces is not None:
         warnings.warn("Faces keyword for partial mpfa has not been tested")
 
@@ -800,7 +829,7 @@ def mpsa_partial(
     return stress_glob, bound_stress_glob, active_faces
 
 
-def _mpsa_local(g, constit, bound, eta=0, inverter="numba"):
+def _mpsa_local(g, constit, bound, eta=0, inverter=None):
     """
     Actual implementation of the MPSA W-method. To calculate the MPSA
     discretization on a grid, either call this method, or, to respect the
@@ -842,6 +871,11 @@ def _mpsa_local(g, constit, bound, eta=0, inverter="numba"):
 
     """
 
+    # Define subcell topology. The topology is shared with other
+    # discretizations on the same grid, thus it is obtained before the grid
+    # is copied below.
+    subcell_topology = fvutils.cached_subcell_topology(g)
+
     # The grid coordinates are always three-dimensional, even if the grid is
     # really 2D. This means that there is not a 1-1 relation between the number
     # of coordinates of a point / vector and the real dimension. This again
@@ -864,10 +898,8 @@ def _mpsa_local(g, constit, bound, eta=0, inverter="numba"):
 
     nd = g.dim
 
-    # Define subcell topology
-    subcell_topology = fvutils.SubcellTopology(g)
     # Obtain mappings to exclude boundary faces
-    bound_exclusion = fvutils.ExcludeBoundaries(subcell_topology, bound, nd)
+    bound_exclusion = fvutils.cached_exclude_boundaries(subcell_topology, bound, nd)
     # Most of the work is done by submethod for elasticity (which is common for
     # elasticity and poro-elasticity).
 
@@ -1003,39 +1035,12 @@ def mpsa_elasticity(g, constit, subcell_topology, bound_exclusion, eta, inverter
 
 
 def _estimate_peak_memory_mpsa(g):
-    """ Rough estimate of peak memory need for mpsa discretization.
+    """ Estimate of peak memory need for mpsa discretization, in bytes. See
+    fvutils.estimate_memory().
     """
-    nd = g.dim
-    num_cell_nodes = g.cell_nodes().sum(axis=1).A
-
-    # Number of unknowns around a vertex: nd^2 per cell that share the vertex
-    # for pressure gradients, and one per cell (cell center pressure)
-    num_grad_unknowns = nd ** 2 * num_cell_nodes
-
-    # The most expensive field is the storage of igrad, which is block diagonal
-    # with num_grad_unknowns sized blocks. The number of elements is the square
-    # of the local system size. The factor 2 accounts for matrix storage in
-    # sparse format (rows and data; ignore columns since this is in compressed
-    # format)
-    igrad_size = np.power(num_grad_unknowns, 2).sum() * 2
-
-    # The discretization of Hook's law will require nd^2 (that is, a gradient)
-    # per sub-face per dimension
-    num_sub_face = g.face_nodes.sum()
-    hook_size = nd * num_sub_face * nd ** 2
-
-    # Balancing of stresses will require 2*nd**2 (gradient on both sides)
-    # fields per sub-face per dimension
-    nk_grad_size = 2 * nd * num_sub_face * nd ** 2
-    # Similarly, pressure continuity requires 2 * (nd+1) (gradient on both
-    # sides, and cell center pressures) numbers
-    pr_cont_size = 2 * (nd ** 2 + 1) * num_sub_face * nd
-
-    total_size = igrad_size + hook_size + nk_grad_size + pr_cont_size
-
-    # Not covered yet is various fields on subcell topology, mapping matrices
-    # between local and block ordering etc.
-    return total_size
+    return fvutils.estimate_memory(
+        g, nd_var=g.dim, num_cell_outputs=1, num_face_outputs=1
+    )
 
 
 def __get_displacement_submatrices(
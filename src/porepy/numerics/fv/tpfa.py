@@ -201,7 +201,9 @@ class Tpfa(pp.numerics.mixed_dim.solver.Solver):
 
             is_not_active = np.logical_not(is_active)
 
-        fi, ci, sgn = sps.find(g.cell_faces)
+        # Grids with structured indexing may provide the cell-face
+        # connections without forming g.cell_faces
+        fi, ci, sgn = g.cell_face_triplets()
 
         # Normal vectors and permeability for each face (here and there side)
         if aperture is None:
@@ -253,10 +255,9 @@ class Tpfa(pp.numerics.mixed_dim.solver.Solver):
         # Create flux matrix
         flux = sps.coo_matrix((t[fi] * sgn, (fi, ci)))
 
-        # Create boundary flux matrix
-        bndr_sgn = (g.cell_faces[bndr_ind, :]).data
-        sort_id = np.argsort(g.cell_faces[bndr_ind, :].indices)
-        bndr_sgn = bndr_sgn[sort_id]
+        # Create boundary flux matrix. Boundary faces have a single cell, thus
+        # the sum of the signs of a face is the sign of its cell.
+        bndr_sgn = sgn_full[bndr_ind]
         bound_flux = sps.coo_matrix(
             (t_b * bndr_sgn, (bndr_ind, bndr_ind)), (g.num_faces, g.num_faces)
         )
@@ -256,36 +256,42 @@ class DualVEM(pp.numerics.mixed_dim.solver.Solver):
 
         # Allocate the data to store matrix entries, that's the most efficient
         # way to create a sparse matrix.
-        size = np.sum(np.square(g.cell_faces.indptr[1:] - g.cell_faces.indptr[:-1]))
+        num_faces_cell = np.diff(g.cell_faces.indptr)
+        size = np.sum(np.square(num_faces_cell))
         I = np.empty(size, dtype=np.int)
         J = np.empty(size, dtype=np.int)
         dataIJ = np.empty(size)
-        idx = 0
 
-        for c in np.arange(g.num_cells):
-            # For the current cell retrieve its faces
-            loc = slice(g.cell_faces.indptr[c], g.cell_faces.indptr[c + 1])
-            faces_loc = faces[loc]
+        # Position of the local matrix of each cell in the global structure
+        offset = np.hstack((0, np.cumsum(np.square(num_faces_cell))))
+
+        # Scale the permeability with the aperture, stored cell-wise
+        perm = np.transpose(a * k.perm[0 : g.dim, 0 : g.dim, :], (2, 0, 1))
 
-            # Compute the H_div-mass local matrix
-            A = self.massHdiv(
-                a[c] * k.perm[0 : g.dim, 0 : g.dim, c],
-                c_centers[:, c],
-                g.cell_volumes[c],
-                f_centers[:, faces_loc],
-                f_normals[:, faces_loc],
+        # The local matrices are computed in batches of cells with the same
+        # number of faces
+        for cells_loc, loc in self._cells_by_num_faces(g):
+            faces_loc = faces[loc]
+            num_loc = faces_loc.shape[1]
+
+            # Compute the H_div-mass local matrices
+            A = self.massHdiv_batch(
+                perm[cells_loc],
+                c_centers[:, cells_loc].T,
+                g.cell_volumes[cells_loc],
+                np.transpose(f_centers[:, faces_loc], (1, 0, 2)),
+                np.transpose(f_normals[:, faces_loc], (1, 0, 2)),
                 sign[loc],
-                diams[c],
-                weight[c],
+                diams[cells_loc],
+                weight[cells_loc],
             )[0]
 
-            # Save values for Hdiv-mass local matrix in the global structure
-            cols = np.tile(faces_loc, (faces_loc.size, 1))
-            loc_idx = slice(idx, idx + cols.size)
-            I[loc_idx] = cols.T.ravel()
-            J[loc_idx] = cols.ravel()
-            dataIJ[loc_idx] = A.ravel()
-            idx += cols.size
+            # Save values for Hdiv-mass local matrices in the global structure
+            loc_idx = offset[cells_loc, np.newaxis] + np.arange(num_loc ** 2)
+            rows = np.tile(faces_loc[:, :, np.newaxis], (1, 1, num_loc))
+            I[loc_idx] = rows.reshape((-1, num_loc ** 2))
+            J[loc_idx] = np.transpose(rows, (0, 2, 1)).reshape((-1, num_loc ** 2))
+            dataIJ[loc_idx] = A.reshape((-1, num_loc ** 2))
 
         # Construct the global matrices
         mass = sps.coo_matrix((dataIJ, (I, J)))
@@ -451,24 +457,26 @@ class DualVEM(pp.numerics.mixed_dim.solver.Solver):
         diams = g.cell_diameters()
 
         P0u = np.zeros((3, g.num_cells))
+        perm = np.transpose(a * k.perm[0 : g.dim, 0 : g.dim, :], (2, 0, 1))
 
-        for c in np.arange(g.num_cells):
-            loc = slice(g.cell_faces.indptr[c], g.cell_faces.indptr[c + 1])
+        for cells_loc, loc in self._cells_by_num_faces(g):
             faces_loc = faces[loc]
 
-            Pi_s = self.massHdiv(
-                a[c] * k.perm[0 : g.dim, 0 : g.dim, c],
-                c_centers[:, c],
-                g.cell_volumes[c],
-                f_centers[:, faces_loc],
-                f_normals[:, faces_loc],
+            Pi_s = self.massHdiv_batch(
+                perm[cells_loc],
+                c_centers[:, cells_loc].T,
+                g.cell_volumes[cells_loc],
+                np.transpose(f_centers[:, faces_loc], (1, 0, 2)),
+                np.transpose(f_normals[:, faces_loc], (1, 0, 2)),
                 sign[loc],
-                diams[c],
+                diams[cells_loc],
             )[1]
 
-            # extract the velocity for the current cell
-            P0u[dim, c] = np.dot(Pi_s, u[faces_loc]) / diams[c] * a[c]
-            P0u[:, c] = np.dot(R.T, P0u[:, c])
+            # extract the velocity for the current cells
+            u_loc = np.einsum("cij,cj->ic", Pi_s, u[faces_loc])
+            P0u[np.ix_(dim, cells_loc)] = u_loc / diams[cells_loc] * a[cells_loc]
+
+        P0u = np.dot(R.T, P0u)
 
         return P0u
 
@@ -556,6 +564,102 @@ class DualVEM(pp.numerics.mixed_dim.solver.Solver):
         return A, Pi_s
 
 
+    # ------------------------------------------------------------------------------#
+
+    def massHdiv_batch(
+        self, K, c_centers, c_volumes, f_centers, normals, sign, diams, weight=None
+    ):
+        """ Compute the local mass Hdiv matrices for a batch of cells with the
+        same number of faces, using the mixed vem approach. The computation is
+        the same as in self.massHdiv, but all the local matrices are computed
+        at once as stacked arrays.
+
+        Parameters
+        ----------
+        K : ndarray (num_cells, g.dim, g.dim)
+            Permeability of the cells.
+        c_centers : ndarray (num_cells, g.dim)
+            Cell centers.
+        c_volumes : array (num_cells)
+            Cell volumes.
+        f_centers : ndarray (num_cells, g.dim, num_faces_of_cell)
+            Center of the cell faces.
+        normals : ndarray (num_cells, g.dim, num_faces_of_cell)
+            Normal of the cell faces weighted by the face areas.
+        sign : ndarray (num_cells, num_faces_of_cell)
+            +1 or -1 if the normal is inward or outward to the cell.
+        diams : array (num_cells)
+            Diameter of the cells.
+        weight : array (num_cells)
+            weight for the stabilization term. Optional, default = 0.
+
+        Return
+        ------
+        A: ndarray (num_cells, num_faces_of_cell, num_faces_of_cell)
+            Local mass Hdiv matrices.
+        Pi_s: ndarray (num_cells, g.dim, num_faces_of_cell)
+            Local projection operators.
+        """
+        # Allow short variable names in this function
+        # pylint: disable=invalid-name
+
+        num_faces = f_centers.shape[2]
+        inv_diams = 1. / diams
+
+        # local matrices D, the gradients of the monomials are the scaled
+        # identity
+        D = np.matmul(np.transpose(normals, (0, 2, 1)), K * inv_diams[:, None, None])
+
+        # local matrices G
+        G = K * (np.square(inv_diams) * c_volumes)[:, None, None]
+
+        # local matrices F
+        F = sign[:, None, :] * (f_centers - c_centers[:, :, None])
+        F /= diams[:, None, None]
+
+        # Geometry stored in single precision, see Grid.compact(), satisfies
+        # the consistency condition only up to single precision
+        eps = np.finfo(np.result_type(c_volumes, np.float32)).eps
+        atol = max(1e-8, 100 * eps * np.abs(G).max())
+        assert np.allclose(G, np.matmul(F, D), atol=atol)
+
+        # local matrices Pi_s
+        Pi_s = np.linalg.solve(G, F)
+        I_Pi = np.eye(num_faces) - np.matmul(D, Pi_s)
+
+        # local Hdiv-mass matrices
+        A = np.matmul(np.transpose(Pi_s, (0, 2, 1)), np.matmul(G, Pi_s))
+        if weight is not None:
+            w = weight * np.amax(np.sum(np.abs(np.linalg.inv(K)), axis=2), axis=1)
+            A += w[:, None, None] * np.matmul(np.transpose(I_Pi, (0, 2, 1)), I_Pi)
+
+        return A, Pi_s
+
+    # ------------------------------------------------------------------------------#
+
+    def _cells_by_num_faces(self, g):
+        """ Group the cells of a grid by their number of faces.
+
+        The cell-face pairs are assumed ordered by cells, as in the column
+        ordering of g.cell_faces.
+
+        Parameters
+        ----------
+        g: grid, or a subclass.
+
+        Yield
+        ------
+        cells: array (num_cells_of_group) cells of the current group.
+        loc: ndarray (num_cells_of_group, num_faces_of_cell) indices of the
+            cell-face pairs of the cells in the current group.
+        """
+        num_faces_cell = np.diff(g.cell_faces.indptr)
+        for num_faces in np.unique(num_faces_cell):
+            cells = np.where(num_faces_cell == num_faces)[0]
+            loc = g.cell_faces.indptr[cells][:, np.newaxis] + np.arange(num_faces)
+            yield cells, loc
+
+
 # ------------------------------------------------------------------------------#
 
 
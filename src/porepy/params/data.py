@@ -514,21 +514,38 @@ class Parameters(object):
             conductivity if obj.physics equals 'transport'
             stiffness if physics equals 'mechanics'
 
+        If a tensor is already assigned for the physics, the cells where the
+        new tensor differs from the old one are marked as changed in the new
+        tensor, together with changes recorded in the old tensor and not yet
+        discretized. This is used for partial re-discretization, see
+        fvutils.partial_discretization().
+
         """
         physics = self._get_physics(obj)
 
         if physics == "flow":
-            self._perm = val
+            attr = "_perm"
         elif physics == "transport":
-            self._conductivity = val
+            attr = "_conductivity"
         elif physics == "mechanics":
-            self._stiffness = val
+            attr = "_stiffness"
         else:
             raise ValueError(
                 'Unknown physics "%s".\n Possible physics are: %s'
                 % (physics, self.known_physics)
             )
 
+        old = getattr(self, attr, None)
+        if (
+            old is not None
+            and old is not val
+            and isinstance(val, (SecondOrderTensor, FourthOrderTensor))
+            and type(old) == type(val)
+        ):
+            val.mark_changed(val.cells_different_from(old))
+            val.mark_changed(old.changed_cells())
+        setattr(self, attr, val)
+
     def get_permeability(self):
         """ tensor.SecondOrderTensor
         Cell wise permeability, represented as a second order tensor.
@@ -7,11 +7,77 @@ Created on Sat Feb 27 20:22:25 2016
 The tensor module contains classes for second and fourth order tensors,
 intended e.g. for representation of permeability and stiffness, respectively.
 """
+import abc
 import copy
 import numpy as np
 
 
-class SecondOrderTensor(object):
+class _CellwiseTensor(abc.ABC):
+    """ Tracking of the cells where a cell-wise tensor has changed.
+
+    The changed cells are used by discretization schemes to limit a
+    re-discretization to the stencils affected by the change, see
+    fvutils.partial_discretization(). Changes are recorded either explicitly,
+    by mark_changed(), or by Parameters.set_tensor(), which compares the new
+    tensor with the one it replaces.
+    """
+
+    @abc.abstractmethod
+    def _values(self):
+        """ Cell-wise values of the tensor, with cells along the last axis. """
+
+    def mark_changed(self, cells):
+        """ Record that the tensor has changed in some cells.
+
+        Parameters:
+            cells (np.ndarray, int or bool): Cells where the values changed.
+
+        """
+        changed = np.zeros(self._values().shape[-1], dtype=np.bool)
+        changed[cells] = True
+        if getattr(self, "_changed", None) is not None:
+            changed = np.logical_or(changed, self._changed)
+        self._changed = changed
+
+    def changed_cells(self):
+        """ Cells where the tensor has changed since the last call to
+        reset_changed().
+
+        Returns:
+            np.ndarray, int: Index of changed cells, sorted.
+
+        """
+        if getattr(self, "_changed", None) is None:
+            return np.array([], dtype=np.int)
+        return np.where(self._changed)[0]
+
+    def reset_changed(self):
+        """ Forget all recorded changes. Should be called when the tensor has
+        been discretized.
+        """
+        self._changed = None
+
+    def cells_different_from(self, other):
+        """ Find the cells where the values of this tensor differ from those
+        of another tensor.
+
+        Parameters:
+            other: Tensor of the same type.
+
+        Returns:
+            np.ndarray, int: Index of cells with different values. If the
+                tensors have different shapes, all cells are returned.
+
+        """
+        values = self._values()
+        other_values = other._values()
+        if values.shape != other_values.shape:
+            return np.arange(values.shape[-1])
+        diff = values != other_values
+        return np.where(np.any(diff.reshape((-1, values.shape[-1])), axis=0))[0]
+
+
+class SecondOrderTensor(_CellwiseTensor):
     """ Cell-wise permeability represented by (3 ,3 ,Nc)-matrix.
 
     The permeability is always 3-dimensional (since the geometry is always 3D),
@@ -136,6 +202,9 @@ class SecondOrderTensor(object):
                 self.dim, kxx, kxy=kxy, kxz=kxz, kyy=kyy, kyz=kyz, kzz=kzz
             )
 
+    def _values(self):
+        return self.perm
+
     def rotate(self, R):
         """
         Rotate the permeability given a rotation matrix.
@@ -149,7 +218,7 @@ class SecondOrderTensor(object):
 # ----------------------------------------------------------------------#
 
 
-class FourthOrderTensor(object):
+class FourthOrderTensor(_CellwiseTensor):
     """ Cell-wise representation of fourth order tensor.
 
     For each cell, there are dim^4 degrees of freedom, stored in a
@@ -312,5 +381,20 @@ class FourthOrderTensor(object):
         c = mu_mat * mu + lmbda_mat * lmbda + phi_mat * phi
         self.c = c
 
+    def _values(self):
+        return self.c
+
     def copy(self):
-        return FourthOrderTensor(self.dim, mu=self.mu, lmbda=self.lmbda)
+        """
+        Define a deep copy of the tensor.
+
+        The stiffness matrix c is copied as it is, thus modifications of c
+        that are not reflected in mu and lmbda are preserved.
+
+        Returns:
+            FourthOrderTensor: New tensor with identical fields, but separate
+                arrays (in the memory sense).
+        """
+        C = FourthOrderTensor(self.dim, mu=self.mu.copy(), lmbda=self.lmbda.copy())
+        C.c = self.c.copy()
+        return C
@@ -1,7 +1,7 @@
 """
 Various utility functions related to computational geometry.
 
-Some functions (add_point, split_edges, ...?) are mainly aimed at finding
+Some functions (remove_edge_crossings, ...?) are mainly aimed at finding
 intersection between lines, with grid generation in mind, and should perhaps
 be moved to a separate module.
 
@@ -10,6 +10,7 @@ from __future__ import division
 import logging
 import time
 import numpy as np
+from scipy import spatial
 from sympy import geometry as geom
 
 import shapely.geometry as shapely_geometry
@@ -84,374 +85,6 @@ def snap_to_grid(pts, tol=1e-3, box=None, **kwargs):
 # ------------------------------------------------------------------------------#
 
 
-def _split_edge(vertices, edges, edge_ind, new_pt, **kwargs):
-    """
-    Split a line into two by introcuding a new point.
-    Function is used e.g. for gridding purposes.
-
-    The input can be a set of points, and lines between them, of which one is
-    to be split.
-
-    New lines will be inserted, unless the new points coincide with the
-    start or endpoint of the edge (under the given precision).
-
-    The code is intended for 2D, in 3D use with caution.
-
-    Examples:
-        >>> p = np.array([[0, 0], [0, 1]])
-        >>> edges = np.array([[0], [1]])
-        >>> new_pt = np.array([[0], [0.5]])
-        >>> v, e, nl, _ = _split_edge(p, edges, 0, new_pt, tol=1e-3)
-        >>> e
-        array([[0, 2],
-               [2, 1]])
-
-    Parameters:
-        vertices (np.ndarray, nd x num_pt): Points of the vertex sets.
-        edges (np.ndarray, n x num_edges): Connections between lines. If n>2,
-            the additional rows are treated as tags, that are preserved under
-            splitting.
-        edge_ind (int): index of edges to be split.
-        new_pt (np.ndarray, nd x n): new points to be inserted. Assumed to be
-            on the edge to be split. If more than one point is inserted
-            (segment intersection), it is assumed that new_pt[:, 0] is the one
-            closest to edges[0, edge_ind] (conforming with the output of
-            lines_intersect).
-        **kwargs: Arguments passed to snap_to_grid
-
-    Returns:
-        np.ndarray, nd x n_pt: new point set, possibly with new point inserted.
-        np.ndarray, n x n_con: new edge set, possibly with new lines defined.
-        boolean: True if a new line is created, otherwise false.
-        int: Splitting type, indicating which splitting strategy was used.
-            Intended for debugging.
-
-    """
-    logger = logging.getLogger(__name__ + ".split_edge")
-    tol = kwargs["tol"]
-
-    # Some back and forth with the index of the edges to be split, depending on
-    # whether it is one or two
-    edge_ind = np.asarray(edge_ind)
-    if edge_ind.size > 1:
-        edge_ind_first = edge_ind[0]
-    else:
-        edge_ind_first = edge_ind
-
-    # Start and end of the first (possibly only) edge
-    start = edges[0, edge_ind_first]
-    end = edges[1, edge_ind_first]
-
-    # Number of points before edges is modified. Used for sanity check below.
-    orig_num_pts = edges[:2].max()
-    orig_num_edges = edges.shape[1]
-
-    # Save tags associated with the edge.
-    # NOTE: For segment intersetions where the edges have different tags, one
-    # of the values will be overridden now. Fix later.
-    tags = edges[2:, edge_ind_first]
-
-    # Try to add new points
-    vertices, pt_ind, _ = _add_point(vertices, new_pt, **kwargs)
-
-    # Sanity check
-    assert len(pt_ind) <= 2, "Splitting can at most create two new points"
-    # Check for a single intersection point
-    if len(pt_ind) < 2:
-        pi = pt_ind[0]
-        # Intersection at a point.
-        if start == pi or end == pi:
-            # Nothing happens, the intersection between the edges coincides
-            # with a shared vertex for the edges
-            new_line = 0
-            split_type = 0
-            logger.debug("Intersection on shared vertex")
-            return vertices, edges, new_line, split_type
-        else:
-            # We may need to split the edge (start, end) into two
-            new_edges = np.array([[start, pi], [pi, end]])
-            # ... however, the new edges may already exist in the set (this
-            # apparently can happen for complex networks with several fractures
-            # sharing a line).
-            # Check if the new candidate edges already are defined in the set
-            # of edges
-            ismem, _ = setmembership.ismember_rows(new_edges, edges[:2])
-            if any(ismem):
-                new_edges = np.delete(new_edges, np.squeeze(np.argwhere(ismem)), axis=0)
-            if new_edges.shape[0] == 1:
-                new_edges = new_edges.reshape((-1, 1))
-
-        if new_edges.size == 0:
-            new_line = 0
-            split_type = 1
-            logger.debug("Intersection on existing vertex")
-            return vertices, edges, new_line, split_type
-
-        # Add any tags to the new edge.
-        if tags.size > 0:
-            new_edges = np.vstack(
-                (new_edges, np.tile(tags[:, np.newaxis], new_edges.shape[1]))
-            )
-        # Insert the new edge in the midle of the set of edges.
-        edges = np.hstack(
-            (edges[:, :edge_ind_first], new_edges, edges[:, edge_ind_first + 1 :])
-        )
-        # We have added as many new edges as there are columns in new_edges,
-        # minus 1 (which was removed / ignored).
-        new_line = new_edges.shape[1] - 1
-
-        # Sanity check of new edge
-        if np.any(np.diff(edges[:2], axis=0) == 0):
-            raise ValueError("Have created a point edge")
-        edge_copy = np.sort(edges[:2], axis=0)
-        edge_unique, _, _ = setmembership.unique_columns_tol(edge_copy, tol=tol)
-        if edge_unique.shape[1] < edges.shape[1]:
-            raise ValueError("Have created the same edge twice")
-
-        split_type = 2
-        logger.debug("Intersection on new single vertex")
-        return vertices, edges, new_line, split_type
-    else:
-        logger.debug("Splitting handles two points")
-        # Without this, we will delete something we should not delete below.
-        assert edge_ind[0] < edge_ind[1]
-
-        # Intersection along a segment.
-        # No new points should have been made
-        assert pt_ind[0] <= orig_num_pts and pt_ind[1] <= orig_num_pts
-
-        pt_ind = np.reshape(np.array(pt_ind), (-1, 1))
-
-        # There are three (four) possible configurations
-        # a) The intersection is contained within (start, end). edge_ind[0]
-        # should be split into three segments, and edge_ind[1] should be
-        # deleted (it will be identical to the middle of the new segments).
-        # b) The intersection is identical with (start, end). edge_ind[1]
-        # should be split into three segments, and edge_ind[0] is deleted.
-        # c) and d) The intersection consists of one of (start, end), and another
-        # point. Both edge_ind[0] and edge_ind[1] should be split into two
-        # segments.
-
-        i0 = pt_ind[0]
-        i1 = pt_ind[1]
-        if i0 != start and i1 != end:
-            # Delete the second segment
-            edges = np.delete(edges, edge_ind[1], axis=1)
-            if edges.shape[0] == 1:
-                edges = edges.reshape((-1, 1))
-            # We know that i0 will be closest to start, thus (start, i0) is a
-            # pair.
-            # New segments (i0, i1) is identical to the old edge_ind[1]
-            new_edges = np.array([[start, i0, i1], [i0, i1, end]])
-            if tags.size > 0:
-                new_edges = np.vstack(
-                    (new_edges, np.tile(tags[:, np.newaxis], new_edges.shape[1]))
-                )
-            # Combine everything.
-            edges = np.hstack(
-                (edges[:, : edge_ind[0]], new_edges, edges[:, edge_ind[0] + 1 :])
-            )
-
-            logger.debug("Second edge split into two new parts")
-            split_type = 4
-        elif i0 == start and i1 == end:
-            # We don't know if i0 is closest to the start or end of edges[:,
-            # edges_ind[1]]. Find the nearest.
-            if dist_point_pointset(
-                vertices[:, i0], vertices[:, edges[0, edge_ind[1]]]
-            ) < dist_point_pointset(
-                vertices[:, i1], vertices[:, edges[0, edge_ind[1]]]
-            ):
-                other_start = edges[0, edge_ind[1]]
-                other_end = edges[1, edge_ind[1]]
-            else:
-                other_start = edges[1, edge_ind[1]]
-                other_end = edges[0, edge_ind[1]]
-            # New segments (i0, i1) is identical to the old edge_ind[0]
-            new_edges = np.array([[other_start, i0, i1], [i0, i1, other_end]])
-            # For some reason we sometimes create point-edges here (start and
-            # end are identical). Delete these if necessary
-            del_ind = np.squeeze(np.where(np.diff(new_edges, axis=0)[0] == 0))
-            new_edges = np.delete(new_edges, del_ind, axis=1)
-            if tags.size > 0:
-                new_edges = np.vstack(
-                    (new_edges, np.tile(tags[:, np.newaxis], new_edges.shape[1]))
-                )
-            # Combine everything.
-            edges = np.hstack(
-                (edges[:, : edge_ind[1]], new_edges, edges[:, (edge_ind[1] + 1) :])
-            )
-            # Delete the second segment. This is most easily handled after
-            # edges is expanded, to avoid accounting for changing edge indices.
-            edges = np.delete(edges, edge_ind[0], axis=1)
-            logger.debug("First edge split into 2 parts")
-            split_type = 5
-
-        # Note that we know that i0 is closest to start, thus no need to test
-        # for i1 == start
-        elif i0 == start and i1 != end:
-            # The intersection starts in start of edge_ind[0], and end before
-            # the end of edge_ind[0] (if not we would have i1==end).
-            # The intersection should be split into intervals (start, i1), (i1,
-            # end) and possibly (edge_ind[1][0 or 1], start); with the latter
-            # representing the part of edge_ind[1] laying on the other side of
-            # start compared than i1. The latter part will should not be
-            # included if start is also a node of edge_ind[1].
-            #
-            # Examples in 1d (really needed to make this concrete right now):
-            #  edge_ind[0] = (0, 2), edge_ind[1] = (-1, 1) is split into
-            #   (0, 1), (1, 2) and (-1, 1) (listed in the same order as above).
-            #
-            # edge_ind[0] = (0, 2), edge_ind[1] = (0, 1) is split into
-            #   (0, 1), (1, 2)
-            if edges[0, edge_ind[1]] == i1:
-                if edges[1, edge_ind[1]] == start:
-                    logger.debug("First edge split into 2")
-                    edges = np.delete(edges, edge_ind[1], axis=1)
-                else:
-                    edges[0, edge_ind[1]] = start
-                    logger.debug("First and second edge split into 2")
-            elif edges[1, edge_ind[1]] == i1:
-                if edges[0, edge_ind[1]] == start:
-                    edges = np.delete(edges, edge_ind[1], axis=1)
-                    logger.debug("First edge split into 2")
-                else:
-                    edges[1, edge_ind[1]] = start
-                    logger.debug("First and second edge split into 2")
-            else:
-                raise ValueError("This should not happen")
-
-            new_edges = np.array([[start, i1], [i1, end]])
-            if tags.size > 0:
-                new_edges = np.vstack(
-                    (new_edges, np.tile(tags[:, np.newaxis], new_edges.shape[1]))
-                )
-
-            edges = np.hstack(
-                (edges[:, : edge_ind[0]], new_edges, edges[:, (edge_ind[0] + 1) :])
-            )
-            split_type = 6
-
-        elif i0 != start and i1 == end:
-            # Analogous configuration as the one above, but with i0 replaced by
-            # i1 and start by end.
-            if edges[0, edge_ind[1]] == i0:
-                if edges[1, edge_ind[1]] == end:
-                    edges = np.delete(edges, edge_ind[1], axis=1)
-                    logger.debug("First edge split into 2")
-                else:
-                    edges[0, edge_ind[1]] = end
-                    logger.debug("First and second edge split into 2")
-            elif edges[1, edge_ind[1]] == i0:
-                if edges[0, edge_ind[1]] == end:
-                    edges = np.delete(edges, edge_ind[1], axis=1)
-                    logger.debug("First edge split into 2")
-                else:
-                    edges[1, edge_ind[1]] = end
-                    logger.debug("First and second edge split into 2")
-            else:
-                raise ValueError("This should not happen")
-            new_edges = np.array([[start, i0], [i0, end]])
-            if tags.size > 0:
-                new_edges = np.vstack(
-                    (new_edges, np.tile(tags[:, np.newaxis], new_edges.shape[1]))
-                )
-
-            edges = np.hstack(
-                (edges[:, : edge_ind[0]], new_edges, edges[:, (edge_ind[0] + 1) :])
-            )
-            split_type = 7
-
-        else:
-            raise ValueError("How did it come to this")
-
-        # Check validity of the new edge configuration
-        if np.any(np.diff(edges[:2], axis=0) == 0):
-            raise ValueError("Have created a point edge")
-
-        # We may have created an edge that already existed in the grid. Remove
-        # this by uniquifying the edges.
-        # Hopefully, we do not mess up the edges here.
-        edges_copy = np.sort(edges[:2], axis=0)
-        edges_unique, new_2_old, _ = setmembership.unique_columns_tol(
-            edges_copy, tol=tol
-        )
-        # Refer to unique edges if necessary
-        if edges_unique.shape[1] < edges.shape[1]:
-            # Copy tags
-            edges = np.vstack((edges_unique, edges[2:, new_2_old]))
-            # Also signify that we have carried out this operation.
-            split_type = [split_type, 8]
-
-        # Number of new lines created
-        new_line = edges.shape[1] - orig_num_edges
-
-        return vertices, edges, new_line, split_type
-
-
-# ------------------------------------------------------**kwargs------------------------#
-
-
-def _add_point(vertices, pt, tol=1e-3, snap=True, **kwargs):
-    """
-    Add a point to a point set, unless the point already exist in the set.
-
-    Point coordinates are compared relative to an underlying Cartesian grid,
-    see snap_to_grid for details.
-
-    The function is created with gridding in mind, but may be useful for other
-    purposes as well.
-
-    Parameters:
-        vertices (np.ndarray, nd x num_pts): existing point set
-        pt (np.ndarray, nd x 1): Point to be added
-        tol (double): Precision of underlying Cartesian grid
-        **kwargs: Arguments passed to snap_to_grid
-
-    Returns:
-        np.ndarray, nd x n_pt: New point set, possibly containing a new point
-        int: Index of the new point added (if any). If not, index of the
-            closest existing point, i.e. the one that made a new point
-            unnecessary.
-        np.ndarray, nd x 1: The new point, or None if no new point was needed.
-
-    """
-    if "tol" not in kwargs:
-        kwargs["tol"] = tol
-
-    nd = vertices.shape[0]
-    # Before comparing coordinates, snap both existing and new point to the
-    # underlying grid
-    if snap:
-        vertices = snap_to_grid(vertices, **kwargs)
-        pt = snap_to_grid(pt, **kwargs)
-
-    new_pt = np.empty((nd, 0))
-    ind = []
-    # Distance
-    for i in range(pt.shape[-1]):
-        dist = dist_point_pointset(pt[:, i], vertices)
-        min_dist = np.min(dist)
-
-        # The tolerance parameter here turns out to be critical in an edge
-        # intersection removal procedure. The scaling factor is somewhat
-        # arbitrary, and should be looked into.
-        if min_dist < tol * np.sqrt(3):
-            # No new point is needed
-            ind.append(np.argmin(dist))
-        else:
-            # Append the new point at the end of the point list
-            ind.append(vertices.shape[1])
-            vertices = np.append(vertices, pt, axis=1)
-            new_pt = np.hstack((new_pt, pt[:, i].reshape((-1, 1))))
-    if new_pt.shape[1] == 0:
-        new_pt = None
-    return vertices, ind, new_pt
-
-
-# -----------------------------------------------------------------------------#
-
-
 def remove_edge_crossings(vertices, edges, tol=1e-3, verbose=0, snap=True, **kwargs):
     """
     Process a set of points and connections between them so that the result
@@ -465,6 +98,14 @@ def remove_edge_crossings(vertices, edges, tol=1e-3, verbose=0, snap=True, **kwa
     The connections are defined by their start and endpoints, and can also
     have tags assigned. If so, the tags are preserved as connections are split.
 
+    Candidate pairs of connections are found by overlap of their bounding
+    boxes, and the intersections are computed for the original connections.
+    Each connection is then replaced, at its position in the edge array, by
+    the segments between its intersection points, ordered from its start to
+    its end point. New points are appended to the point set. Segments that are
+    defined more than once, e.g. due to overlapping connections, are only
+    kept at their first occurrence, with the tags of that connection.
+
     Parameters:
         vertices (np.ndarray, 2 x n_pt): Coordinates of points to be processed
         edges (np.ndarray, n x n_con): Connections between lines. n >= 2, row
@@ -497,233 +138,175 @@ def remove_edge_crossings(vertices, edges, tol=1e-3, verbose=0, snap=True, **kwa
     if nd != 2:
         raise NotImplementedError("Only 2D so far")
 
-    edge_counter = 0
-
-    # Add tolerance to kwargs, this is later passed to split_edges, and further
-    # on.
+    # Add tolerance to kwargs, this is later passed to snap_to_grid
     kwargs["tol"] = tol
     kwargs["snap"] = snap
     if snap:
         vertices = snap_to_grid(vertices, **kwargs)
 
-    # Field used for debugging of edge splits. To see the meaning of the values
-    # of each split, look in the source code of split_edges.
-    split_type = []
-
-    # Loop over all edges, search for intersections. The number of edges can
-    # change due to splitting.
-    while edge_counter < edges.shape[1]:
-        # The direct test of whether two edges intersect is somewhat
-        # expensive, and it is hard to vectorize this part. Therefore,
-        # we first identify edges which crosses the extention of this edge (
-        # intersection of line and line segment). We then go on to test for
-        # real intersections.
-        logger.debug(
-            "Remove intersection from edge with indices %i, %i",
-            edges[0, edge_counter],
-            edges[1, edge_counter],
+    num_edges = edges.shape[1]
+    start = vertices[:, edges[0]]
+    end = vertices[:, edges[1]]
+
+    # Broad phase: Only edges with overlapping bounding boxes can intersect.
+    # lines_intersect() allows intersection points to be outside an edge with
+    # a distance of tol relative to its length, the boxes are extended
+    # accordingly.
+    length = np.sqrt(np.sum((end - start) ** 2, axis=0))
+    margin = tol * np.maximum(length, 1)
+    candidates = overlapping_boxes(
+        np.minimum(start, end) - margin, np.maximum(start, end) + margin
+    )
+    logger.debug("Found %i candidate pairs", candidates.shape[1])
+
+    # Exact test for the candidate pairs. All intersections are computed for
+    # the original edges, the splitting is done afterwards.
+    isect_pts = []
+    isect_edges = []
+    for e0, e1 in candidates.T:
+        new_pt = lines_intersect(
+            start[:, e0], end[:, e0], start[:, e1], end[:, e1], tol=tol
         )
-        # Find start and stop coordinates for all edges
-        start_x = vertices[0, edges[0]]
-        start_y = vertices[1, edges[0]]
-        end_x = vertices[0, edges[1]]
-        end_y = vertices[1, edges[1]]
+        if new_pt is None:
+            continue
+        if snap:
+            new_pt = snap_to_grid(new_pt, tol=tol)
         logger.debug(
-            "Start point (%.5f, %.5f), End (%.5f, %.5f)",
-            start_x[edge_counter],
-            start_y[edge_counter],
-            end_x[edge_counter],
-            end_y[edge_counter],
-        )
-
-        a = end_y - start_y
-        b = -(end_x - start_x)
-
-        # Midpoint of this edge
-        xm = (start_x[edge_counter] + end_x[edge_counter]) / 2.
-        ym = (start_y[edge_counter] + end_y[edge_counter]) / 2.
-
-        # For all lines, find which side of line i it's two endpoints are.
-        # If c1 and c2 have different signs, they will be on different sides
-        # of line i. See
-        #
-        # http://stackoverflow.com/questions/385305/efficient-maths-algorithm-to-calculate-intersections
-        #
-        # answer by PolyThinker and comments by Jason S, for more information.
-        c1 = a[edge_counter] * (start_x - xm) + b[edge_counter] * (start_y - ym)
-        c2 = a[edge_counter] * (end_x - xm) + b[edge_counter] * (end_y - ym)
-
-        tol_scaled = tol * max(1, np.max([np.sqrt(np.abs(c1)), np.sqrt(np.abs(c2))]))
-
-        # We check for three cases
-        # 1) Lines crossing
-        lines_cross = np.sign(c1) != np.sign(c2)
-        # 2) Lines parallel
-        parallel_lines = np.logical_and(
-            np.abs(c1) < tol_scaled, np.abs(c2) < tol_scaled
+            "Found %i intersection points between edges %i and %i",
+            new_pt.shape[1],
+            e0,
+            e1,
         )
-        # 3) One line look to end on the other
-        lines_almost_cross = np.logical_or(
-            np.abs(c1) < tol_scaled, np.abs(c2) < tol_scaled
+        # An intersection point splits both edges. For intersections along a
+        # segment, both edges are split at both endpoints of the segment.
+        for i in range(new_pt.shape[1]):
+            isect_pts.append(new_pt[:, i])
+            isect_edges.append([e0, e1])
+
+    if len(isect_pts) == 0:
+        logger.debug("Found no intersections")
+        return vertices, edges
+
+    isect_pts = np.array(isect_pts).T
+    isect_edges = np.array(isect_edges).T
+    logger.debug("Found %i intersection points", isect_pts.shape[1])
+
+    # Identify intersection points with existing vertices, or with each
+    # other. New points are added to the end of the point set, ordered by the
+    # first pair of edges they split.
+    if snap:
+        isect_pts = snap_to_grid(isect_pts, **kwargs)
+    point_tol = tol * np.sqrt(3)
+    dist, isect_ind = spatial.cKDTree(vertices.T).query(isect_pts.T)
+    is_new = dist >= point_tol
+    if np.any(is_new):
+        new_pts, _, new_ind = setmembership.unique_columns_tol(
+            isect_pts[:, is_new], tol=point_tol / np.sqrt(nd)
         )
-        # Any of the three above deserves a closer look
-        line_intersections = np.logical_or(
-            np.logical_or(parallel_lines, lines_cross), lines_almost_cross
+        isect_ind[is_new] = vertices.shape[1] + new_ind
+        vertices = np.hstack((vertices, new_pts))
+
+    # Split points of each edge, sorted along the edge. Points that coincide
+    # with the endpoints of the edge do not split it.
+    split_edge = isect_edges.ravel()
+    split_pt = np.tile(isect_ind, 2)
+    not_endpoint = np.logical_and(
+        split_pt != edges[0, split_edge], split_pt != edges[1, split_edge]
+    )
+    split_edge = split_edge[not_endpoint]
+    split_pt = split_pt[not_endpoint]
+    direction = end[:, split_edge] - start[:, split_edge]
+    t = np.sum(
+        (vertices[:, split_pt] - start[:, split_edge]) * direction, axis=0
+    ) / np.sum(direction ** 2, axis=0)
+    order = np.lexsort((split_pt, t, split_edge))
+    split_edge = split_edge[order]
+    split_pt = split_pt[order]
+    # Remove duplicate split points
+    duplicate = np.logical_and(
+        split_edge[1:] == split_edge[:-1], split_pt[1:] == split_pt[:-1]
+    )
+    keep = np.ones(split_edge.size, dtype=np.bool)
+    keep[1:] = np.logical_not(duplicate)
+    split_edge = split_edge[keep]
+    split_pt = split_pt[keep]
+
+    # Each edge is replaced, in place, by the sequence of segments between its
+    # start point, the split points and its end point.
+    num_split = np.bincount(split_edge, minlength=num_edges)
+    seq_end = np.cumsum(num_split + 2)
+    seq_start = seq_end - num_split - 2
+    sequence = np.empty(seq_end[-1], dtype=edges.dtype)
+    sequence[seq_start] = edges[0]
+    sequence[seq_end - 1] = edges[1]
+    inner = np.ones(seq_end[-1], dtype=np.bool)
+    inner[seq_start] = False
+    inner[seq_end - 1] = False
+    # The split points are sorted by edge, and so are the inner positions
+    sequence[inner] = split_pt
+
+    is_segment_start = np.ones(seq_end[-1], dtype=np.bool)
+    is_segment_start[seq_end - 1] = False
+    segment_start = np.where(is_segment_start)[0]
+    parent = np.repeat(np.arange(num_edges), num_split + 1)
+    new_edges = np.vstack(
+        (
+            sequence[segment_start],
+            sequence[segment_start + 1],
+            edges[2:, parent],
         )
+    )
 
-        # Find elements which may intersect.
-        intersections = np.argwhere(line_intersections)
-        # np.argwhere returns an array of dimensions (1, dim), so we reduce
-        # this to truly 1D, or simply continue with the next edge if there
-        # are no candidate edges
-        if intersections.size > 0:
-            intersections = intersections.ravel("C")
-            logger.debug("Found %i candidate intersections", intersections.size)
-        else:
-            # There are no candidates for intersection
-            edge_counter += 1
-            logger.debug("Found no candidate intersections")
-            continue
+    # Remove point edges, and edges that are defined more than once, for
+    # instance as a result of overlapping segments. The first occurrence, and
+    # its tags, are kept.
+    new_edges = new_edges[:, new_edges[0] != new_edges[1]]
+    _, first_occurrence = np.unique(
+        np.sort(new_edges[:2], axis=0), axis=1, return_index=True
+    )
+    new_edges = new_edges[:, np.sort(first_occurrence)]
 
-        size_before_splitting = edges.shape[1]
-
-        int_counter = 0
-        while intersections.size > 0 and int_counter < intersections.size:
-            # Line intersect (inner loop) is an intersection if it crosses
-            # the extension of line edge_counter (outer loop) (ie intsect it
-            #  crosses the infinite line that goes through the endpoints of
-            # edge_counter), but we don't know if it actually crosses the
-            # line segment edge_counter. Now we do a more refined search to
-            # find if the line segments intersects. Note that there is no
-            # help in vectorizing lines_intersect and computing intersection
-            #  points for all lines in intersections, since line i may be
-            # split, and the intersection points must recalculated. It may
-            # be possible to reorganize this while-loop by computing all
-            # intersection points(vectorized), and only recompuing if line
-            # edge_counter is split, but we keep things simple for now.
-            intsect = intersections[int_counter]
-            if intsect <= edge_counter:
-                int_counter += 1
-                continue
+    logger.debug("Edges split into %i new parts", new_edges.shape[1] - num_edges)
+    return vertices, new_edges
 
-            logger.debug("Look for intersection with edge %i", intsect)
-            logger.debug(
-                "Outer edge: Start (%.5f, %.5f), End (%.5f, %.5f)",
-                vertices[0, edges[0, edge_counter]],
-                vertices[1, edges[0, edge_counter]],
-                vertices[0, edges[1, edge_counter]],
-                vertices[1, edges[1, edge_counter]],
-            )
-            logger.debug(
-                "Inner edge: Start (%.5f, %.5f), End (%.5f, %.5f)",
-                vertices[0, edges[0, intsect]],
-                vertices[1, edges[0, intsect]],
-                vertices[0, edges[1, intsect]],
-                vertices[1, edges[1, intsect]],
-            )
 
-            # Check if this point intersects
-            new_pt = lines_intersect(
-                vertices[:, edges[0, edge_counter]],
-                vertices[:, edges[1, edge_counter]],
-                vertices[:, edges[0, intsect]],
-                vertices[:, edges[1, intsect]],
-                tol=tol,
-            )
+def overlapping_boxes(min_coord, max_coord):
+    """
+    Find pairs of axis-aligned boxes that overlap.
 
-            def __min_dist(p):
-                md = np.inf
-                for pi in [
-                    edges[0, edge_counter],
-                    edges[1, edge_counter],
-                    edges[0, intsect],
-                    edges[1, intsect],
-                ]:
-                    md = min(md, dist_point_pointset(p, vertices[:, pi]))
-                return md
-
-            orig_vertex_num = vertices.shape[1]
-            orig_edge_num = edges.shape[1]
-
-            if new_pt is None:
-                logger.debug("No intersection found")
-            else:
-                if snap:
-                    new_pt = snap_to_grid(new_pt, tol=tol)
-                # The case of segment intersections need special treatment.
-                if new_pt.shape[-1] == 1:
-                    logger.debug(
-                        "Found intersection (%.5f, %.5f)", new_pt[0], new_pt[1]
-                    )
-
-                    # Split edge edge_counter (outer loop), unless the
-                    # intersection hits an existing point (in practices this
-                    # means the intersection runs through an endpoint of the
-                    # edge in an L-type configuration, in which case no new point
-                    # is needed)
-                    md = __min_dist(new_pt)
-                    vertices, edges, split_outer_edge, split = _split_edge(
-                        vertices, edges, edge_counter, new_pt, **kwargs
-                    )
-                    split_type.append(split)
-                    if split_outer_edge > 0:
-                        logger.debug("Split outer edge")
-
-                    if edges.shape[1] > orig_edge_num + split_outer_edge:
-                        raise ValueError("Have created edge without bookkeeping")
-                    # If the outer edge (represented by edge_counter) was split,
-                    # e.g. inserted into the list of edges we need to increase the
-                    # index of the inner edge
-                    intsect += split_outer_edge
-
-                    # Possibly split the inner edge
-                    vertices, edges, split_inner_edge, split = _split_edge(
-                        vertices, edges, intsect, new_pt, **kwargs
-                    )
-                    if (
-                        edges.shape[1]
-                        > orig_edge_num + split_inner_edge + split_outer_edge
-                    ):
-                        raise ValueError("Have created edge without bookkeeping")
-
-                    split_type.append(split)
-                    if split_inner_edge > 0:
-                        logger.debug("Split inner edge")
-                    intersections += split_outer_edge + split_inner_edge
-                else:
-                    # We have found an intersection along a line segment
-                    logger.debug(
-                        """Found two intersections: (%.5f, %.5f) and
-                                    (%.5f, %.5f)""",
-                        new_pt[0, 0],
-                        new_pt[1, 0],
-                        new_pt[0, 1],
-                        new_pt[1, 1],
-                    )
-                    vertices, edges, splits, s_type = _split_edge(
-                        vertices, edges, [edge_counter, intsect], new_pt, **kwargs
-                    )
-                    split_type.append(s_type)
-                    intersections += splits
-                    logger.debug("Split into %i parts", splits)
-
-            # Sanity checks - turned out to be useful for debugging.
-            if np.any(np.diff(edges[:2], axis=0) == 0):
-                raise ValueError("Have somehow created a point edge")
-            if intersections.max() > edges.shape[1]:
-                raise ValueError("Intersection pointer outside edge array")
-
-            # We're done with this candidate edge. Increase index of inner loop
-            int_counter += 1
-
-        # We're done with all intersections of this loop. increase index of
-        # outer loop
-        edge_counter += 1
-        logger.debug(
-            "Edge split into %i new parts", edges.shape[1] - size_before_splitting
-        )
+    The boxes are sorted according to their lower bound in the first
+    coordinate direction, so that the boxes overlapping with a box in this
+    direction, and coming after it in the ordering, form a contiguous range.
+    The candidate pairs are then filtered on the remaining directions.
+
+    Parameters:
+        min_coord (np.ndarray, nd x n): Lower bounds of the boxes.
+        max_coord (np.ndarray, nd x n): Upper bounds of the boxes.
 
-    return vertices, edges
+    Returns:
+        np.ndarray, 2 x num_pairs: Indices of overlapping boxes, with the
+            lower index in the first row. Sorted lexicographically.
+
+    """
+    num_boxes = min_coord.shape[1]
+    order = np.argsort(min_coord[0], kind="mergesort")
+    end = np.searchsorted(min_coord[0, order], max_coord[0, order], side="right")
+    num_overlaps = np.maximum(end - np.arange(1, num_boxes + 1), 0)
+
+    # Expand the ranges into pairs of positions in the sorted ordering
+    first = np.repeat(np.arange(num_boxes), num_overlaps)
+    offset = np.arange(first.size) - np.repeat(
+        np.cumsum(num_overlaps) - num_overlaps, num_overlaps
+    )
+    second = order[first + 1 + offset]
+    first = order[first]
+
+    overlap = np.logical_and(
+        np.all(max_coord[:, first] >= min_coord[:, second], axis=0),
+        np.all(min_coord[:, first] <= max_coord[:, second], axis=0),
+    )
+    pairs = np.sort(np.vstack((first[overlap], second[overlap])), axis=0)
+    return pairs[:, np.lexsort((pairs[1], pairs[0]))]
 
 
 # ----------------------------------------------------------
@@ -6,6 +6,7 @@ Created on Thu Feb 25 20:16:42 2016
 """
 from __future__ import division
 import numpy as np
+from scipy import spatial
 
 
 def unique_rows(data):
@@ -20,13 +21,26 @@ def unique_rows(data):
     (summary pretty far down on the page)
     Note: I have no idea what happens here
 
+    For integer arrays, duplicate rows are first identified by packing the
+    rows into 64-bit keys, if the range of the values allows, and only the
+    unique rows are sorted as raw bytes. The result is the same.
+
     """
     b = np.ascontiguousarray(data).view(
         np.dtype((np.void, data.dtype.itemsize * data.shape[1]))
-    )
-    _, ia = np.unique(b, return_index=True)
-    _, ic = np.unique(b, return_inverse=True)
-    #    return np.unique(b).view(data.dtype).reshape(-1, data.shape[1]), ia, ic
+    ).ravel()
+
+    keys = _integer_keys(data.T)
+    if keys is None:
+        _, ia, ic = np.unique(b, return_index=True, return_inverse=True)
+        return data[ia], ia, ic
+
+    # Group equal rows by the integer keys, then order the groups as the
+    # rows would have been ordered when sorted as raw bytes.
+    _, first, group = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(b[first], kind="mergesort")
+    ia = first[order]
+    ic = np.argsort(order)[group]
     return data[ia], ia, ic
 
 
@@ -37,7 +51,9 @@ def ismember_rows(a, b, sort=True):
     The function mimics Matlab's function ismember(..., 'rows').
 
     If the numpy version is less than 1.13, this function will be slow for
-    large arrays.
+    large arrays, unless both arrays are integers.
+
+    For repeated queries against the same array b, see MembershipIndex.
 
     TODO: Rename function, this is confusing!
 
@@ -65,6 +81,10 @@ def ismember_rows(a, b, sort=True):
 
     """
 
+    # Integer arrays are handled by packing the columns into scalar keys
+    if _is_integer(a) and _is_integer(b):
+        return MembershipIndex(b, sort=sort).ismember_rows(a)
+
     # Sort if required, but not if the input is 1d
     if sort and a.ndim > 1:
         sa = np.sort(a, axis=0)
@@ -133,6 +153,161 @@ def ismember_rows(a, b, sort=True):
         return ismem_a, ind_of_a_in_b.astype("int")
 
 
+class MembershipIndex(object):
+    """
+    Index of the columns of an integer array, for repeated membership queries
+    against the same array, see ismember_rows.
+
+    The columns are packed into scalar keys, which are sorted once. If the
+    range of the values allows, the keys are 64-bit integers composed from the
+    rows, otherwise the columns are compared as raw bytes.
+
+    Example:
+        >>> b = np.array([[3, 1, 3, 5, 3], [3, 3, 2, 1, 2]])
+        >>> index = MembershipIndex(b)
+        >>> index.ismember_rows(np.array([[1, 3, 3, 1, 7], [3, 3, 2, 3, 0]]))
+        (array([ True,  True,  True,  True, False]), array([1, 0, 2, 1]))
+
+    Attributes:
+        sort (boolean): If True, the columns are sorted before comparison.
+
+    """
+
+    def __init__(self, b, sort=True):
+        """
+        Parameters:
+            b (np.array, integer): Array in which we will look for a twin.
+            sort (boolean, optional): If true, the columns of b, and of the
+                arrays to be searched for, are sorted before comparison.
+                Defaults to True.
+
+        Raises:
+            ValueError if b is not an integer array.
+
+        """
+        b = np.atleast_1d(b)
+        if not _is_integer(b):
+            raise ValueError("The membership index is only for integer arrays")
+        # Sort if required, but not if the input is 1d
+        self.sort = sort and b.ndim > 1
+        if self.sort:
+            b = np.sort(b, axis=0)
+        if b.ndim == 1:
+            b = b.reshape((1, -1))
+
+        self._dtype = b.dtype
+        if b.shape[1] > 0:
+            self._min = b.min(axis=1).reshape((-1, 1))
+            self._max = b.max(axis=1).reshape((-1, 1))
+        else:
+            # Nothing is a member of an empty array
+            self._min = np.ones((b.shape[0], 1), dtype=b.dtype)
+            self._max = np.zeros((b.shape[0], 1), dtype=b.dtype)
+
+        keys = _integer_keys(b, self._min, self._max)
+        self._packed = keys is not None
+        if not self._packed:
+            keys = _void_keys(b)
+        self._order = np.argsort(keys, kind="mergesort")
+        self._keys = keys[self._order]
+
+    def ismember_rows(self, a):
+        """
+        Find columns of a that are also columns of the indexed array b.
+
+        Parameters:
+            a (np.array, integer): Each column in a will search for an equal
+                in b.
+
+        Returns:
+            np.array (boolean): For each column in a, true if there is a
+                corresponding column in b.
+            np.array (int): Indexes so that b[:, ind] is also found in a. If a
+                column occurs more than once in b, the first occurrence is
+                used.
+
+        """
+        a = np.atleast_1d(a)
+        if not _is_integer(a):
+            raise ValueError("The membership index is only for integer arrays")
+        if self.sort:
+            a = np.sort(a, axis=0)
+        if a.ndim == 1:
+            a = a.reshape((1, -1))
+
+        # Columns with values outside the range of b cannot be members. The
+        # remaining columns can safely be packed as the columns of b.
+        in_range = np.logical_and(
+            np.all(a >= self._min, axis=0), np.all(a <= self._max, axis=0)
+        )
+        candidates = np.where(in_range)[0]
+        a = a[:, candidates].astype(self._dtype)
+        if self._packed:
+            keys = _integer_keys(a, self._min, self._max)
+        else:
+            keys = _void_keys(a)
+
+        pos = np.searchsorted(self._keys, keys)
+        found = pos < self._keys.size
+        found[found] = self._keys[pos[found]] == keys[found]
+
+        ismem = np.zeros(in_range.size, dtype=np.bool)
+        ismem[candidates[found]] = True
+        return ismem, self._order[pos[found]]
+
+
+def _is_integer(a):
+    return issubclass(np.asarray(a).dtype.type, np.integer)
+
+
+def _integer_keys(mat, min_val=None, max_val=None):
+    """
+    Pack the columns of an integer array into 64-bit integer keys, so that
+    equal columns have equal keys.
+
+    Parameters:
+        mat (np.array, nd x n): Columns to be packed.
+        min_val, max_val (np.array, nd x 1, optional): Range of the values in
+            each row. Defaults to the range of mat.
+
+    Returns:
+        np.array (n): The keys, or None if mat is not an integer array, or the
+            range of the values is too large.
+
+    """
+    if not _is_integer(mat):
+        return None
+    if min_val is None:
+        if mat.shape[1] == 0:
+            return None
+        min_val = mat.min(axis=1).reshape((-1, 1))
+        max_val = mat.max(axis=1).reshape((-1, 1))
+
+    # Compute the size of the key space with python integers, to avoid
+    # overflow
+    limit = np.iinfo(np.int64).max
+    span = [int(hi) - int(lo) + 1 for lo, hi in zip(min_val.ravel(), max_val.ravel())]
+    if int(min_val.min()) < -limit or int(max_val.max()) > limit:
+        return None
+    if np.prod(np.array(span, dtype=object)) > limit:
+        return None
+
+    keys = np.zeros(mat.shape[1], dtype=np.int64)
+    for row, lo, s in zip(mat, min_val.ravel(), span):
+        keys = keys * s + (row.astype(np.int64) - np.int64(lo))
+    return keys
+
+
+def _void_keys(mat):
+    """ View the columns of an array as raw bytes, for sorting and comparison.
+    """
+    return (
+        np.ascontiguousarray(mat.T)
+        .view(np.dtype((np.void, mat.dtype.itemsize * mat.shape[0])))
+        .ravel()
+    )
+
+
 # ---------------------------------------------------------
 
 
@@ -203,42 +378,56 @@ def unique_columns_tol(mat, tol=1e-8, exponent=2):
             except:
                 pass
 
-    def dist(p, pset):
-        " Helper function to compute distance "
-        if p.ndim == 1:
-            pt = p.reshape((-1, 1))
-        else:
-            pt = p
-
-        return np.power(
-            np.sum(np.power(np.abs(pt - pset), exponent), axis=0), 1 / exponent
-        )
-
     (nd, l) = mat.shape
-
-    # By default, no columns are kept
-    keep = np.zeros(l, dtype=np.bool)
-
-    # We will however keep the first point
-    keep[0] = True
-    keep_counter = 1
-
-    # Map from old points to the unique subspace. Defaults to map to itself.
-    old_2_new = np.arange(l)
-
-    # Loop over all points, check if it is already represented in the kept list
-    for i in range(1, l):
-        proximate = np.argwhere(dist(mat[:, i], mat[:, keep]) < tol * np.sqrt(nd))
-
-        if proximate.size > 0:
-            # We will not keep this point
-            old_2_new[i] = proximate[0]
-        else:
-            # We have found a new point
-            keep[i] = True
-            old_2_new[i] = keep_counter
-            keep_counter += 1
-    # Finally find which elements we kept
+    radius = tol * np.sqrt(nd)
+
+    # A point is represented by the first of the preceding kept points within
+    # the tolerance, if any, or else it is kept. Find all pairs of points
+    # closer than the tolerance by a tree search in the max-norm, which is
+    # bounded by the distance in any norm, then filter on the exact distance.
+    if radius > 0:
+        tree = spatial.cKDTree(mat.T)
+        pairs = tree.query_pairs(radius, p=np.inf, output_type="ndarray")
+    else:
+        pairs = np.zeros((0, 2), dtype=np.int)
+    if pairs.size > 0:
+        diff = np.abs(mat[:, pairs[:, 1]] - mat[:, pairs[:, 0]])
+        dist = np.power(np.sum(np.power(diff, exponent), axis=0), 1 / exponent)
+        pairs = pairs[dist < radius]
+
+    # Sort the pairs (i, j), i < j, on j and then i. For each point j we then
+    # have a contiguous list of preceding neighbors, in increasing order.
+    pairs = pairs[np.lexsort((pairs[:, 0], pairs[:, 1]))]
+    later, group_start = np.unique(pairs[:, 1], return_index=True)
+    group_end = np.append(group_start[1:], pairs.shape[0])
+    earliest = pairs[group_start, 0]
+
+    # By default, all columns are kept, and represent themselves
+    keep = np.ones(l, dtype=np.bool)
+    representative = np.arange(l)
+
+    # Points without a neighbor among the preceding points are always kept.
+    # If the first neighbor of a point is of this kind, it is the
+    # representative of the point.
+    has_preceding = np.zeros(l, dtype=np.bool)
+    has_preceding[later] = True
+    direct = np.logical_not(has_preceding[earliest])
+    keep[later[direct]] = False
+    representative[later[direct]] = earliest[direct]
+
+    # The remaining points depend on whether their neighbors were kept.
+    # Process them in increasing order, so that all preceding points are
+    # resolved.
+    for k in np.where(np.logical_not(direct))[0]:
+        neighbors = pairs[group_start[k] : group_end[k], 0]
+        kept_neighbors = neighbors[keep[neighbors]]
+        if kept_neighbors.size > 0:
+            keep[later[k]] = False
+            representative[later[k]] = kept_neighbors[0]
+
+    # Finally find which elements we kept, and their position in the reduced
+    # list
     new_2_old = np.argwhere(keep).ravel()
+    old_2_new = (np.cumsum(keep) - 1)[representative]
 
     return mat[:, keep], new_2_old, old_2_new
@@ -232,3 +232,33 @@ def slice_mat(A, ind):
         return sps.csc_matrix((data, indices, indptr), shape=(A.shape[0], N))
     elif A.getformat() == "csr":
         return sps.csr_matrix((data, indices, indptr), shape=(N, A.shape[1]))
+
+
+def compact_indices(A, dtype=None):
+    """
+    Copy of a sparse matrix with int32 index arrays, unless the matrix is too
+    large for this, and the data optionally converted to another type.
+
+    Parameters
+    ----------
+    A (scipy.sparse.csc/csr_matrix): A sparse matrix.
+    dtype (np.dtype, optional): Type of the data in the copy. Defaults to the
+        type of A.data.
+
+    Returns
+    -------
+    A_compact (scipy.sparse.csc/csr_matrix): Copy of A, in the same format.
+
+    Examples
+    --------
+    A = sps.csc_matrix(np.eye(10))
+    A_compact = compact_indices(A, np.int8)
+    """
+    assert A.getformat() == "csc" or A.getformat() == "csr"
+    data = A.data if dtype is None else A.data.astype(dtype)
+    max_ind = max(A.nnz, max(A.shape))
+    index_dtype = np.int32 if max_ind <= np.iinfo(np.int32).max else np.int64
+    return A.__class__(
+        (data, A.indices.astype(index_dtype), A.indptr.astype(index_dtype)),
+        shape=A.shape,
+    )
@@ -20,6 +20,7 @@ Methods for tag handling. The following primary applications are intended:
     --
 """
 import numpy as np
+from collections.abc import MutableMapping
 
 
 def append_tags(tags, keys, appendices):
@@ -91,7 +92,49 @@ def add_tags(parent, new_tags):
     dictionaries (parent.tags and new_tags) will be decided by those in
     new_tags.
     """
-    old_tags = getattr(parent, "tags", {}).copy()
-    nt = dict(old_tags)
+    nt = getattr(parent, "tags", {}).copy()
     nt.update(new_tags)
     parent.tags = nt
+
+
+class PackedTags(MutableMapping):
+    """
+    Dictionary of tags where boolean arrays are stored with one bit per
+    entry (np.packbits). Other values are stored as they are.
+
+    Accessing a boolean tag returns a read-only, unpacked copy, thus in-place
+    modifications (tags[key][ind] = True) are not possible and raise an
+    error. To modify a tag, assign the full array: tags[key] = new_array.
+    """
+
+    def __init__(self, tags=None):
+        self._tags = {}
+        if tags is not None:
+            self.update(tags)
+
+    def __getitem__(self, key):
+        value = self._tags[key]
+        if isinstance(value, tuple):
+            packed, size = value
+            value = np.unpackbits(packed)[:size].astype(bool)
+            value.flags.writeable = False
+        return value
+
+    def __setitem__(self, key, value):
+        if isinstance(value, np.ndarray) and value.dtype == bool and value.ndim == 1:
+            value = (np.packbits(value), value.size)
+        self._tags[key] = value
+
+    def __delitem__(self, key):
+        del self._tags[key]
+
+    def __iter__(self):
+        return iter(self._tags)
+
+    def __len__(self):
+        return len(self._tags)
+
+    def copy(self):
+        new_tags = PackedTags()
+        new_tags._tags = self._tags.copy()
+        return new_tags
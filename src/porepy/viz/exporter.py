@@ -386,7 +386,7 @@ class Exporter:
                 grids = self.gb.get_grids(lambda g: g.dim == dim)
                 values = np.empty(grids.size, dtype=np.object)
                 for i, g in enumerate(grids):
-                    values[i] = self.gb.graph.node[g][field.name]
+                    values[i] = self.gb.node_props(g, field.name)
                     field.check(values[i], g)
                 field.set_values(np.hstack(values))
 
@@ -512,6 +512,22 @@ class BasicsTest(unittest.TestCase):
 
     # ------------------------------------------------------------------------------#
 
+    def test_create_partition_disconnected(self):
+        g = structured.CartGrid([4, 2])
+        g.compute_geometry()
+        A = co.tpfa_matrix(g)
+        part = co.create_partition(A)
+        known = np.array([0, 0, 1, 1, 0, 0, 1, 1])
+        assert np.array_equal(part, known)
+
+        # Two disconnected copies of the grid and a cell without connections
+        A = sps.block_diag((A, A, sps.csr_matrix([[1.]]))).tocsr()
+        part = co.create_partition(A)
+        known = np.hstack((known, known + 2, 4))
+        assert np.array_equal(part, known)
+
+    # ------------------------------------------------------------------------------#
+
     def test_create_partition_2d_cart_cdepth4(self):
         g = structured.CartGrid([10, 10])
         g.compute_geometry()
@@ -133,6 +133,39 @@ def test_block_matrix_invertes_sparse_blocks():
             pass
 
 
+def test_block_matrix_inverter_batched():
+    """
+    Invert a block diagonal matrix with blocks of mixed sizes, in mixed order,
+    and with sparse blocks.
+    """
+    np.random.seed(42)
+    sz = np.array([2, 3, 2, 1, 3, 4, 2], dtype="i8")
+    blocks = [np.random.random((n, n)) + n * np.eye(n) for n in sz]
+    blocks[1][0, 2] = 0
+    block = sps.block_diag(blocks, format="csr")
+    block.eliminate_zeros()
+
+    iblock_batched = fvutils.invert_diagonal_blocks(block, sz, method="batched")
+    iblock_ex = np.linalg.inv(block.toarray())
+    assert np.allclose(iblock_ex, iblock_batched.toarray())
+
+    # The default inverter should give the same result
+    iblock_default = fvutils.invert_diagonal_blocks(block, sz)
+    assert np.allclose(iblock_ex, iblock_default.toarray())
+
+
+def test_block_matrix_inverter_batched_many_blocks():
+    # Enough blocks of each size to have the groups split into chunks
+    np.random.seed(42)
+    sz = np.tile(np.array([4, 8], dtype="i8"), 600)
+    blocks = [np.random.random((n, n)) + n * np.eye(n) for n in sz]
+    block = sps.block_diag(blocks, format="csr")
+
+    iblock_batched = fvutils.invert_diagonal_blocks(block, sz, method="batched")
+    iblock_python = fvutils.invert_diagonal_blocks(block, sz, method="python")
+    assert np.abs(iblock_python - iblock_batched).max() < 1e-12
+
+
 def test_compute_discharge_mono_grid():
     g = structured.CartGrid([1, 1])
     flux = sps.csc_matrix((4, 1))
@@ -0,0 +1,75 @@
+"""
+Validation of the memory estimates for MPFA and MPSA against the measured peak
+resident memory of the discretization.
+
+The discretizations are run in forked processes, so that the peak memory
+measurement is not polluted by other tests.
+"""
+import os
+import unittest
+import numpy as np
+
+from porepy.numerics.fv import mpfa, mpsa
+from porepy.params.tensor import SecondOrderTensor as PermTensor
+from porepy.params.tensor import FourthOrderTensor as StiffnessTensor
+from porepy.grids.structured import CartGrid
+from porepy.params import bc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _measure_peak_memory(func):
+    """ Increase in peak resident memory, in bytes, when calling func in a
+    forked process.
+    """
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        func()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is given in kilobytes on Linux
+        os.write(write_end, str((peak - base) * 1024).encode())
+        os._exit(0)
+    os.close(write_end)
+    os.waitpid(pid, 0)
+    with os.fdopen(read_end) as f:
+        return float(f.read())
+
+
+@unittest.skipIf(
+    resource is None or not hasattr(os, "fork") or not os.uname()[0] == "Linux",
+    "Peak memory measurements require fork and getrusage on Linux",
+)
+class TestMemoryEstimate(unittest.TestCase):
+    def test_mpfa(self):
+        g = CartGrid([100, 100])
+        g.compute_geometry()
+        perm = PermTensor(g.dim, np.ones(g.num_cells))
+        bnd = bc.BoundaryCondition(g)
+
+        estimate = mpfa._estimate_peak_memory(g)["total"]
+        measured = _measure_peak_memory(
+            lambda: mpfa.mpfa(g, perm, bnd, inverter="python")
+        )
+        self.assertTrue(0.5 < measured / estimate < 2)
+
+    def test_mpsa(self):
+        g = CartGrid([60, 60])
+        g.compute_geometry()
+        stiffness = StiffnessTensor(g.dim, np.ones(g.num_cells), np.ones(g.num_cells))
+        bnd = bc.BoundaryCondition(g)
+
+        estimate = mpsa._estimate_peak_memory_mpsa(g)["total"]
+        measured = _measure_peak_memory(
+            lambda: mpsa.mpsa(g, stiffness, bnd, inverter="python")
+        )
+        self.assertTrue(0.5 < measured / estimate < 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
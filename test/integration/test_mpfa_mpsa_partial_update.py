@@ -7,6 +7,9 @@ from porepy.params.tensor import SecondOrderTensor as PermTensor
 from porepy.params.tensor import FourthOrderTensor as StiffnessTensor
 from porepy.grids.structured import CartGrid
 from porepy.params import bc
+from porepy.params.data import Parameters
+from porepy.numerics.fv.mpfa import Mpfa
+from porepy.numerics.fv.mpsa import Mpsa
 
 
 class TestPartialMPFA(unittest.TestCase):
@@ -117,6 +120,63 @@ class TestPartialMPFA(unittest.TestCase):
         assert (bound_flux - bound_flux_full).max() < 1e-8
         assert (bound_flux - bound_flux_full).min() > -1e-8
 
+    def test_max_memory_partitions(self):
+        # Split the discretization by a memory constraint, run the partitions
+        # both serially and in parallel, and compare with a single computation
+        g = CartGrid([4, 5])
+        g.compute_geometry()
+
+        np.random.seed(42)
+        kxx = np.random.random(g.num_cells)
+        kyy = np.random.random(g.num_cells)
+        kxy = np.random.random(g.num_cells) * kxx * kyy
+        perm = PermTensor(2, kxx=kxx, kyy=kyy, kxy=kxy)
+
+        bound_faces = g.get_all_boundary_faces()[:5]
+        bnd = bc.BoundaryCondition(g, bound_faces, bound_faces.size * ["dir"])
+
+        full = mpfa.mpfa(g, perm, bnd, inverter="python")
+        # Budget which gives four partitions. The output matrices are global,
+        # and can not be reduced by partitioning.
+        mem = mpfa._estimate_peak_memory(g)
+        max_memory = mem["output"] + (mem["total"] - mem["output"]) / 3.5
+        assert fvutils.num_partitions_for_memory(mem, max_memory) == 4
+        serial = mpfa.mpfa(g, perm, bnd, inverter="python", max_memory=max_memory)
+        parallel = mpfa.mpfa(
+            g, perm, bnd, inverter="python", max_memory=max_memory, num_workers=2
+        )
+
+        for mat_full, mat_serial, mat_parallel in zip(full, serial, parallel):
+            assert np.abs(mat_full - mat_serial).max() < 1e-8
+            assert np.abs(mat_serial - mat_parallel).max() == 0
+
+    def test_partial_update_changed_permeability(self):
+        # Change the permeability in a few cells, and verify that the partial
+        # update of the stored discretization equals a full discretization
+        g = CartGrid([5, 4])
+        g.compute_geometry()
+        bound_faces = g.get_all_boundary_faces()[:6]
+        bnd = bc.BoundaryCondition(g, bound_faces, bound_faces.size * ["dir"])
+
+        param = Parameters(g)
+        param.set_bc("flow", bnd)
+        param.set_tensor("flow", PermTensor(g.dim, np.ones(g.num_cells)))
+        data = {"param": param, "partial_update": True}
+        discr = Mpfa("flow")
+        discr.discretize(g, data)
+
+        np.random.seed(42)
+        kxx = np.ones(g.num_cells)
+        kxx[[3, 12]] = 1 + np.random.random(2)
+        param.set_tensor("flow", PermTensor(g.dim, kxx))
+        discr.discretize(g, data)
+        self.assertEqual(param.perm.changed_cells().size, 0)
+
+        data_full = {"param": param}
+        discr.discretize(g, data_full)
+        for key in ["flux", "bound_flux", "bound_pressure_cell", "bound_pressure_face"]:
+            self.assertTrue(np.abs(data[key] - data_full[key]).max() < 1e-10)
+
     if __name__ == "__main__":
         unittest.main()
 
@@ -236,5 +296,56 @@ class TestPartialMPSA:
         assert (bound_stress - bound_stress_full).max() < 1e-8
         assert (bound_stress - bound_stress_full).min() > -1e-8
 
+    def test_max_memory_partitions(self):
+        # Split the discretization by a memory constraint, and compare with a
+        # single computation
+        g = CartGrid([4, 5])
+        g.compute_geometry()
+
+        np.random.seed(42)
+        mu = np.random.random(g.num_cells)
+        lmbda = np.random.random(g.num_cells)
+        stiffness = StiffnessTensor(2, mu=mu, lmbda=lmbda)
+
+        bound_faces = g.get_all_boundary_faces()[:5]
+        bnd = bc.BoundaryCondition(g, bound_faces, bound_faces.size * ["dir"])
+
+        full = mpsa.mpsa(g, stiffness, bnd, inverter="python")
+        mem = mpsa._estimate_peak_memory_mpsa(g)
+        max_memory = mem["output"] + (mem["total"] - mem["output"]) / 3.5
+        assert fvutils.num_partitions_for_memory(mem, max_memory) == 4
+        split = mpsa.mpsa(g, stiffness, bnd, inverter="python", max_memory=max_memory)
+
+        for mat_full, mat_split in zip(full, split):
+            assert np.abs(mat_full - mat_split).max() < 1e-8
+
+    def test_partial_update_changed_stiffness(self):
+        g = CartGrid([5, 4])
+        g.compute_geometry()
+        bound_faces = g.get_all_boundary_faces()[:6]
+        bnd = bc.BoundaryCondition(g, bound_faces, bound_faces.size * ["dir"])
+
+        param = Parameters(g)
+        param.set_bc("mechanics", bnd)
+        mu = np.ones(g.num_cells)
+        param.set_tensor("mechanics", StiffnessTensor(g.dim, mu, mu))
+        data = {"param": param, "partial_update": True}
+        discr = Mpsa("mechanics")
+        discr.discretize(g, data)
+        stress_orig = data["stress"].copy()
+
+        # Stiffness is changed in place, and the change recorded explicitly
+        c = param.stiffness
+        c.c[:, :, 7] *= 3
+        c.mark_changed(np.array([7]))
+        discr.discretize(g, data)
+        # The change should have an effect on the discretization
+        assert np.abs(data["stress"] - stress_orig).max() > 1e-2
+
+        data_full = {"param": param}
+        discr.discretize(g, data_full)
+        for key in ["stress", "bound_stress"]:
+            assert np.abs(data[key] - data_full[key]).max() < 1e-10
+
     if __name__ == "__main__":
         unittest.main()
@@ -0,0 +1,50 @@
+""" Grids and permeabilities shared by the tests that compare the assembly of
+the P1, RT0 and dual VEM discretizations with a cell by cell assembly.
+"""
+import numpy as np
+
+import porepy as pp
+
+
+def perturbed_simplex_grid(dim):
+    """ Simplex grid of the unit square or cube with smoothly perturbed nodes.
+    """
+    if dim == 2:
+        g = pp.simplex.StructuredTriangleGrid([3, 3], [1, 1])
+        g.nodes[:2] += 0.1 * np.sin(3 * g.nodes[[1, 0]])
+    else:
+        g = pp.simplex.StructuredTetrahedralGrid([2, 2, 2], [1, 1, 1])
+        g.nodes += 0.1 * np.sin(3 * g.nodes[[1, 2, 0]])
+    g.compute_geometry()
+    return g
+
+
+def heterogeneous_perm(g):
+    """ Anisotropic permeability that varies between the cells.
+    """
+    kxx = np.square(g.cell_centers[1, :]) + 1
+    kyy = np.square(g.cell_centers[0, :]) + 1
+    kxy = -0.5 * np.multiply(g.cell_centers[0, :], g.cell_centers[1, :])
+    return pp.SecondOrderTensor(3, kxx=kxx, kyy=kyy, kxy=kxy, kzz=kxx)
+
+
+def reference_geometry(g, perm):
+    """ Geometry and permeability in the coordinates of the grid, as used by
+    the local matrices of the discretizations.
+
+    Returns:
+        np.ndarray, g.dim x g.num_cells: Cell centers.
+        np.ndarray, g.dim x g.num_faces: Face normals.
+        np.ndarray, g.dim x g.num_faces: Face centers.
+        np.ndarray, g.dim x g.num_nodes: Node coordinates.
+        np.ndarray, g.dim x g.dim x g.num_cells: Permeability.
+
+    """
+    c_centers, f_normals, f_centers, R, dim, nodes = pp.cg.map_grid(g)
+    k = perm.copy()
+    if g.dim < 3:
+        k.rotate(R)
+        remove_dim = np.where(np.logical_not(dim))[0]
+        k.perm = np.delete(k.perm, (remove_dim), axis=0)
+        k.perm = np.delete(k.perm, (remove_dim), axis=1)
+    return c_centers, f_normals, f_centers, nodes, k.perm
@@ -0,0 +1,150 @@
+""" Tests of the binary storage of grids, mortar grids and grid buckets.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+import porepy as pp
+from porepy.grids import binary_storage
+from porepy.utils import tags
+
+
+class TestBinaryStorage(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _compare_grids(self, g, h):
+        self.assertEqual(type(g), type(h))
+        self.assertEqual(g.dim, h.dim)
+        self.assertEqual(g.name, h.name)
+        self.assertEqual((g.face_nodes != h.face_nodes).nnz, 0)
+        self.assertEqual((g.cell_faces != h.cell_faces).nnz, 0)
+        self.assertTrue(np.allclose(g.nodes, h.nodes))
+        self.assertTrue(np.allclose(g.cell_centers, h.cell_centers))
+        self.assertTrue(np.allclose(g.face_normals, h.face_normals))
+        for key in g.tags:
+            self.assertTrue(np.array_equal(g.tags[key], h.tags[key]))
+
+    def test_grid(self):
+        g = pp.CartGrid([3, 2, 2])
+        g.compute_geometry()
+        folder = os.path.join(self.folder, "grid")
+        binary_storage.save_grid(g, folder)
+        h = binary_storage.load_grid(folder)
+        self._compare_grids(g, h)
+        self.assertTrue(np.array_equal(g.cart_dims, h.cart_dims))
+        self.assertTrue(isinstance(h.face_nodes.indices, np.memmap))
+
+    def test_modification_not_written_to_file(self):
+        g = pp.CartGrid([2, 2])
+        g.compute_geometry()
+        folder = os.path.join(self.folder, "grid")
+        binary_storage.save_grid(g, folder)
+        h = binary_storage.load_grid(folder)
+        h.nodes[0, 0] = 5
+        h = binary_storage.load_grid(folder)
+        self.assertEqual(h.nodes[0, 0], 0)
+
+    def test_load_into_memory(self):
+        g = pp.CartGrid([2, 2])
+        g.compute_geometry()
+        folder = os.path.join(self.folder, "grid")
+        binary_storage.save_grid(g, folder)
+        h = binary_storage.load_grid(folder, mmap_mode=None)
+        self.assertFalse(isinstance(h.nodes, np.memmap))
+        self._compare_grids(g, h)
+
+    def test_compact_grid(self):
+        g = pp.CartGrid([2, 2])
+        g.compute_geometry()
+        g.compact()
+        folder = os.path.join(self.folder, "grid")
+        binary_storage.save_grid(g, folder)
+        h = binary_storage.load_grid(folder)
+        self.assertTrue(isinstance(h.tags, tags.PackedTags))
+        self.assertEqual(h.cell_faces.data.dtype, np.int8)
+        self._compare_grids(g, h)
+
+    def test_grid_after_discretization(self):
+        # Fields cached by the discretization are not stored
+        g = pp.CartGrid([3, 3])
+        g.compute_geometry()
+        perm = pp.SecondOrderTensor(g.dim, np.ones(g.num_cells))
+        bnd = pp.BoundaryCondition(g)
+        flux, _, _, _ = pp.numerics.fv.mpfa.mpfa(g, perm, bnd, inverter="python")
+        self.assertTrue(len(g._topology_cache) > 0)
+
+        folder = os.path.join(self.folder, "grid")
+        binary_storage.save_grid(g, folder)
+        with open(os.path.join(folder, "index.json")) as f:
+            self.assertNotIn("_topology_cache", f.read())
+        h = binary_storage.load_grid(folder)
+        self._compare_grids(g, h)
+        self.assertEqual(h._topology_cache, {})
+
+        flux_new, _, _, _ = pp.numerics.fv.mpfa.mpfa(
+            h, perm, bnd, inverter="python"
+        )
+        self.assertTrue(np.allclose(flux.toarray(), flux_new.toarray()))
+
+    def test_not_empty_folder(self):
+        open(os.path.join(self.folder, "file"), "w").close()
+        g = pp.CartGrid([2, 2])
+        self.assertRaises(ValueError, binary_storage.save_grid, g, self.folder)
+
+    def test_wrong_kind(self):
+        g = pp.CartGrid([2, 2])
+        folder = os.path.join(self.folder, "grid")
+        binary_storage.save_grid(g, folder)
+        self.assertRaises(ValueError, binary_storage.load_grid_bucket, folder)
+
+    def test_grid_bucket(self):
+        f = np.array([[0, 2], [1, 1]])
+        gb = pp.meshing.cart_grid([f], [2, 2])
+        gb.add_node_props(["param", "value"])
+        for g, d in gb:
+            d["param"] = pp.Parameters(g)
+            d["value"] = np.arange(g.num_cells)
+
+        folder = os.path.join(self.folder, "bucket")
+        binary_storage.save_grid_bucket(gb, folder)
+        gb_new = binary_storage.load_grid_bucket(folder)
+
+        self.assertEqual(gb.size(), gb_new.size())
+        for (g, d), (h, d_new) in zip(gb, gb_new):
+            self._compare_grids(g, h)
+            self.assertEqual(d["node_number"], d_new["node_number"])
+            self.assertTrue(np.array_equal(d["value"], d_new["value"]))
+            # The parameters refer to the loaded grid, not to a copy
+            self.assertTrue(d_new["param"].g is h)
+
+        for (e, d), (e_new, d_new) in zip(gb.edges(), gb_new.edges()):
+            self.assertEqual(e[0].dim, e_new[0].dim)
+            self.assertEqual(e[1].dim, e_new[1].dim)
+            self.assertEqual((d["face_cells"] != d_new["face_cells"]).nnz, 0)
+            mg, mg_new = d["mortar_grid"], d_new["mortar_grid"]
+            self.assertEqual(
+                (mg.high_to_mortar_int != mg_new.high_to_mortar_int).nnz, 0
+            )
+            for side, g in mg.side_grids.items():
+                self._compare_grids(g, mg_new.side_grids[side])
+
+    def test_mortar_grid(self):
+        f = np.array([[0, 2], [1, 1]])
+        gb = pp.meshing.cart_grid([f], [2, 2])
+        mg = gb.get_mortar_grids()[0]
+        folder = os.path.join(self.folder, "mortar")
+        binary_storage.save_mortar_grid(mg, folder)
+        mg_new = binary_storage.load_mortar_grid(folder)
+        self.assertEqual((mg.low_to_mortar_int != mg_new.low_to_mortar_int).nnz, 0)
+        self.assertTrue(np.allclose(mg.cell_volumes, mg_new.cell_volumes))
+        self.assertEqual(mg.num_sides(), mg_new.num_sides())
+
+
+if __name__ == "__main__":
+    unittest.main()
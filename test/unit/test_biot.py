@@ -42,6 +42,35 @@ class BiotTest(unittest.TestCase):
 
             assert np.isclose(sol, np.zeros(g.num_cells * (g.dim + 1))).all()
 
+    def test_discretization_cache_reused(self):
+        # Flow and mechanics have different boundary conditions, the mappings
+        # for both are reused in a second discretization
+        g = setup_grids.setup_2d()[0]
+        bound_faces = g.get_all_boundary_faces()
+        bound_mech = bc.BoundaryCondition(
+            g, bound_faces.ravel("F"), ["dir"] * bound_faces.size
+        )
+        bound_flow = bc.BoundaryCondition(g)
+
+        mu = np.ones(g.num_cells)
+        param = Parameters(g)
+        param.set_bc("flow", bound_flow)
+        param.set_bc("mechanics", bound_mech)
+        param.set_tensor("flow", tensor.SecondOrderTensor(g.dim, mu))
+        param.set_tensor("mechanics", tensor.FourthOrderTensor(g.dim, mu, mu))
+        param.set_bc_val("mechanics", np.zeros(g.num_faces * g.dim))
+        param.set_bc_val("flow", np.zeros(g.num_faces))
+        param.porosity = np.ones(g.num_cells)
+        param.biot_alpha = 1
+        data = {"param": param, "inverter": "python", "dt": 1}
+
+        discr = biot.Biot()
+        discr.discretize(g, data)
+        misses, hits = g.topology_cache_misses, g.topology_cache_hits
+        discr.discretize(g, data)
+        assert g.topology_cache_misses == misses
+        assert g.topology_cache_hits > hits
+
     #    def test_uniform_displacement(self):
     #        # Uniform displacement in mechanics (enforced by boundary conditions).
     #        # Constant pressure boundary conditions.
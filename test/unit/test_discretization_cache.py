@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import scipy.sparse as sps
+
+from porepy.grids.structured import CartGrid
+from porepy.params import bc, tensor
+from porepy.params.data import Parameters
+from porepy.numerics.fv.mpfa import Mpfa
+from porepy.numerics.fv.mpsa import Mpsa
+from porepy.numerics.fv.biot import Biot
+from porepy.numerics.fv.discretization_cache import DiscretizationCache
+
+
+class TestDiscretizationCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def setup_flow(self, kxx=None):
+        g = CartGrid([3, 4])
+        g.compute_geometry()
+        if kxx is None:
+            kxx = np.ones(g.num_cells)
+        param = Parameters(g)
+        param.set_tensor("flow", tensor.SecondOrderTensor(g.dim, kxx))
+        bf = g.get_all_boundary_faces()
+        param.set_bc("flow", bc.BoundaryCondition(g, bf, bf.size * ["dir"]))
+        return g, {"param": param}
+
+    def test_mpfa_store_and_load(self):
+        cache = DiscretizationCache(self.folder)
+        g, data = self.setup_flow()
+        data["discretization_cache"] = cache
+        Mpfa().discretize(g, data)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(len(cache.keys()), 1)
+
+        g, data_loaded = self.setup_flow()
+        data_loaded["discretization_cache"] = cache
+        Mpfa().discretize(g, data_loaded)
+        self.assertEqual(cache.hits, 1)
+
+        for key in [
+            "flux",
+            "bound_flux",
+            "bound_pressure_cell",
+            "bound_pressure_face",
+        ]:
+            self.assertTrue(sps.isspmatrix_csr(data_loaded[key]))
+            self.assertEqual(np.abs(data[key] - data_loaded[key]).max(), 0)
+
+    def test_mpfa_changed_parameters(self):
+        cache = DiscretizationCache(self.folder)
+        g, data = self.setup_flow()
+        data["discretization_cache"] = cache
+        Mpfa().discretize(g, data)
+
+        kxx = np.ones(g.num_cells)
+        kxx[0] = 2
+        g, data = self.setup_flow(kxx)
+        data["discretization_cache"] = cache
+        Mpfa().discretize(g, data)
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(len(cache.keys()), 2)
+
+    def test_mpsa_store_and_load(self):
+        cache = DiscretizationCache(self.folder)
+        g = CartGrid([3, 3])
+        g.compute_geometry()
+        param = Parameters(g)
+        c = tensor.FourthOrderTensor(g.dim, np.ones(g.num_cells), np.ones(g.num_cells))
+        param.set_tensor("mechanics", c)
+        param.set_bc("mechanics", bc.BoundaryConditionVectorial(g))
+        data = {"param": param, "discretization_cache": cache}
+        discr = Mpsa("mechanics")
+        discr.discretize(g, data)
+        stress = data.pop("stress")
+        discr.discretize(g, data)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(np.abs(stress - data["stress"]).max(), 0)
+
+    def test_biot_store_and_load(self):
+        cache = DiscretizationCache(self.folder)
+        g = CartGrid([3, 3])
+        g.compute_geometry()
+        bf = g.get_all_boundary_faces()
+        bound = bc.BoundaryCondition(g, bf, bf.size * ["dir"])
+        param = Parameters(g)
+        param.set_bc("flow", bound)
+        param.set_bc("mechanics", bound)
+        param.set_tensor("flow", tensor.SecondOrderTensor(g.dim, np.ones(g.num_cells)))
+        c = tensor.FourthOrderTensor(g.dim, np.ones(g.num_cells), np.ones(g.num_cells))
+        param.set_tensor("mechanics", c)
+        param.porosity = np.ones(g.num_cells)
+        data = {"param": param, "inverter": "python", "discretization_cache": cache}
+
+        Biot().discretize(g, data)
+        computed = {k: data.pop(k) for k in ["flux", "stress", "grad_p", "div_d"]}
+        Biot().discretize(g, data)
+        # Both the flow and the mechanics discretization are loaded
+        self.assertEqual(cache.hits, 2)
+        for key, mat in computed.items():
+            self.assertEqual(np.abs(mat - data[key]).max(), 0)
+
+    def test_invalidate(self):
+        cache = DiscretizationCache(self.folder)
+        mat = sps.identity(3, format="csr")
+        cache.store("a", {"mat": mat})
+        cache.store("b", {"mat": mat})
+        cache.invalidate("a")
+        self.assertEqual(cache.keys(), ["b"])
+        self.assertTrue(cache.load("a") is None)
+        cache.invalidate()
+        self.assertEqual(cache.keys(), [])
+
+    def test_eviction(self):
+        mat = sps.random(50, 50, density=0.5, format="csr", random_state=42)
+        cache = DiscretizationCache(self.folder)
+        cache.store("a", {"mat": mat})
+        entry_size = cache.size("a")
+
+        # Room for two entries
+        cache.max_size = 2.5 * entry_size
+        cache.store("b", {"mat": mat})
+        # Make a the most recently used entry
+        os.utime(os.path.join(self.folder, "b"), (0, 0))
+        cache.load("a")
+        cache.store("c", {"mat": mat})
+        self.assertEqual(sorted(cache.keys()), ["a", "c"])
+        self.assertTrue(cache.size() <= cache.max_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
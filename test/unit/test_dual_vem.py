@@ -1,7 +1,9 @@
 import numpy as np
+import scipy.sparse as sps
 import unittest
 
 import porepy as pp
+from test.unit import setup_grids_fem_vem_tests as setup_grids
 
 # ------------------------------------------------------------------------------#
 
@@ -697,6 +699,52 @@ class BasicsTest(unittest.TestCase):
             M[np.ix_(faces, faces)], M_known[np.ix_(map_faces, map_faces)], rtol, atol
         )
 
+    # ------------------------------------------------------------------------------#
+
+    def _compare_batch_simplex(self, dim):
+        g = setup_grids.perturbed_simplex_grid(dim)
+        perm = setup_grids.heterogeneous_perm(g)
+
+        bf = g.tags["domain_boundary_faces"].nonzero()[0]
+        bc = pp.BoundaryCondition(g, bf, bf.size * ["dir"])
+        solver = pp.DualVEM(physics="flow")
+
+        param = pp.Parameters(g)
+        param.set_tensor(solver, perm)
+        param.set_bc(solver, bc)
+        M = solver.matrix(g, {"param": param}).todense()
+
+        # Assemble the mass-Hdiv part cell by cell
+        c_centers, f_normals, f_centers, _, k = setup_grids.reference_geometry(g, perm)
+        faces, cells, sign = sps.find(g.cell_faces)
+        index = np.argsort(cells)
+        faces, sign = faces[index], sign[index]
+        diams = g.cell_diameters()
+        M_known = np.zeros((g.num_faces, g.num_faces))
+        for c in np.arange(g.num_cells):
+            loc = slice(g.cell_faces.indptr[c], g.cell_faces.indptr[c + 1])
+            faces_loc = faces[loc]
+            A = solver.massHdiv(
+                k[:, :, c],
+                c_centers[:, c],
+                g.cell_volumes[c],
+                f_centers[:, faces_loc],
+                f_normals[:, faces_loc],
+                sign[loc],
+                diams[c],
+                np.power(diams[c], 2 - g.dim),
+            )[0]
+            M_known[np.ix_(faces_loc, faces_loc)] += A
+
+        faces = np.arange(g.num_faces)
+        assert np.allclose(M[np.ix_(faces, faces)], M_known, rtol=1e-14, atol=1e-14)
+
+    def test_dual_vem_batch_2d_simplex(self):
+        self._compare_batch_simplex(2)
+
+    def test_dual_vem_batch_3d_simplex(self):
+        self._compare_batch_simplex(3)
+
 
 # ------------------------------------------------------------------------------#
 
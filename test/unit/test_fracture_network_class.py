@@ -97,5 +97,82 @@ class TestFractureNetworkBoundingBox(unittest.TestCase):
         assert d["zmax"] == external_boundary["zmax"]
 
 
+class TestFractureNetworkCandidatePairs(unittest.TestCase):
+    def test_candidate_pairs(self):
+        # Fractures f0 and f1 intersect, the box of f2 overlaps with the
+        # others in the x-direction only, and f3 is far away.
+        f0 = pp.Fracture(np.array([[0, 2, 2, 0], [0, 0, 1, 1], [0, 0, 0, 0]]))
+        f1 = pp.Fracture(np.array([[1, 1, 1, 1], [0, 1, 1, 0], [-1, -1, 1, 1]]))
+        f2 = pp.Fracture(np.array([[1, 3, 3, 1], [2, 2, 3, 3], [0, 0, 0, 0]]))
+        f3 = pp.Fracture(np.array([[5, 6, 6, 5], [5, 5, 6, 6], [5, 5, 5, 5]]))
+
+        network = pp.FractureNetwork([f3, f2, f1, f0])
+        pairs = network._candidate_intersection_pairs()
+        known = np.array([[2], [3]])
+        assert np.all(pairs == known)
+
+        network.find_intersections()
+        assert len(network.intersections) == 1
+        isect = network.intersections[0]
+        assert isect.first is f1 and isect.second is f0
+
+    def test_candidate_pairs_random(self):
+        # Compare with a brute force check of the bounding boxes, using the
+        # same extension by the tolerance as in Fracture.intersects
+        np.random.seed(0)
+        fracs = []
+        for _ in range(30):
+            x0, y0, z0 = np.random.rand(3) * 4 - 2
+            dx, dy = np.random.rand(2)
+            p = np.array(
+                [[x0, x0 + dx, x0 + dx, x0], [y0, y0, y0 + dy, y0 + dy], [z0] * 4]
+            )
+            fracs.append(pp.Fracture(p))
+        network = pp.FractureNetwork(fracs)
+        pairs = network._candidate_intersection_pairs()
+
+        tol = network.tol
+        min_coord = [
+            f.p.min(axis=1) * (1 - np.sign(f.p.min(axis=1)) * tol) for f in fracs
+        ]
+        max_coord = [
+            f.p.max(axis=1) * (1 + np.sign(f.p.max(axis=1)) * tol) for f in fracs
+        ]
+        known = []
+        for i in range(len(fracs)):
+            for j in range(i + 1, len(fracs)):
+                if np.all(max_coord[i] >= min_coord[j]) and np.all(
+                    min_coord[i] <= max_coord[j]
+                ):
+                    known.append([i, j])
+        known = np.array(known).T
+        assert np.all(pairs == known)
+
+    def test_find_intersections_parallel(self):
+        # The intersections, and their ordering, should not depend on the
+        # number of workers
+        def network():
+            f0 = pp.Fracture(np.array([[0, 2, 2, 0], [0, 0, 1, 1], [0, 0, 0, 0]]))
+            f1 = pp.Fracture(np.array([[1, 1, 1, 1], [0, 1, 1, 0], [-1, -1, 1, 1]]))
+            f2 = pp.Fracture(
+                np.array([[0, 2, 2, 0], [0.5, 0.5, 0.5, 0.5], [-1, -1, 1, 1]])
+            )
+            f3 = pp.Fracture(np.array([[5, 6, 6, 5], [5, 5, 6, 6], [5, 5, 5, 5]]))
+            return pp.FractureNetwork([f0, f1, f2, f3])
+
+        serial = network()
+        serial.find_intersections()
+        parallel = network()
+        parallel.find_intersections(num_workers=2)
+
+        assert len(serial.intersections) == 3
+        assert len(parallel.intersections) == 3
+        for i_s, i_p in zip(serial.intersections, parallel.intersections):
+            assert i_s.first.index == i_p.first.index
+            assert i_s.second.index == i_p.second.index
+            assert i_p.first is parallel[i_p.first.index]
+            assert np.allclose(i_s.coord, i_p.coord)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,9 +1,11 @@
 from __future__ import division
 import numpy as np
+import pytest
 import scipy.sparse as sps
 
 from porepy.numerics.fv import fvutils
 from porepy.grids import structured, simplex
+from porepy.params import bc
 
 
 def test_subcell_topology_2d_cart_1():
@@ -58,3 +60,114 @@ def test_determine_eta():
     assert fvutils.determine_eta(g) == 1 / 3
     g = structured.CartGrid([1, 1])
     assert fvutils.determine_eta(g) == 0
+
+
+def test_sparse_row_accumulator():
+    A = sps.csr_matrix(np.arange(12).reshape((4, 3)))
+    B = sps.csr_matrix(-np.arange(12).reshape((4, 3)))
+
+    acc = fvutils.SparseRowAccumulator(A.shape)
+    acc.add_rows(A, np.array([0, 2]))
+    acc.add_rows(B, np.array([3]))
+    acc.add_rows(B, np.array([], dtype=np.int))
+
+    known = np.array([[0, 1, 2], [0, 0, 0], [6, 7, 8], [-9, -10, -11]])
+    assert np.allclose(acc.tocsr().toarray(), known)
+
+
+def test_sparse_row_accumulator_empty():
+    acc = fvutils.SparseRowAccumulator((2, 3))
+    mat = acc.tocsr()
+    assert mat.shape == (2, 3)
+    assert mat.nnz == 0
+
+
+def test_estimate_memory_cart_2d():
+    g = structured.CartGrid([2, 2])
+    mem = fvutils.estimate_memory(g)
+
+    # Four corner nodes with one cell, four edge nodes with two cells and one
+    # center node with four cells. Two gradient unknowns per cell.
+    num_igrad = 4 * 2 ** 2 + 4 * 4 ** 2 + 8 ** 2
+    assert mem["igrad"] == num_igrad * 24
+    # One sub-face per face-node pair
+    assert mem["darcy"] == 2 * g.face_nodes.nnz * 24
+    total = sum(mem[key] for key in mem if key != "total")
+    assert mem["total"] == total
+
+    # Vector problems have nd variables per cell
+    mem_nd = fvutils.estimate_memory(g, nd_var=2)
+    assert mem_nd["igrad"] == 4 * mem["igrad"]
+
+
+def test_num_partitions_for_memory():
+    mem = {"output": 10.0, "total": 100.0}
+    assert fvutils.num_partitions_for_memory(mem, 100) == 1
+    assert fvutils.num_partitions_for_memory(mem, 55) == 2
+    assert fvutils.num_partitions_for_memory(mem, 40) == 3
+
+
+def test_num_partitions_for_memory_budget_too_small():
+    mem = {"output": 10.0, "total": 100.0}
+    with pytest.raises(ValueError):
+        fvutils.num_partitions_for_memory(mem, 10)
+
+
+def test_cached_subcell_topology():
+    g = structured.CartGrid([2, 2])
+    st = fvutils.cached_subcell_topology(g)
+    assert fvutils.cached_subcell_topology(g) is st
+
+    # Copies of the grid do not share the cache
+    assert fvutils.cached_subcell_topology(g.copy()) is not st
+
+    # Replacing the topology invalidates the cache
+    g.face_nodes = g.face_nodes.copy()
+    st_new = fvutils.cached_subcell_topology(g)
+    assert st_new is not st
+    assert np.all(st_new.subfno == st.subfno)
+
+    fvutils.clear_cached_fields(g)
+    assert fvutils.cached_subcell_topology(g) is not st_new
+
+
+def _num_cached_exclude_boundaries(g):
+    return len([k for k in g._topology_cache if k[:2] == ("fv", "exclude_boundaries")])
+
+
+def test_cached_exclude_boundaries():
+    g = structured.CartGrid([2, 2])
+    st = fvutils.cached_subcell_topology(g)
+    bf = g.get_all_boundary_faces()
+    bound_dir = bc.BoundaryCondition(g, bf, bf.size * ["dir"])
+    bound_neu = bc.BoundaryCondition(g)
+
+    excl_dir = fvutils.cached_exclude_boundaries(st, bound_dir, g.dim)
+    assert fvutils.cached_exclude_boundaries(st, bound_dir, g.dim) is excl_dir
+    # Mappings for different dimensions and boundary conditions are kept side
+    # by side
+    excl_nd = fvutils.cached_exclude_boundaries(st, bound_dir, 1)
+    assert excl_nd is not excl_dir
+    excl_neu = fvutils.cached_exclude_boundaries(st, bound_neu, g.dim)
+    assert excl_neu is not excl_dir
+    assert fvutils.cached_exclude_boundaries(st, bound_dir, g.dim) is excl_dir
+    assert fvutils.cached_exclude_boundaries(st, bound_neu, g.dim) is excl_neu
+    assert _num_cached_exclude_boundaries(g) == 3
+
+    # Boundary conditions are compared by value
+    bound_dir.is_dir[bf[0]] = False
+    bound_dir.is_neu[bf[0]] = True
+    assert fvutils.cached_exclude_boundaries(st, bound_dir, g.dim) is not excl_dir
+
+
+def test_cached_exclude_boundaries_bounded():
+    g = structured.CartGrid([2, 2])
+    st = fvutils.cached_subcell_topology(g)
+    bf = g.get_all_boundary_faces()
+    for i in range(2 * fvutils._MAX_CACHED_EXCLUDE_BOUNDARIES):
+        bound = bc.BoundaryCondition(g, bf[:i], i * ["dir"])
+        excl = fvutils.cached_exclude_boundaries(st, bound, g.dim)
+        num_cached = _num_cached_exclude_boundaries(g)
+        assert num_cached <= fvutils._MAX_CACHED_EXCLUDE_BOUNDARIES
+    # The last mapping is kept
+    assert fvutils.cached_exclude_boundaries(st, bound, g.dim) is excl
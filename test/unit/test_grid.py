@@ -5,6 +5,7 @@ import numpy as np
 import unittest
 
 import porepy as pp
+from porepy.utils import tags
 
 # ------------------------------------------------------------------------------#
 
@@ -55,6 +56,166 @@ class TestClosestCell(unittest.TestCase):
         assert ind[0] == 0
         assert ind.size == 1
 
+    def test_many_points(self):
+        g = pp.CartGrid([4, 3, 2])
+        g.compute_geometry()
+        np.random.seed(0)
+        p = np.random.rand(3, 50) * np.array([[4], [3], [2]])
+        ind = g.closest_cell(p)
+        known = [np.argmin(np.sum((g.cell_centers.T - x) ** 2, axis=1)) for x in p.T]
+        assert np.allclose(ind, known)
+
+    def test_tree_rebuilt_with_geometry(self):
+        g = pp.CartGrid([2, 1])
+        g.compute_geometry()
+        tree = g.cell_center_tree()
+        assert g.cell_center_tree() is tree
+        g.compute_geometry()
+        assert not g.cell_center_tree() is tree
+
+    def test_exact_2d(self):
+        g = pp.StructuredTriangleGrid([1, 1], [1, 1])
+        g.compute_geometry()
+        p = np.array([[0.55, 0.2, 2], [0.4, 0.7, 0.5], [0, 0, 0]])
+        ind = g.closest_cell(p, exact=True)
+        assert np.allclose(ind, [0, 1, -1])
+
+    def test_exact_out_of_plane(self):
+        g = pp.CartGrid([2, 2])
+        g.compute_geometry()
+        p = np.array([[.1], [.1], [1]])
+        ind = g.closest_cell(p, exact=True)
+        assert ind[0] == -1
+
+    def test_exact_3d(self):
+        g = pp.StructuredTetrahedralGrid([2, 2, 2], [1, 1, 1])
+        g.compute_geometry()
+        # Points in the centers of cells are found in these cells
+        ind = g.closest_cell(g.cell_centers, exact=True)
+        assert np.allclose(ind, np.arange(g.num_cells))
+        ind = g.closest_cell(np.array([[1.5], [0.5], [0.5]]), exact=True)
+        assert ind[0] == -1
+
+    def test_exact_varying_cell_size(self):
+        # A large cell next to many small ones
+        x = np.hstack((np.linspace(0, 1, 41), 5))
+        g = pp.TensorGrid(x, np.linspace(0, 1, 5))
+        g.compute_geometry()
+        np.random.seed(0)
+        p = np.random.rand(2, 50) * np.array([[6], [1.2]])
+        ind = g.closest_cell(p, exact=True)
+
+        i = np.searchsorted(x, p[0]) - 1
+        j = np.floor(p[1] * 4).astype(np.int)
+        inside = np.logical_and(p[0] < 5, p[1] < 1)
+        known = np.where(inside, i + 41 * j, -1)
+        assert np.array_equal(ind, known)
+
+
+class TestChunkedGeometry(unittest.TestCase):
+    def _geometry(self, g):
+        return [
+            g.face_centers.copy(),
+            g.face_normals.copy(),
+            g.face_areas.copy(),
+            g.cell_centers.copy(),
+            g.cell_volumes.copy(),
+        ]
+
+    def _compare(self, g):
+        g.compute_geometry()
+        known = self._geometry(g)
+        for chunk_size, num_threads in [(1, 1), (7, 1), (5, 3), (None, 4)]:
+            g.compute_geometry(chunk_size=chunk_size, num_threads=num_threads)
+            for a, b in zip(known, self._geometry(g)):
+                self.assertTrue(np.array_equal(a, b))
+
+    def test_cart_grid(self):
+        self._compare(pp.CartGrid([3, 2, 2]))
+
+    def test_perturbed_tetrahedral_grid(self):
+        g = pp.StructuredTetrahedralGrid([2, 3, 2])
+        np.random.seed(0)
+        g.nodes += 0.1 * np.random.rand(*g.nodes.shape)
+        self._compare(g)
+
+
+class TestCompactGrid(unittest.TestCase):
+    def test_compact_topology(self):
+        g = pp.StructuredTetrahedralGrid([2, 1, 1])
+        h = g.copy()
+        h.compact()
+        self.assertEqual(h.cell_faces.data.dtype, np.int8)
+        self.assertEqual(h.cell_faces.indices.dtype, np.int32)
+        self.assertEqual(h.face_nodes.indptr.dtype, np.int32)
+        self.assertEqual((g.cell_nodes() != h.cell_nodes()).nnz, 0)
+        self.assertTrue(np.array_equal(g.cell_face_as_dense(), h.cell_face_as_dense()))
+
+    def test_packed_tags(self):
+        g = pp.CartGrid([3, 2])
+        h = g.copy()
+        h.compact()
+        self.assertTrue(isinstance(h.tags, tags.PackedTags))
+        for key in g.tags:
+            self.assertTrue(np.array_equal(g.tags[key], h.tags[key]))
+        # In-place modification is not allowed, assignment is
+        tip = h.tags["tip_faces"]
+        self.assertRaises(ValueError, tip.__setitem__, 0, True)
+        tip = tip.copy()
+        tip[0] = True
+        h.tags["tip_faces"] = tip
+        self.assertTrue(h.tags["tip_faces"][0])
+        self.assertTrue(isinstance(h.copy().tags, tags.PackedTags))
+
+    def test_float32_geometry(self):
+        g = pp.CartGrid([2, 2])
+        g.compute_geometry()
+        g.compact(float32_geometry=True)
+        self.assertEqual(g.cell_centers.dtype, np.float32)
+        self.assertEqual(g.nodes.dtype, np.float32)
+        self.assertTrue(np.allclose(g.cell_volumes, 1))
+
+    def _discretization_matrices(self, g):
+        perm = pp.SecondOrderTensor(3, np.ones(g.num_cells))
+        bf = g.get_all_boundary_faces()
+        bound = pp.BoundaryCondition(g, bf, bf.size * ["dir"])
+        matrices = []
+        for solver in [
+            pp.Tpfa(physics="flow"),
+            pp.Mpfa(physics="flow"),
+            pp.RT0(physics="flow"),
+            pp.DualVEM(physics="flow"),
+        ]:
+            param = pp.Parameters(g)
+            param.set_tensor(solver, perm)
+            param.set_bc(solver, bound)
+            M, _ = solver.matrix_rhs(g, {"param": param})
+            matrices.append(M.toarray())
+        return matrices
+
+    def _compare_discretizations(self, g):
+        np.random.seed(0)
+        g.nodes[: g.dim] += 0.1 * np.random.rand(g.dim, g.num_nodes)
+        g.compute_geometry()
+        known = self._discretization_matrices(g)
+
+        h = g.copy()
+        h.compact()
+        for a, b in zip(known, self._discretization_matrices(h)):
+            self.assertTrue(np.allclose(a, b, rtol=1e-12, atol=1e-12))
+
+        # Single precision geometry perturbs the discretization slightly
+        h = g.copy()
+        h.compact(float32_geometry=True)
+        for a, b in zip(known, self._discretization_matrices(h)):
+            self.assertTrue(np.allclose(a, b, rtol=1e-5, atol=1e-6))
+
+    def test_discretization_2d(self):
+        self._compare_discretizations(pp.StructuredTriangleGrid([3, 3]))
+
+    def test_discretization_3d(self):
+        self._compare_discretizations(pp.StructuredTetrahedralGrid([2, 2, 2]))
+
 
 class TestCellFaceAsDense(unittest.TestCase):
     def test_cart_grid(self):
@@ -97,5 +258,68 @@ class TestBoundaries(unittest.TestCase):
         assert np.allclose(bmax, g.nodes.max(axis=1))
 
 
+class TestTopologyCache(unittest.TestCase):
+    def test_reuse(self):
+        g = pp.CartGrid([3, 2])
+        hits, misses = g.topology_cache_hits, g.topology_cache_misses
+        cn = g.cell_nodes()
+        self.assertEqual(g.topology_cache_misses, misses + 1)
+        self.assertTrue(g.cell_nodes() is cn)
+        g.num_cell_nodes()
+        g.num_cell_nodes()
+        self.assertEqual(g.topology_cache_misses, misses + 2)
+        # The second call to cell_nodes, the first call to num_cell_nodes
+        # (which uses cell_nodes) and the second call to num_cell_nodes are hits
+        self.assertEqual(g.topology_cache_hits, hits + 3)
+
+    def test_read_only(self):
+        g = pp.CartGrid([3, 2])
+        neighs = g.cell_face_as_dense()
+        self.assertFalse(neighs.flags.writeable)
+        self.assertTrue(g.cell_face_as_dense() is neighs)
+
+    def test_read_only_sparse(self):
+        g = pp.CartGrid([3, 2])
+        for mat in (g.cell_nodes(), g.cell_connection_map()):
+            for arr in (mat.data, mat.indices, mat.indptr):
+                self.assertFalse(arr.flags.writeable)
+            self.assertRaises(ValueError, mat.data.__setitem__, 0, False)
+        # The topology of the grid is not affected
+        self.assertTrue(g.cell_faces.data.flags.writeable)
+
+    def test_invalidate_replaced_matrix(self):
+        g = pp.CartGrid([2, 1])
+        c2c = g.cell_connection_map()
+        self.assertEqual(c2c.nnz, 4)
+        # Remove the connection between the cells by replacing cell_faces
+        cell_faces = g.cell_faces.tolil()
+        cell_faces[1, 1] = 0
+        g.cell_faces = cell_faces.tocsc()
+        g.cell_faces.eliminate_zeros()
+        self.assertEqual(g.cell_connection_map().nnz, 2)
+
+    def test_invalidate_replaced_indices(self):
+        g = pp.CartGrid([2, 1])
+        num_nodes = g.num_cell_nodes()
+        # Replace the index array of face_nodes, without replacing the matrix
+        fn = g.face_nodes
+        fn.indices = np.zeros_like(fn.indices)
+        self.assertFalse(np.allclose(g.num_cell_nodes(), num_nodes))
+
+    def test_clear(self):
+        g = pp.CartGrid([2, 1])
+        cn = g.cell_nodes()
+        g.clear_topology_cache()
+        self.assertFalse(g.cell_nodes() is cn)
+
+    def test_copy_has_own_cache(self):
+        g = pp.CartGrid([2, 1])
+        g.cell_nodes()
+        h = g.copy()
+        misses = h.topology_cache_misses
+        h.cell_nodes()
+        self.assertEqual(h.topology_cache_misses, misses + 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -71,6 +71,156 @@ class TestGridBucket(unittest.TestCase):
             R = d["cell_global2loc"]
             assert np.all(R * glob == loc)
 
+    def test_cell_global2loc_slices(self):
+        f1 = np.array([[0, 1], [1, 1]])
+        f2 = np.array([[1, 1], [0, 2]])
+        gb = meshing.cart_grid([f1, f2], [2, 2])
+
+        gb.cell_global2loc()
+        matrices = [d["cell_global2loc"] for _, d in gb]
+        matrices += [d["cell_global2loc"] for _, d in gb.edges()]
+
+        gb.cell_global2loc(as_matrix=False)
+        slices = [d["cell_global2loc"] for _, d in gb]
+        slices += [d["cell_global2loc"] for _, d in gb.edges()]
+
+        for R, s in zip(matrices, slices):
+            glob = np.random.rand(R.shape[1])
+            assert np.allclose(R * glob, glob[s])
+            # The prolongation is the transpose of the restriction
+            loc = np.random.rand(R.shape[0])
+            prolong = np.zeros(R.shape[1])
+            prolong[s] = loc
+            assert np.allclose(R.T * loc, prolong)
+
+    def test_copy_on_write(self):
+        f = np.array([[0, 2], [1, 1]])
+        gb = meshing.cart_grid([f], [2, 2])
+        gb.compute_geometry()
+        for g, d in gb:
+            d["param"] = pp.Parameters(g)
+            d["value"] = np.zeros(g.num_cells)
+
+        gb_copy = gb.copy(copy_on_write=True)
+        for (g, d), (h, d_copy) in zip(gb, gb_copy):
+            # The grids are copied, but not their arrays
+            assert g is not h
+            assert np.shares_memory(g.cell_centers, h.cell_centers)
+            assert d_copy["param"].g is h
+            # Shared arrays cannot be modified in place by the copy
+            self.assertRaises(ValueError, h.nodes.__setitem__, 0, 1)
+            self.assertRaises(ValueError, d_copy["value"].__setitem__, 0, 1)
+            # while new values only change the copy
+            d_copy["value"] = np.ones(h.num_cells)
+            d_copy["param"].set_source("flow", np.ones(h.num_cells))
+            assert np.all(d["value"] == 0)
+            assert np.all(d["param"].get_source("flow") == 0)
+
+        for (_, d), (_, d_copy) in zip(gb.edges(), gb_copy.edges()):
+            assert d["mortar_grid"] is not d_copy["mortar_grid"]
+            assert (d["face_cells"] != d_copy["face_cells"]).nnz == 0
+
+    def test_copy_on_write_original(self):
+        f = np.array([[0, 2], [1, 1]])
+        gb = meshing.cart_grid([f], [2, 2])
+        gb.compute_geometry()
+        for g, d in gb:
+            d["value"] = np.zeros(g.num_cells)
+
+        gb_copy = gb.copy(copy_on_write=True)
+        for (g, d), (h, d_copy) in zip(gb, gb_copy):
+            # The shared arrays cannot be modified in place by the original
+            self.assertRaises(ValueError, g.nodes.__setitem__, 0, 1)
+            self.assertRaises(ValueError, d["value"].__setitem__, 0, 1)
+            # while new values only change the original
+            g.nodes = g.nodes + 1
+            d["value"] = np.ones(g.num_cells)
+            assert not np.allclose(h.nodes, g.nodes)
+            assert np.all(d_copy["value"] == 0)
+
+        for (_, d), (_, d_copy) in zip(gb.edges(), gb_copy.edges()):
+            face_cells = d["face_cells"]
+            self.assertRaises(ValueError, face_cells.data.__setitem__, 0, 2)
+            assert np.all(d_copy["face_cells"].data == 1)
+
+    def test_view(self):
+        f = np.array([[0, 2], [1, 1]])
+        gb = meshing.cart_grid([f], [2, 2])
+        gb.add_node_props("a")
+
+        gb_view = gb.view(lambda g: g.dim == 2)
+        assert gb_view.num_graph_nodes() == 1
+        assert gb_view.num_graph_edges() == 0
+        g = gb_view.get_grids()[0]
+        assert g is gb.grids_of_dimension(2)[0]
+
+        gb_view = gb.view()
+        assert gb_view.num_graph_edges() == 1
+        # The data is shared, but cannot be modified through the view
+        gb.set_node_prop(g, "a", 1)
+        assert gb_view.node_props(g, "a") == 1
+        with self.assertRaises(TypeError):
+            gb_view.node_props(g)["a"] = 2
+        self.assertRaises(ValueError, gb_view.add_node_props, "b")
+        self.assertRaises(ValueError, gb_view.remove_node, g)
+        # A copy of the view can be modified
+        gb_copy = gb_view.copy()
+        gb_copy.set_node_prop(g, "a", 2)
+        assert gb.node_props(g, "a") == 1
+
+    def test_view_without_node_ordering(self):
+        gb = pp.GridBucket()
+        g1 = MockGrid()
+        g2 = MockGrid()
+        gb.add_nodes([g1, g2])
+        gb.add_edge([g2, g1], None)
+
+        # The grids are ordered without storing the ordering in the bucket
+        gb_view = gb.view()
+        e = next(gb_view.edges())[0]
+        assert gb_view.nodes_of_edge(e) == (g1, g2)
+        assert not any(gb.has_nodes_prop([g1, g2], "node_number"))
+        self.assertRaises(ValueError, gb_view.cell_global2loc)
+
+        # An existing ordering is used
+        gb.assign_node_ordering()
+        gb.set_node_prop(g1, "node_number", 1)
+        gb.set_node_prop(g2, "node_number", 0)
+        assert gb.view().nodes_of_edge(e) == (g2, g1)
+
+    def test_closest_cell(self):
+        f = np.array([[0, 2], [1, 1]])
+        gb = meshing.cart_grid([f], [2, 2])
+        p = np.array([[0.2, 1.6], [0.3, 1.1], [0, 0]])
+        grids, cells = gb.closest_cell(p)
+        assert grids[0].dim == 2 and grids[1].dim == 1
+        assert cells[0] == 0
+        assert np.allclose(grids[1].cell_centers[:, cells[1]], [1.5, 1, 0])
+
+        # The index is reused, and the result is unchanged
+        tree = gb._cell_center_tree
+        grids_2, cells_2 = gb.closest_cell(p)
+        assert gb._cell_center_tree is tree
+        assert np.all(cells == cells_2)
+
+    def test_closest_cell_exact(self):
+        f = np.array([[0, 2], [1, 1]])
+        gb = meshing.cart_grid([f], [2, 2])
+        p = np.array([[1.6, 3], [1.1, 0], [0, 0]])
+        grids, cells = gb.closest_cell(p, exact=True)
+        # The highest dimensional grid containing the point is chosen
+        assert grids[0].dim == 2
+        assert np.allclose(grids[0].cell_centers[:, cells[0]], [1.5, 1.5, 0])
+        assert grids[1] is None and cells[1] == -1
+
+    def test_compute_geometry_threaded(self):
+        f = np.array([[0, 2, 2, 0], [1, 1, 1, 1], [0, 0, 2, 2]])
+        gb = meshing.cart_grid([f], [2, 2, 2])
+        known = [g.cell_centers.copy() for g, _ in gb]
+        gb.compute_geometry(chunk_size=3, num_threads=2)
+        for (g, _), cc in zip(gb, known):
+            assert np.allclose(g.cell_centers, cc)
+
 
 class MockGrid:
     def __init__(
@@ -400,6 +550,49 @@ class TestBucket(unittest.TestCase):
         # g1 is no longer associated with gb
         self.assertRaises(KeyError, gb.node_props, g1, "a")
 
+    def test_remove_node(self):
+        gb = pp.GridBucket()
+        g1, g2, g3, g4 = MockGrid(2), MockGrid(1), MockGrid(1), MockGrid(0)
+        gb.add_nodes([g1, g2, g3, g4])
+        gb.add_edge([g1, g2], 1)
+        gb.add_edge([g1, g3], 2)
+        gb.add_edge([g2, g4], 3)
+        gb.add_edge([g3, g4], 4)
+
+        gb.remove_node(g2)
+
+        # The remaining nodes and edges keep their order
+        assert [g for g, _ in gb] == [g1, g3, g4]
+        assert [d["face_cells"] for _, d in gb.edges()] == [2, 4]
+        assert gb.num_graph_edges() == 2
+        self.assertRaises(KeyError, gb.edge_props, [g1, g2])
+        assert gb.edge_props([g4, g3], "face_cells") == 4
+        assert gb.node_neighbors(g4)[0] == g3
+
+    def test_graph(self):
+        gb = pp.GridBucket()
+        g1, g2 = MockGrid(2), MockGrid(1)
+        gb.add_edge([g1, g2], 1)
+        gb.set_node_prop(g1, "a", 2)
+
+        graph = gb.graph
+        assert graph.number_of_nodes() == 2
+        assert graph.number_of_edges() == 1
+        assert dict(graph.nodes(data=True))[g1]["a"] == 2
+        # The data dictionaries are shared with the bucket
+        graph.adj[g2][g1]["b"] = 3
+        assert gb.edge_props([g1, g2], "b") == 3
+        assert graph.adj[g1][g2]["face_cells"] == 1
+        dict(graph.nodes(data=True))[g1]["c"] = 4
+        assert gb.node_props(g1, "c") == 4
+
+        # The graph is kept until the structure of the bucket changes
+        assert gb.graph is graph
+        g3 = MockGrid(0)
+        gb.add_edge([g2, g3], 2)
+        assert gb.graph is not graph
+        assert gb.graph.number_of_edges() == 2
+
     def test_diameter(self):
         g1 = MockGrid(1, 2)
         g2 = MockGrid(2, 3)
@@ -121,6 +121,24 @@ class SplitIntersectingLines2DTest(unittest.TestCase):
         assert np.allclose(new_pts, p_known)
         assert np.allclose(new_lines, lines_known)
 
+    def test_line_split_twice_with_tags(self):
+        # The first line is crossed by the second, and the third line ends on
+        # it. It should be split into three, ordered from its start point.
+        p = np.array([[0, 2, 0.5, 0.5, 1.5, 1.5], [0, 0, -1, 1, -1, 0]])
+        lines = np.array([[0, 1, 1], [2, 3, 2], [4, 5, 3]]).T
+        box = np.array([[2], [2]])
+
+        new_pts, new_lines = cg.remove_edge_crossings(p, lines, box=box)
+
+        p_known = np.hstack((p, np.array([[0.5], [0]])))
+        p_known = cg.snap_to_grid(p_known, box=box)
+        lines_known = np.array(
+            [[0, 6, 1], [6, 5, 1], [5, 1, 1], [2, 6, 2], [6, 3, 2], [4, 5, 3]]
+        ).T
+
+        assert np.allclose(new_pts, p_known)
+        assert np.all(new_lines == lines_known)
+
     if __name__ == "__main__":
         unittest.main()
 
@@ -143,6 +161,29 @@ class SnapToGridTest(unittest.TestCase):
         unittest.main()
 
 
+class OverlappingBoxesTest(unittest.TestCase):
+    def test_compare_brute_force(self):
+        np.random.seed(0)
+        min_coord = np.random.rand(3, 50)
+        max_coord = min_coord + 0.2 * np.random.rand(3, 50)
+        pairs = cg.overlapping_boxes(min_coord, max_coord)
+
+        known = [
+            [i, j]
+            for i in range(50)
+            for j in range(i + 1, 50)
+            if np.all(max_coord[:, i] >= min_coord[:, j])
+            and np.all(min_coord[:, i] <= max_coord[:, j])
+        ]
+        assert np.array_equal(pairs, np.array(known).T)
+
+    def test_touching_boxes(self):
+        min_coord = np.array([[0, 1, 3], [0, 0, 0]])
+        max_coord = np.array([[1, 2, 4], [1, 1, 1]])
+        pairs = cg.overlapping_boxes(min_coord, max_coord)
+        assert np.array_equal(pairs, np.array([[0], [1]]))
+
+
 class LinesIntersectTest(unittest.TestCase):
     def test_lines_intersect_segments_do_not(self):
         s0 = np.array([0.3, 0.3])
@@ -4,6 +4,7 @@ import unittest
 
 import porepy as pp
 from porepy import cg
+from test.unit import setup_grids_fem_vem_tests as setup_grids
 
 # ------------------------------------------------------------------------------#
 
@@ -474,6 +475,48 @@ class BasicsTest(unittest.TestCase):
             err = np.sum(np.abs(p - p_ex(g.nodes)))
             assert np.isclose(err, 0)
 
+    # ------------------------------------------------------------------------------#
+
+    def _compare_batch(self, dim):
+        g = setup_grids.perturbed_simplex_grid(dim)
+        perm = setup_grids.heterogeneous_perm(g)
+        bn = g.get_boundary_nodes()
+        bc = pp.BoundaryConditionNode(g, bn, bn.size * ["neu"])
+
+        solver = pp.P1(physics="flow")
+        solver_mass = pp.P1MassMatrix(physics="flow")
+
+        param = pp.Parameters(g)
+        param.set_tensor(solver, perm)
+        param.set_bc(solver, bc)
+        M = solver.matrix(g, {"param": param}).todense()
+        M_mass = solver_mass.matrix(g, {"param": param}).todense()
+
+        # Assemble the local matrices cell by cell
+        _, _, _, node_coords, k = setup_grids.reference_geometry(g, perm)
+        cell_nodes = g.cell_nodes()
+        nodes, _, _ = sps.find(cell_nodes)
+        M_known = np.zeros((g.num_nodes, g.num_nodes))
+        M_mass_known = np.zeros((g.num_nodes, g.num_nodes))
+        for c in np.arange(g.num_cells):
+            loc = slice(cell_nodes.indptr[c], cell_nodes.indptr[c + 1])
+            nodes_loc = nodes[loc]
+            A = solver.stiffH1(
+                k[:, :, c], g.cell_volumes[c], node_coords[:, nodes_loc], g.dim
+            )
+            M_known[np.ix_(nodes_loc, nodes_loc)] += A
+            A = solver_mass.massH1(g.cell_volumes[c], g.dim)
+            M_mass_known[np.ix_(nodes_loc, nodes_loc)] += A
+
+        assert np.allclose(M, M_known, rtol=1e-14, atol=1e-14)
+        assert np.allclose(M_mass, M_mass_known, rtol=1e-14, atol=1e-14)
+
+    def test_p1_batch_2d(self):
+        self._compare_batch(2)
+
+    def test_p1_batch_3d(self):
+        self._compare_batch(3)
+
 
 # ------------------------------------------------------------------------------#
 
@@ -3,6 +3,7 @@ import unittest
 
 from porepy.grids.structured import CartGrid
 from porepy.params.data import Parameters
+from porepy.params.tensor import SecondOrderTensor, FourthOrderTensor
 
 
 class TestGettersAndSetters(unittest.TestCase):
@@ -189,5 +190,30 @@ class TestGettersAndSetters(unittest.TestCase):
 
     #####
 
+    def test_tensor_changed_cells(self):
+        p = Parameters(self.g)
+        p.set_tensor("flow", SecondOrderTensor(2, self.v))
+        kxx = self.v.copy()
+        kxx[[1, 4]] = 2
+        p.set_tensor("flow", SecondOrderTensor(2, kxx))
+        self.assertTrue(np.all(p.perm.changed_cells() == [1, 4]))
+
+        # Changes not yet discretized are carried over to the new tensor
+        p.set_tensor("flow", SecondOrderTensor(2, kxx))
+        self.assertTrue(np.all(p.perm.changed_cells() == [1, 4]))
+
+        p.perm.reset_changed()
+        self.assertEqual(p.perm.changed_cells().size, 0)
+
+    def test_tensor_mark_changed(self):
+        p = Parameters(self.g)
+        c = FourthOrderTensor(2, self.v, self.v)
+        p.set_tensor("mechanics", c)
+        c.mark_changed(np.array([3]))
+        c.mark_changed(np.array([0, 3]))
+        self.assertTrue(np.all(p.stiffness.changed_cells() == [0, 3]))
+
+    #####
+
     if __name__ == "__main__":
         unittest.main()
@@ -4,6 +4,7 @@ import unittest
 
 import porepy as pp
 from porepy import cg
+from test.unit import setup_grids_fem_vem_tests as setup_grids
 
 # ------------------------------------------------------------------------------#
 
@@ -509,6 +510,67 @@ class BasicsTest(unittest.TestCase):
             )
             assert np.isclose(err, err_known)
 
+    # ------------------------------------------------------------------------------#
+
+    def _compare_batch(self, dim):
+        g = setup_grids.perturbed_simplex_grid(dim)
+        perm = setup_grids.heterogeneous_perm(g)
+        bf = g.get_boundary_faces()
+        bc = pp.BoundaryCondition(g, bf, bf.size * ["dir"])
+
+        solver = pp.RT0(physics="flow")
+
+        param = pp.Parameters(g)
+        param.set_tensor(solver, perm)
+        param.set_bc(solver, bc)
+        M = solver.matrix(g, {"param": param}).todense()
+
+        # Assemble the mass-Hdiv part cell by cell
+        _, _, _, node_coords, k = setup_grids.reference_geometry(g, perm)
+        faces, cells, sign = sps.find(g.cell_faces)
+        index = np.argsort(cells)
+        faces, sign = faces[index], sign[index]
+        nodes, _, _ = sps.find(g.face_nodes)
+
+        size_HB = g.dim * (g.dim + 1)
+        HB = np.zeros((size_HB, size_HB))
+        for it in np.arange(0, size_HB, g.dim):
+            HB += np.diagflat(np.ones(size_HB - it), it)
+        HB += HB.T
+        HB /= g.dim * g.dim * (g.dim + 1) * (g.dim + 2)
+
+        M_known = np.zeros((g.num_faces, g.num_faces))
+        for c in np.arange(g.num_cells):
+            loc = slice(g.cell_faces.indptr[c], g.cell_faces.indptr[c + 1])
+            faces_loc = faces[loc]
+            face_nodes_loc = [
+                nodes[g.face_nodes.indptr[f] : g.face_nodes.indptr[f + 1]]
+                for f in faces_loc
+            ]
+            nodes_loc = np.unique(face_nodes_loc)
+            opposite_node = np.array(
+                [np.setdiff1d(nodes_loc, f, assume_unique=True) for f in face_nodes_loc]
+            ).flatten()
+
+            A = solver.massHdiv(
+                k[:, :, c],
+                g.cell_volumes[c],
+                node_coords[:, opposite_node],
+                sign[loc],
+                g.dim,
+                HB,
+            )
+            M_known[np.ix_(faces_loc, faces_loc)] += A
+
+        faces = np.arange(g.num_faces)
+        assert np.allclose(M[np.ix_(faces, faces)], M_known, rtol=1e-14, atol=1e-14)
+
+    def test_rt0_batch_2d(self):
+        self._compare_batch(2)
+
+    def test_rt0_batch_3d(self):
+        self._compare_batch(3)
+
 
 # ------------------------------------------------------------------------------#
 
@@ -22,6 +22,14 @@ class TestUniqueRows(unittest.TestCase):
         assert np.all(ia - ia_expected == 0)
         assert np.all(ic - ic_expected == 0)
 
+    def test_unique_rows_integer(self):
+        a = np.array([[1, -2], [3, 4], [1, -2], [-1, 0], [3, 4]])
+        ua, ia, ic = setmembership.unique_rows(a)
+        # The first occurrence of each row is identified
+        assert np.all(np.sort(ia) == np.array([0, 1, 3]))
+        assert np.all(a[ia] == ua)
+        assert np.all(ua[ic] == a)
+
 
 class TestIsmember(unittest.TestCase):
     def test_ismember_rows_with_sort(self):
@@ -136,6 +144,32 @@ class TestIsmember(unittest.TestCase):
         assert np.allclose(ma, ma_known)
         assert np.allclose(ia, ia_known)
 
+    def test_membership_index_repeated_queries(self):
+        b = np.array([[3, 1, 3, 5, 3], [3, 3, 2, 1, 2]])
+        index = setmembership.MembershipIndex(b)
+
+        ma, ia = index.ismember_rows(np.array([[1, 3, 3, 1, 7], [3, 3, 2, 3, 0]]))
+        assert np.all(ma == np.array([1, 1, 1, 1, 0], dtype=bool))
+        # The first occurrence of a duplicate column in b is used
+        assert np.all(ia == np.array([1, 0, 2, 1]))
+
+        ma, ia = index.ismember_rows(np.array([[2, 6], [3, 6]]))
+        assert np.all(ma == np.array([1, 0], dtype=bool))
+        assert np.all(ia == np.array([2]))
+
+    def test_ismember_rows_large_range(self):
+        # The range of the values is too large for packed integer keys
+        a = np.array([[0, 2 ** 62, 5], [1, -2 ** 62, 3]])
+        b = np.array([[5, 2 ** 62, 0], [3, -2 ** 62, 7]])
+        ma, ia = setmembership.ismember_rows(a, b, sort=False)
+
+        assert np.all(ma == np.array([0, 1, 1], dtype=bool))
+        assert np.all(ia == np.array([1, 0]))
+
+    def test_membership_index_float(self):
+        b = np.array([[0.5, 1], [1, 2]])
+        self.assertRaises(ValueError, setmembership.MembershipIndex, b)
+
 
 class TestUniqueColumns(unittest.TestCase):
     def test_no_common_points(self):
@@ -175,6 +209,27 @@ class TestUniqueColumns(unittest.TestCase):
         for i in range(p_known.shape[1]):
             assert np.min(np.sum(np.abs(p_known[:, i] - p_unique), axis=0)) == 0
 
+    def test_chain_of_close_points(self):
+        # The second point is close to the first, and is removed. The third
+        # is close to the second only, and is kept. The fourth is close to
+        # both the first and third, and is represented by the first.
+        p = np.array([[0, 0.6, 1.2, 0.5], [0, 0, 0, 0.3]])
+        p_unique, new_2_old, old_2_new = setmembership.unique_columns_tol(p, tol=0.5)
+
+        assert np.allclose(p_unique, p[:, [0, 2]])
+        assert np.all(new_2_old == np.array([0, 2]))
+        assert np.all(old_2_new == np.array([0, 0, 1, 0]))
+
+    def test_norm_exponent(self):
+        # The points are within the tolerance in the 2-norm, but not in the
+        # 1-norm.
+        p = np.array([[0, 1], [0, 1]])
+        tol = 1.5 / np.sqrt(2)
+        _, _, old_2_new = setmembership.unique_columns_tol(p, tol=tol)
+        assert np.all(old_2_new == np.array([0, 0]))
+        _, _, old_2_new = setmembership.unique_columns_tol(p, tol=tol, exponent=1)
+        assert np.all(old_2_new == np.array([0, 1]))
+
 
 if __name__ == "__main__":
     unittest.main()
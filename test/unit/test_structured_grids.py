@@ -456,6 +456,62 @@ class TestStructuredTetrahedralGrid(unittest.TestCase):
         unittest.main()
 
 
+class TestImplicitTensorGrid(unittest.TestCase):
+    def setUp(self):
+        self.lines = [
+            np.array([0, 1, 3, 3.5]),
+            np.array([0, 2, 2.5]),
+            np.array([0, 0.5, 1, 2]),
+        ]
+
+    def _compare(self, dim):
+        g = structured.TensorGrid(*self.lines[:dim])
+        h = structured.ImplicitTensorGrid(*self.lines[:dim])
+        g.compute_geometry()
+        h.compute_geometry()
+        self.assertEqual(g.num_cells, h.num_cells)
+        self.assertEqual(g.num_faces, h.num_faces)
+        self.assertEqual(g.num_nodes, h.num_nodes)
+        for key in g.tags:
+            self.assertTrue(np.array_equal(g.tags[key], h.tags[key]))
+        for field in [
+            "face_centers",
+            "face_normals",
+            "face_areas",
+            "cell_centers",
+            "cell_volumes",
+        ]:
+            self.assertTrue(np.allclose(getattr(g, field), getattr(h, field)))
+
+        # The connections are computed without forming the matrices
+        fi, ci, sgn = h.cell_face_triplets()
+        self.assertFalse(h.topology_assembled())
+        known = g.cell_face_triplets()
+        for a, b in zip(known, (fi, ci, sgn)):
+            self.assertTrue(np.array_equal(a, b))
+
+        # Topology is assembled on demand
+        self.assertTrue(np.allclose(g.nodes, h.nodes))
+        self.assertEqual((g.face_nodes != h.face_nodes).nnz, 0)
+        self.assertEqual((g.cell_faces != h.cell_faces).nnz, 0)
+        self.assertTrue(h.topology_assembled())
+
+    def test_1d(self):
+        self._compare(1)
+
+    def test_2d(self):
+        self._compare(2)
+
+    def test_3d(self):
+        self._compare(3)
+
+    def test_copy_not_assembled(self):
+        g = structured.ImplicitCartGrid([2, 3])
+        h = g.copy()
+        self.assertFalse(h.topology_assembled())
+        self.assertTrue(np.array_equal(g.cart_dims, h.cart_dims))
+
+
 class TestStructuredSimplexGridCoverage(unittest.TestCase):
     """ Verify that the tessalation covers the whole domain.
     """
@@ -94,5 +94,29 @@ def test_uniform_flow_cart_2d():
     flux, bound_flux = d["flux"], d["bound_flux"]
 
 
+def test_implicit_grid_3d():
+    """ TPFA on an implicit grid equals TPFA on the explicit grid, and does not
+    assemble the topology. """
+    x = np.array([0, 1, 3, 3.5])
+    y = np.array([0, 2, 2.5])
+    z = np.array([0, 0.5, 1])
+    discretizations = []
+    for g in [structured.TensorGrid(x, y, z), structured.ImplicitTensorGrid(x, y, z)]:
+        g.compute_geometry()
+        perm = tensor.SecondOrderTensor(g.dim, np.arange(1, g.num_cells + 1.0))
+        bound_faces = g.get_all_boundary_faces()
+        bc_type = ["dir"] * bound_faces.size
+        bc_type[::2] = ["neu"] * len(bc_type[::2])
+        bound = bc.BoundaryCondition(g, bound_faces, bc_type)
+        d = _assign_params(g, perm, bound)
+        tpfa.Tpfa().discretize(g, d)
+        discretizations.append(d)
+
+    assert not g.topology_assembled()
+    for key in ["flux", "bound_flux", "bound_pressure_cell", "bound_pressure_face"]:
+        diff = discretizations[0][key] - discretizations[1][key]
+        assert np.allclose(diff.A, 0)
+
+
 if __name__ == "__main__":
     test_tpfa_cart_2d()